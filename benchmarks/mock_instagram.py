@@ -0,0 +1,392 @@
+"""Servidor local que imita a Instagram para los benchmarks (sin red real).
+
+Sirve lo que consultan los motores del scraper:
+
+- `/api/v1/users/web_profile_info/?username=<u>`
+- `/api/v1/friendships/<id>/following/` y `/followers/` paginados con `count`/`max_id`
+- `/<u>/`: HTML del perfil con og:title/og:description y los enlaces de la cabecera
+- `/<u>/following/` y `/<u>/followers/`: página con el diálogo de la lista, que
+  pide más filas a `friendships` al hacer scroll como el diálogo real
+
+El perfil objetivo (`TARGET`) sigue y es seguido por `accounts` cuentas
+`acc_00000`, `acc_00001`, …; una de cada `1 / missing_ratio` no tiene datos en
+la API (`data.user` nulo) para forzar los fallbacks HTML/DOM. Cada respuesta
+espera `latency_ms` ± `jitter_ms` y las llamadas a `/api/` devuelven 429 con
+probabilidad `throttle_rate`. Todas las peticiones exigen la cookie `sessionid`.
+
+Con `tls=True` el servidor usa un certificado autofirmado para
+`www.instagram.com`; los motores de navegador llegan a él lanzando Chromium con
+`--host-resolver-rules` (ver `browser_args`).
+"""
+from __future__ import annotations
+
+import datetime
+import html
+import ipaddress
+import json
+import random
+import re
+import ssl
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+
+TARGET = "bench_target"
+TARGET_ID = "1000"
+SESSION_ID = "bench-session"
+DIALOG_BATCH = 24
+
+_FRIENDSHIPS_RE = re.compile(r"^/api/v1/friendships/(\d+)/(following|followers)/$")
+_PROFILE_RE = re.compile(r"^/([A-Za-z0-9._]+)/(?:(following|followers)/)?$")
+
+
+def account_name(i: int) -> str:
+    return f"acc_{i:05d}"
+
+
+def storage_state() -> Dict[str, Any]:
+    """storage_state de Playwright con la sesión que acepta el servidor."""
+    return {
+        "cookies": [
+            {
+                "name": name,
+                "value": value,
+                "domain": ".instagram.com",
+                "path": "/",
+                "expires": -1,
+                "httpOnly": name == "sessionid",
+                "secure": True,
+                "sameSite": "Lax",
+            }
+            for name, value in (("sessionid", SESSION_ID), ("csrftoken", "bench-csrf"))
+        ],
+        "origins": [],
+    }
+
+
+class MockInstagram:
+    """Datos y estadísticas compartidos por los servidores HTTP/HTTPS de una ejecución."""
+
+    def __init__(
+        self,
+        accounts: int,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        throttle_rate: float = 0.0,
+        missing_ratio: float = 0.05,
+        seed: int = 1,
+    ) -> None:
+        self.accounts = accounts
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.throttle_rate = throttle_rate
+        self.missing_every = int(round(1 / missing_ratio)) if missing_ratio > 0 else 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._servers: List[ThreadingHTTPServer] = []
+        self.reset_stats()
+
+    # --- Servidores ---
+
+    def start(self, tls: bool = False) -> str:
+        """Arranca un servidor en un puerto libre y devuelve su origen (`http(s)://127.0.0.1:<puerto>`)."""
+        handler = type("Handler", (_Handler,), {"mock": self})
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        server.daemon_threads = True
+        if tls:
+            ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            ctx.load_cert_chain(*_self_signed_cert())
+            server.socket = ctx.wrap_socket(server.socket, server_side=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self._servers.append(server)
+        return f"{'https' if tls else 'http'}://127.0.0.1:{server.server_address[1]}"
+
+    def stop(self) -> None:
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+        self._servers.clear()
+
+    @staticmethod
+    def browser_args(origin: str) -> List[str]:
+        """Argumentos de Chromium que redirigen *.instagram.com a un servidor `tls=True`."""
+        port = urlparse(origin).port
+        return [
+            f"--host-resolver-rules=MAP www.instagram.com 127.0.0.1:{port},MAP instagram.com 127.0.0.1:{port}",
+            "--ignore-certificate-errors",
+        ]
+
+    # --- Estadísticas ---
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.requests: Dict[str, int] = {}
+            self.throttled = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"requests": dict(sorted(self.requests.items())), "throttled_429": self.throttled}
+
+    def _count(self, kind: str) -> None:
+        with self._lock:
+            self.requests[kind] = self.requests.get(kind, 0) + 1
+
+    def _delay(self) -> float:
+        with self._lock:
+            jitter = self._rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        return max(0.0, self.latency_ms + jitter) / 1000
+
+    def _throttle(self) -> bool:
+        if self.throttle_rate <= 0:
+            return False
+        with self._lock:
+            hit = self._rng.random() < self.throttle_rate
+            if hit:
+                self.throttled += 1
+        return hit
+
+    # --- Datos ---
+
+    def _index(self, username: str) -> Optional[int]:
+        if not username.startswith("acc_"):
+            return None
+        try:
+            i = int(username[4:])
+        except ValueError:
+            return None
+        return i if 0 <= i < self.accounts else None
+
+    def _exists(self, username: str) -> bool:
+        return username == TARGET or self._index(username) is not None
+
+    def _counts(self, username: str) -> tuple:
+        if username == TARGET:
+            return self.accounts, self.accounts
+        i = self._index(username) or 0
+        return 1000 + (i * 37) % 250000, 50 + (i * 11) % 900
+
+    def user(self, username: str) -> Optional[Dict[str, Any]]:
+        if username != TARGET:
+            i = self._index(username)
+            if i is None or (self.missing_every and i % self.missing_every == self.missing_every - 1):
+                return None
+        followers, following = self._counts(username)
+        i = self._index(username)
+        posts = [
+            {
+                "node": {
+                    "shortcode": f"{username}{n}",
+                    "taken_at_timestamp": 1700000000 + n * 3600,
+                    "edge_media_to_caption": {"edges": [{"node": {"text": f"Post {n} de {username}"}}]},
+                }
+            }
+            for n in range(12)
+        ]
+        return {
+            "id": TARGET_ID if i is None else str(100000 + i),
+            "username": username,
+            "full_name": "Bench Target" if i is None else f"Cuenta {i}",
+            "biography": f"Biografía de prueba de {username}",
+            "external_url": None,
+            "is_private": False,
+            "is_professional": i is not None and i % 3 == 0,
+            "is_business_account": i is not None and i % 6 == 0,
+            "category_name": None,
+            "edge_followed_by": {"count": followers},
+            "edge_follow": {"count": following},
+            "edge_owner_to_timeline_media": {"count": len(posts), "edges": posts},
+        }
+
+    def friendships(self, user_id: str, count: int, max_id: Optional[str]) -> Dict[str, Any]:
+        if user_id != TARGET_ID:
+            return {"users": [], "next_max_id": None, "status": "ok"}
+        start = int(max_id or 0)
+        end = min(self.accounts, start + max(1, count))
+        users = [
+            {"pk": str(100000 + i), "username": account_name(i), "full_name": f"Cuenta {i}", "is_private": False}
+            for i in range(start, end)
+        ]
+        return {"users": users, "next_max_id": str(end) if end < self.accounts else None, "status": "ok"}
+
+    def profile_html(self, username: str) -> str:
+        followers, following = self._counts(username)
+        i = self._index(username)
+        name = "Bench Target" if i is None else f"Cuenta {i}"
+        title = html.escape(f"{name} (@{username}) • Instagram photos and videos", quote=True)
+        desc = html.escape(f"{followers} Followers, {following} Following, 12 Posts - See Instagram photos and videos", quote=True)
+        return (
+            "<!DOCTYPE html><html><head>"
+            f'<meta property="og:title" content="{title}">'
+            f'<meta property="og:description" content="{desc}">'
+            f"<title>{html.escape(name)}</title></head><body>"
+            f"<header><h2>{html.escape(name)}</h2><section><ul>"
+            f'<li><a href="/{username}/followers/">{followers} followers</a></li>'
+            f'<li><a href="/{username}/following/">{following} following</a></li>'
+            f"</ul><div data-testid=\"user-bio\">Biografía de prueba de {html.escape(username)}</div></section></header>"
+            "</body></html>"
+        )
+
+    def dialog_html(self, username: str, kind: str) -> str:
+        """Perfil con el diálogo abierto; las filas llegan por XHR a `friendships` al hacer scroll, como en la web."""
+        user_id = TARGET_ID if username == TARGET else str(100000 + (self._index(username) or 0))
+        return (
+            self.profile_html(username).replace("</body></html>", "")
+            + '<div role="dialog"><div id="list" style="height:400px;overflow-y:scroll"><ul id="rows"></ul>'
+            '<div style="height:10px"></div></div></div>'
+            "<script>\n"
+            f"const endpoint = '/api/v1/friendships/{user_id}/{kind}/?count={DIALOG_BATCH}';\n"
+            "let cursor = '', loading = false, done = false;\n"
+            "const ul = document.getElementById('rows');\n"
+            "async function more(){\n"
+            "  if (loading || done) return;\n"
+            "  loading = true;\n"
+            "  try {\n"
+            "    const r = await fetch(endpoint + (cursor ? '&max_id=' + cursor : ''), { credentials: 'include' });\n"
+            "    if (!r.ok) return;\n"
+            "    const data = await r.json();\n"
+            "    for (const u of data.users) {\n"
+            "      const li = document.createElement('li');\n"
+            "      li.style.height = '60px';\n"
+            "      li.innerHTML = '<a role=\"link\" href=\"/' + u.username + '/\">' + u.username + '</a>\\n<span>' + u.full_name + '</span>';\n"
+            "      ul.appendChild(li);\n"
+            "    }\n"
+            "    cursor = data.next_max_id || '';\n"
+            "    done = !cursor;\n"
+            "  } finally { loading = false; }\n"
+            "}\n"
+            "more();\n"
+            "const list = document.getElementById('list');\n"
+            "list.addEventListener('scroll', () => {\n"
+            "  if (list.scrollTop + list.clientHeight >= list.scrollHeight - 5) more();\n"
+            "});\n"
+            "</script></body></html>"
+        )
+
+
+class _Handler(BaseHTTPRequestHandler):
+    mock: MockInstagram
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        mock = self.mock
+        parsed = urlparse(self.path)
+        query = parse_qs(parsed.query)
+        path = parsed.path
+        delay = mock._delay()
+        if delay:
+            time.sleep(delay)
+
+        if path == "/":
+            mock._count("home")
+            self._send(200, "text/html; charset=utf-8", "<!DOCTYPE html><html><head><title>Instagram</title></head><body></body></html>")
+            return
+        if f"sessionid={SESSION_ID}" not in (self.headers.get("Cookie") or ""):
+            mock._count("unauthenticated")
+            self._json(401, {"message": "login_required", "status": "fail"})
+            return
+
+        if path == "/api/v1/users/web_profile_info/":
+            mock._count("web_profile_info")
+            if mock._throttle():
+                self._json(429, {"message": "Please wait a few minutes before you try again.", "status": "fail"})
+                return
+            username = (query.get("username") or [""])[0]
+            if not mock._exists(username):
+                self._json(404, {"message": "User not found", "status": "fail"})
+                return
+            self._json(200, {"data": {"user": mock.user(username)}, "status": "ok"})
+            return
+
+        m = _FRIENDSHIPS_RE.match(path)
+        if m:
+            mock._count(f"friendships_{m.group(2)}")
+            if mock._throttle():
+                self._json(429, {"message": "Please wait a few minutes before you try again.", "status": "fail"})
+                return
+            count = int((query.get("count") or ["12"])[0])
+            self._json(200, mock.friendships(m.group(1), count, (query.get("max_id") or [None])[0]))
+            return
+
+        m = _PROFILE_RE.match(path)
+        if m and mock._exists(m.group(1)):
+            if m.group(2):
+                mock._count("dialog_page")
+                self._send(200, "text/html; charset=utf-8", mock.dialog_html(m.group(1), m.group(2)))
+            else:
+                mock._count("profile_html")
+                self._send(200, "text/html; charset=utf-8", mock.profile_html(m.group(1)))
+            return
+
+        mock._count("not_found")
+        self._send(404, "text/html; charset=utf-8", "<!DOCTYPE html><html><body>Not found</body></html>")
+
+    def _json(self, status: int, body: Dict[str, Any]) -> None:
+        self._send(status, "application/json; charset=utf-8", json.dumps(body))
+
+    def _send(self, status: int, content_type: str, body: str) -> None:
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+_CERT: Optional[tuple] = None
+
+
+def _self_signed_cert() -> tuple:
+    """(cert.pem, key.pem) autofirmados para *.instagram.com, generados una vez por proceso."""
+    global _CERT
+    if _CERT is not None:
+        return _CERT
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "www.instagram.com")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=7))
+        .add_extension(
+            x509.SubjectAlternativeName(
+                [
+                    x509.DNSName("www.instagram.com"),
+                    x509.DNSName("instagram.com"),
+                    x509.DNSName("localhost"),
+                    x509.IPAddress(ipaddress.ip_address("127.0.0.1")),
+                ]
+            ),
+            critical=False,
+        )
+        .sign(key, hashes.SHA256())
+    )
+    directory = Path(tempfile.mkdtemp(prefix="mock_instagram_"))
+    cert_path = directory / "cert.pem"
+    key_path = directory / "key.pem"
+    cert_path.write_bytes(cert.public_bytes(serialization.Encoding.PEM))
+    key_path.write_bytes(
+        key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+    )
+    _CERT = (str(cert_path), str(key_path))
+    return _CERT
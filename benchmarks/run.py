@@ -0,0 +1,380 @@
+"""Benchmarks offline del scraper contra `mock_instagram` (sin tocar Instagram).
+
+Mide `get_profile_data`, `get_following_details` (API y `force_ui`) y
+`get_followers_counts_for_followers` con cada motor (`http`, `browser`,
+`async`) y cada tamaño (por defecto 100, 1000 y 10000 cuentas). Cada caso se
+ejecuta en un proceso propio para que el pico de RSS sea el suyo; el servidor
+simulado vive en el proceso principal.
+
+    python benchmarks/run.py --engines http --sizes 100,1000 --latency-ms 20 --throttle-rate 0.02
+    python benchmarks/run.py --baseline benchmarks/results/0.1.0.json
+
+Los resultados (throughput, tiempo total, pico de RSS, peticiones al servidor
+y métricas por endpoint) se imprimen como tabla y se guardan en JSON. Con
+`--baseline` se comparan con los de otra versión y el proceso sale con código 1
+si algún caso pierde más de `--tolerance` de throughput.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import platform
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from instagram_scraper import __version__
+from instagram_scraper.config import Config
+from instagram_scraper.metrics import METRICS
+from instagram_scraper.ratelimit import AdaptiveRateLimiter
+
+from mock_instagram import TARGET, MockInstagram, account_name, storage_state
+
+
+ENGINES = ("http", "browser", "async")
+SCENARIOS = ("profile", "following", "following_ui", "followers")
+DEFAULT_SIZES = (100, 1000, 10000)
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Benchmarks offline contra un Instagram simulado")
+    p.add_argument("--engines", default=",".join(ENGINES), help="Motores separados por comas (http,browser,async)")
+    p.add_argument("--scenarios", default=",".join(SCENARIOS), help="Escenarios separados por comas")
+    p.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES), help="Número de cuentas por caso")
+    p.add_argument("--ui-max", type=int, default=1000, help="Tamaño máximo para following_ui (el diálogo se scrollea en tiempo real)")
+    p.add_argument("--latency-ms", type=float, default=5.0, help="Latencia simulada por respuesta")
+    p.add_argument("--jitter-ms", type=float, default=2.0, help="Variación aleatoria de la latencia (±)")
+    p.add_argument("--throttle-rate", type=float, default=0.0, help="Probabilidad de 429 en las llamadas /api/")
+    p.add_argument("--missing-ratio", type=float, default=0.05, help="Fracción de cuentas sin datos en la API (fuerza fallbacks)")
+    p.add_argument("--concurrency", type=int, default=4, help="Perfiles en paralelo en el escenario profile / páginas del motor async")
+    p.add_argument("--page-size", type=int, default=50, help="Tamaño de página de friendships")
+    p.add_argument("--chunk", type=int, default=8, help="Usuarios enriquecidos en paralelo por lote")
+    p.add_argument("--retry-base-ms", type=int, default=50, help="Backoff base de los reintentos tras 429")
+    p.add_argument("--rate", type=float, default=None, help="Activa el control de tasa adaptativo con esta tasa inicial (req/s)")
+    p.add_argument("--timeout", type=float, default=3600, help="Tiempo máximo por caso en segundos")
+    p.add_argument("--output", type=Path, default=None, help="JSON de resultados (por defecto benchmarks/results/<versión>_<fecha>.json)")
+    p.add_argument("--baseline", type=Path, default=None, help="JSON de una ejecución anterior con el que comparar")
+    p.add_argument("--tolerance", type=float, default=0.15, help="Pérdida de throughput tolerada frente al baseline (0.15 = 15%%)")
+    return p
+
+
+def _csv(value: str, allowed: Optional[tuple] = None) -> List[str]:
+    items = [v.strip() for v in value.split(",") if v.strip()]
+    if allowed is not None:
+        unknown = [v for v in items if v not in allowed]
+        if unknown:
+            raise SystemExit(f"Valores no válidos: {', '.join(unknown)} (opciones: {', '.join(allowed)})")
+    return items
+
+
+def _skip_reason(engine: str, scenario: str, size: int, ui_max: int) -> Optional[str]:
+    if scenario == "following_ui" and engine == "http":
+        return "el backend HTTP no tiene modo UI"
+    if scenario == "following_ui" and size > ui_max:
+        return f"following_ui limitado a --ui-max={ui_max}"
+    return None
+
+
+# --- Ejecución de un caso (proceso hijo) ---
+
+
+def _peak_rss_mb(who: int) -> float:
+    rss = resource.getrusage(who).ru_maxrss
+    # ru_maxrss está en KiB en Linux y en bytes en macOS
+    return round(rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024, 1)
+
+
+def _config(case: Dict[str, Any], workdir: Path) -> Config:
+    state_path = workdir / "storage_state.json"
+    state_path.write_text(json.dumps(storage_state()), encoding="utf-8")
+    return Config(
+        headless=True,
+        browser_args=MockInstagram.browser_args(case["origins"]["https"]),
+        storage_path=str(state_path),
+        auth_secret_key=None,
+        cache_ttl=0,
+        rate_limit=case["rate"] is not None,
+        metrics_dir="",
+        log_level="WARNING",
+    )
+
+
+def _limiter(case: Dict[str, Any]) -> Optional[AdaptiveRateLimiter]:
+    if case["rate"] is None:
+        return None
+    return AdaptiveRateLimiter(rate=case["rate"], max_rate=max(case["rate"] * 8, 8.0), backoff_ms=case["retry_base_ms"])
+
+
+def _friendship_kwargs(case: Dict[str, Any]) -> Dict[str, Any]:
+    return dict(
+        page_size=case["page_size"],
+        chunk=case["chunk"],
+        delay_ms=0,
+        retry_tries=10,
+        retry_base_ms=case["retry_base_ms"],
+    )
+
+
+def _count_items(scenario: str, result: Any) -> int:
+    if scenario == "profile":
+        return sum(1 for r in result if r)
+    key = "followers_of_followers" if scenario == "followers" else "following_details"
+    return len((result or {}).get(key) or [])
+
+
+def _run_http(case: Dict[str, Any], config: Config, limiter: Optional[AdaptiveRateLimiter]) -> int:
+    from instagram_scraper.http_scraper import HttpInstagramScraper
+
+    scenario, size = case["scenario"], case["size"]
+    target_url = f"https://www.instagram.com/{TARGET}/"
+    pool_size = max(10, case["concurrency"], case["chunk"])
+    with HttpInstagramScraper(
+        config, storage_state=storage_state(), base_url=case["origins"]["http"], pool_size=pool_size, limiter=limiter
+    ) as scraper:
+        if scenario == "profile":
+            def one(i: int) -> Optional[Dict[str, Any]]:
+                try:
+                    return scraper.get_profile_data(f"https://www.instagram.com/{account_name(i)}/")
+                except Exception:
+                    return None
+
+            with ThreadPoolExecutor(max_workers=case["concurrency"]) as executor:
+                return _count_items(scenario, list(executor.map(one, range(size))))
+        if scenario == "following":
+            result = scraper.get_following_details(target_url, following_limit=size, **_friendship_kwargs(case))
+        else:
+            result = scraper.get_followers_counts_for_followers(target_url, followers_limit=size, **_friendship_kwargs(case))
+        return _count_items(scenario, result)
+
+
+def _run_browser(case: Dict[str, Any], config: Config, limiter: Optional[AdaptiveRateLimiter]) -> int:
+    from instagram_scraper.batch import BatchRunner
+    from instagram_scraper.browser_pool import BrowserPool
+    from instagram_scraper.browser_scraper import BrowserInstagramScraper
+
+    scenario, size = case["scenario"], case["size"]
+    target_url = f"https://www.instagram.com/{TARGET}/"
+    with BrowserPool(config, size=1, max_uses=max(50, size), limiter=limiter) as pool:
+        scraper = BrowserInstagramScraper(config, pool=pool)
+        if scenario == "profile":
+            runner = BatchRunner(scraper, "scrape", concurrency=case["concurrency"], retry_base_ms=case["retry_base_ms"])
+            records = runner.run([account_name(i) for i in range(size)])
+            return sum(1 for r in records if r.get("ok"))
+        if scenario == "followers":
+            result = scraper.get_followers_counts_for_followers(target_url, followers_limit=size, **_friendship_kwargs(case))
+        else:
+            result = scraper.get_following_details(
+                target_url, following_limit=size, force_ui=scenario == "following_ui", **_friendship_kwargs(case)
+            )
+        return _count_items(scenario, result)
+
+
+async def _run_async(case: Dict[str, Any], config: Config, limiter: Optional[AdaptiveRateLimiter]) -> int:
+    from instagram_scraper.async_browser_scraper import AsyncBrowserInstagramScraper
+
+    scenario, size = case["scenario"], case["size"]
+    target_url = f"https://www.instagram.com/{TARGET}/"
+    async with AsyncBrowserInstagramScraper(config, concurrency=case["concurrency"], limiter=limiter) as scraper:
+        if scenario == "profile":
+            async def one(i: int) -> Optional[Dict[str, Any]]:
+                try:
+                    return await scraper.get_profile_data(f"https://www.instagram.com/{account_name(i)}/")
+                except Exception:
+                    return None
+
+            return _count_items(scenario, await asyncio.gather(*(one(i) for i in range(size))))
+        if scenario == "followers":
+            result = await scraper.get_followers_counts_for_followers(target_url, followers_limit=size, **_friendship_kwargs(case))
+        else:
+            result = await scraper.get_following_details(
+                target_url, following_limit=size, force_ui=scenario == "following_ui", **_friendship_kwargs(case)
+            )
+        return _count_items(scenario, result)
+
+
+def run_case(case: Dict[str, Any], queue: Any) -> None:
+    """Punto de entrada del proceso hijo: ejecuta un caso y envía su resultado por `queue`."""
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    try:
+        with tempfile.TemporaryDirectory(prefix="ig_bench_") as tmp:
+            config = _config(case, Path(tmp))
+            limiter = _limiter(case)
+            METRICS.reset()
+            t0 = time.perf_counter()
+            if case["engine"] == "http":
+                items = _run_http(case, config, limiter)
+            elif case["engine"] == "browser":
+                items = _run_browser(case, config, limiter)
+            else:
+                items = asyncio.run(_run_async(case, config, limiter))
+            wall = time.perf_counter() - t0
+        snapshot = METRICS.snapshot()
+        queue.put(
+            {
+                "ok": True,
+                "items": items,
+                "wall_seconds": round(wall, 3),
+                "throughput": round(items / wall, 3) if wall > 0 else None,
+                "peak_rss_mb": _peak_rss_mb(resource.RUSAGE_SELF),
+                "peak_child_rss_mb": _peak_rss_mb(resource.RUSAGE_CHILDREN),
+                "limiter": limiter.summary() if limiter is not None else None,
+                "endpoints": {
+                    name: {
+                        "requests": st["requests"],
+                        "retries": st["retries"],
+                        "throttled_429": st["throttled_429"],
+                        "p50": st["latency_seconds"]["p50"],
+                        "p90": st["latency_seconds"]["p90"],
+                    }
+                    for name, st in snapshot["endpoints"].items()
+                },
+                "enrichment_stages": snapshot["enrichment_stages"],
+            }
+        )
+    except Exception as e:
+        queue.put({"ok": False, "error": f"{type(e).__name__}: {e}"})
+
+
+# --- Orquestación (proceso principal) ---
+
+
+def _execute(case: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=run_case, args=(case, queue))
+    proc.start()
+    try:
+        result = queue.get(timeout=timeout)
+    except Exception:
+        proc.terminate()
+        result = {"ok": False, "error": f"sin resultado tras {timeout:.0f}s"}
+    proc.join(10)
+    return result
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Casos cuyo throughput cae más de `tolerance` respecto al baseline."""
+    previous = {
+        (r["engine"], r["scenario"], r["size"]): r
+        for r in baseline.get("results", [])
+        if r.get("ok") and r.get("throughput")
+    }
+    regressions = []
+    for r in results:
+        before = previous.get((r["engine"], r["scenario"], r["size"]))
+        if before is None or not r.get("ok") or not r.get("throughput"):
+            continue
+        change = r["throughput"] / before["throughput"] - 1
+        r["baseline_throughput"] = before["throughput"]
+        r["throughput_change"] = round(change, 4)
+        if change < -tolerance:
+            regressions.append(
+                f"{r['engine']}/{r['scenario']}/{r['size']}: {before['throughput']} → {r['throughput']} cuentas/s ({change:+.1%})"
+            )
+    return regressions
+
+
+def _print_table(results: List[Dict[str, Any]]) -> None:
+    header = f"{'motor':<8} {'escenario':<13} {'cuentas':>7} {'items':>7} {'tiempo (s)':>10} {'cuentas/s':>10} {'RSS MB':>8} {'hijos MB':>9} {'429':>5}  cambio"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        if r.get("skipped"):
+            print(f"{r['engine']:<8} {r['scenario']:<13} {r['size']:>7}  omitido: {r['skipped']}")
+            continue
+        if not r.get("ok"):
+            error = (str(r.get("error")) or "").splitlines()[0] if r.get("error") else ""
+            print(f"{r['engine']:<8} {r['scenario']:<13} {r['size']:>7}  error: {error}")
+            continue
+        change = f"{r['throughput_change']:+.1%}" if "throughput_change" in r else ""
+        print(
+            f"{r['engine']:<8} {r['scenario']:<13} {r['size']:>7} {r['items']:>7} {r['wall_seconds']:>10} "
+            f"{r['throughput']:>10} {r['peak_rss_mb']:>8} {r['peak_child_rss_mb']:>9} {r['server']['throttled_429']:>5}  {change}"
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    engines = _csv(args.engines, ENGINES)
+    scenarios = _csv(args.scenarios, SCENARIOS)
+    sizes = [int(s) for s in _csv(args.sizes)]
+    mock = MockInstagram(
+        max(sizes),
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        throttle_rate=args.throttle_rate,
+        missing_ratio=args.missing_ratio,
+    )
+    origins = {"http": mock.start(), "https": mock.start(tls=True)}
+    results: List[Dict[str, Any]] = []
+    try:
+        for engine in engines:
+            for scenario in scenarios:
+                for size in sizes:
+                    entry: Dict[str, Any] = {"engine": engine, "scenario": scenario, "size": size}
+                    reason = _skip_reason(engine, scenario, size, args.ui_max)
+                    if reason:
+                        entry["skipped"] = reason
+                        results.append(entry)
+                        continue
+                    case = dict(
+                        entry,
+                        origins=origins,
+                        concurrency=args.concurrency,
+                        page_size=args.page_size,
+                        chunk=args.chunk,
+                        retry_base_ms=args.retry_base_ms,
+                        rate=args.rate,
+                    )
+                    print(f"→ {engine}/{scenario}/{size}", file=sys.stderr, flush=True)
+                    mock.reset_stats()
+                    entry.update(_execute(case, args.timeout))
+                    entry["server"] = mock.stats()
+                    results.append(entry)
+    finally:
+        mock.stop()
+
+    report: Dict[str, Any] = {
+        "version": __version__,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {
+            k: getattr(args, k)
+            for k in ("latency_ms", "jitter_ms", "throttle_rate", "missing_ratio", "concurrency", "page_size", "chunk", "retry_base_ms", "rate")
+        },
+        "results": results,
+    }
+    regressions: List[str] = []
+    if args.baseline is not None:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        regressions = compare(results, baseline, args.tolerance)
+        report["baseline"] = {"path": str(args.baseline), "version": baseline.get("version"), "regressions": regressions}
+
+    _print_table(results)
+    out = args.output or RESULTS_DIR / f"{__version__}_{datetime.now():%Y%m%d-%H%M%S}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"Resultados guardados en {out}")
+    if regressions:
+        print("Regresiones de throughput:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from cryptography.fernet import Fernet, InvalidToken
+
+from .auth import _get_fernet
+from .config import Config
+from . import scripts
+from .ratelimit import wait_route
+
+
+logger = logging.getLogger(__name__)
+
+# Extensión de los storage_state de cada cuenta en ACCOUNTS_DIR (`auth --account <nombre>`)
+SESSION_SUFFIX = ".enc"
+
+
+def session_files(directory: str) -> List[Path]:
+    """Sesiones guardadas en `directory` (una por cuenta), en orden de nombre."""
+    path = Path(directory)
+    return sorted(path.glob(f"*{SESSION_SUFFIX}")) if path.is_dir() else []
+
+
+def session_path(directory: str, name: str) -> Path:
+    return Path(directory) / f"{name}{SESSION_SUFFIX}"
+
+
+@dataclass(slots=True)
+class Account:
+    """Sesión guardada de una cuenta de Instagram y su estado en el planificador."""
+
+    name: str
+    storage_state: Dict[str, Any]
+    requests: int = 0
+    throttles: int = 0
+    # Presupuesto de la ventana actual
+    window_start: float = field(default_factory=time.monotonic)
+    window_used: int = 0
+    # Próximo instante en que la cuenta puede hacer una petición (ritmo por cuenta)
+    next_at: float = 0.0
+    # Pausa tras un 429; `strikes` cuenta los 429 seguidos y duplica la pausa
+    cooldown_until: float = 0.0
+    strikes: int = 0
+    # Contextos de navegador que la tienen asignada
+    holders: int = 0
+
+
+class AccountPool:
+    """Planificador de varias cuentas de Instagram, cada una con su sesión.
+
+    Cada cuenta hace como mucho `rate` peticiones por segundo y `budget`
+    peticiones por ventana de `window` segundos (0 = sin tope). Un 429 la deja
+    en pausa `cooldown` segundos, el doble con cada 429 seguido (hasta 16
+    veces); mientras tanto las peticiones van a las demás cuentas. Así el
+    ritmo total crece con el número de cuentas.
+
+    - `acquire()` elige la cuenta que antes puede hacer una petición, espera
+      su turno y la devuelve; `report(account, status)` registra la respuesta.
+      Lo usa el backend HTTP en cada petición.
+    - `checkout()` / `checkin(account)` asignan una cuenta a un contexto de
+      navegador de larga vida, prefiriendo cuentas sin pausa y con menos
+      contextos; `route_context(context, account)` pasa sus peticiones por el
+      ritmo, el presupuesto y la pausa de esa cuenta.
+
+    Es segura entre hilos.
+    """
+
+    def __init__(
+        self,
+        accounts: List[Account],
+        rate: float = 0.5,
+        budget: int = 0,
+        window: float = 3600.0,
+        cooldown: float = 60.0,
+    ) -> None:
+        if not accounts:
+            raise ValueError("AccountPool necesita al menos una cuenta")
+        self.accounts = accounts
+        self.rate = max(0.01, rate)
+        self.budget = max(0, budget)
+        self.window = max(1.0, window)
+        self.cooldown = max(0.0, cooldown)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, directory: str, fernet: Optional[Fernet] = None, **kwargs: Any) -> Optional["AccountPool"]:
+        """Carga cada `<nombre>.enc` de `directory`; None si no hay ninguna sesión."""
+        accounts: List[Account] = []
+        for file in session_files(directory):
+            raw = file.read_bytes()
+            try:
+                state = json.loads(fernet.decrypt(raw) if fernet else raw)
+            except InvalidToken:
+                raise RuntimeError(f"No se pudo descifrar la sesión de {file}. Clave incorrecta.")
+            except ValueError:
+                logger.warning("Se ignora %s: no es un storage_state válido", file)
+                continue
+            accounts.append(Account(file.name[: -len(SESSION_SUFFIX)], state))
+        if not accounts:
+            return None
+        logger.info("Cuentas cargadas de %s: %s", directory, ", ".join(a.name for a in accounts))
+        return cls(accounts, **kwargs)
+
+    @classmethod
+    def from_config(cls, config: Config, directory: Optional[str] = None) -> Optional["AccountPool"]:
+        return cls.load(
+            directory or config.accounts_dir,
+            _get_fernet(config.auth_secret_key),
+            rate=config.account_rate,
+            budget=config.account_budget,
+            window=config.account_window,
+            cooldown=config.account_cooldown,
+        )
+
+    def __len__(self) -> int:
+        return len(self.accounts)
+
+    # --- Planificación ---
+
+    def _roll(self, account: Account, now: float) -> None:
+        if now - account.window_start >= self.window:
+            account.window_start = now
+            account.window_used = 0
+
+    def _available_at(self, account: Account, now: float) -> float:
+        """Instante a partir del cual la cuenta puede hacer su próxima petición."""
+        at = max(now, account.next_at, account.cooldown_until)
+        if self.budget and account.window_used >= self.budget and at - account.window_start < self.window:
+            at = account.window_start + self.window
+        return at
+
+    def _parked(self, account: Account, now: float) -> bool:
+        return self._available_at(account, now) - now > 1.0 / self.rate
+
+    def reserve(self, account: Optional[Account] = None) -> Tuple[Account, float]:
+        """Reserva la próxima petición (de `account` o de la cuenta que antes pueda) y devuelve cuánto esperar."""
+        with self._lock:
+            now = time.monotonic()
+            if account is None:
+                account = min(self.accounts, key=lambda a: (self._available_at(a, now), a.window_used))
+            start = self._available_at(account, now)
+            self._roll(account, start)
+            account.window_used += 1
+            account.requests += 1
+            account.next_at = start + 1.0 / self.rate
+            return account, start - now
+
+    def acquire(self, account: Optional[Account] = None) -> Account:
+        account, wait = self.reserve(account)
+        if wait > 0:
+            time.sleep(wait)
+        return account
+
+    def report(self, account: Account, status: int) -> None:
+        """Registra la respuesta de una petición de `account`: un 429 la deja en pausa."""
+        if status == 429:
+            with self._lock:
+                account.throttles += 1
+                now = time.monotonic()
+                if account.cooldown_until > now:
+                    # Petición que ya estaba en vuelo: la pausa sigue en curso
+                    return
+                account.strikes += 1
+                pause = self.cooldown * 2 ** min(account.strikes - 1, 4)
+                account.cooldown_until = now + pause
+            logger.warning("429 en la cuenta %s: en pausa %.0fs", account.name, pause)
+        elif 200 <= status < 400 and account.strikes:
+            with self._lock:
+                account.strikes = 0
+
+    def checkout(self) -> Account:
+        """Asigna una cuenta a un contexto nuevo: sin pausa primero, luego la de menos contextos."""
+        with self._lock:
+            now = time.monotonic()
+            account = min(self.accounts, key=lambda a: (self._parked(a, now), a.holders, self._available_at(a, now)))
+            account.holders += 1
+            return account
+
+    def checkin(self, account: Account) -> None:
+        with self._lock:
+            account.holders = max(0, account.holders - 1)
+
+    def parked(self, account: Account) -> bool:
+        """Si la cuenta está en pausa por un 429 o sin presupuesto en esta ventana."""
+        with self._lock:
+            return self._parked(account, time.monotonic())
+
+    def summary(self) -> str:
+        with self._lock:
+            return ", ".join(f"{a.name}: {a.requests} peticiones, {a.throttles} respuestas 429" for a in self.accounts)
+
+    # --- Integración con Playwright (context.route) ---
+
+    @staticmethod
+    def _applies(url: str) -> bool:
+        host = urlparse(url).hostname or ""
+        return host == "instagram.com" or host.endswith(".instagram.com")
+
+    def fetch(self, route: Any, account: Account) -> Any:
+        """`route.fetch()` en el turno de `account`; el 429 se devuelve a la página (su `fetchRetry` reintenta)."""
+        _, wait = self.reserve(account)
+        wait_route(route, wait)
+        response = route.fetch()
+        self.report(account, response.status)
+        return response
+
+    def route_context(self, context: Any, account: Account) -> None:
+        """Pasa por el turno de `account` los fetch/XHR y las navegaciones a Instagram de un contexto (API síncrona).
+
+        Registrar antes que la caché, como el limitador: la caché delega sus
+        fallos en `fetch`.
+        """
+
+        def handle(route: Any) -> None:
+            kind = route.request.resource_type
+            if kind in ("fetch", "xhr"):
+                route.fulfill(response=self.fetch(route, account))
+            elif kind == "document":
+                wait_route(route, self.reserve(account)[1])
+                route.fallback()
+            else:
+                route.fallback()
+
+        scripts.mark_paced(context)
+        context.route(self._applies, handle)
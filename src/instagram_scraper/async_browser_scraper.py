@@ -0,0 +1,460 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from playwright.async_api import Browser, BrowserContext, Page, Playwright, async_playwright
+
+from .auth import FacebookAuthenticator
+from .blocking import ResourceBlocker
+from .cache import ProfileCache
+from .config import Config
+from .harvest import FriendshipHarvester
+from .metrics import METRICS
+from .ratelimit import AdaptiveRateLimiter
+from .records import FollowerRecord, FollowingRecord
+from .utils import INSTAGRAM_HOME, INSTAGRAM_ORIGIN, extract_username
+from . import profiles, scripts
+
+
+logger = logging.getLogger(__name__)
+
+_COOKIE_BUTTONS = ("Permitir todas las cookies", "Allow all cookies", "Aceptar")
+
+
+class AsyncBrowserInstagramScraper:
+    """Variante asyncio de `BrowserInstagramScraper` sobre `playwright.async_api`.
+
+    Un único Chromium y un único contexto autenticado atienden todas las
+    llamadas; cada consulta abre su propia página y `concurrency` limita las
+    páginas abiertas a la vez. Mientras una página espera a la red (fetch,
+    `goto`, `wait_for_timeout`), el bucle de eventos avanza las demás, así que
+    un proceso puede tener varios perfiles en vuelo:
+
+        async with AsyncBrowserInstagramScraper(config, concurrency=4) as s:
+            perfiles = await asyncio.gather(*(s.get_profile_data(u) for u in urls))
+
+    Los enriquecimientos por usuario (HTML og y DOM del perfil) también se
+    reparten en páginas propias en lugar de recorrerse uno a uno.
+    """
+
+    def __init__(
+        self,
+        config: Config,
+        concurrency: int = 4,
+        auth: Optional[FacebookAuthenticator] = None,
+        cache: Optional[ProfileCache] = None,
+        limiter: Optional[AdaptiveRateLimiter] = None,
+    ) -> None:
+        self.config = config
+        self.auth = auth or FacebookAuthenticator(config)
+        self.concurrency = max(1, concurrency)
+        self.cache = cache
+        self.limiter = limiter
+        self.blocker = ResourceBlocker.from_config(config)
+        self._pw: Optional[Playwright] = None
+        self._browser: Optional[Browser] = None
+        self._context: Optional[BrowserContext] = None
+        self._pages: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self) -> "AsyncBrowserInstagramScraper":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.close()
+
+    async def start(self) -> None:
+        if self._pw is not None:
+            return
+        self._pages = asyncio.Semaphore(self.concurrency)
+        self._pw = await async_playwright().start()
+        self._browser = await self._pw.chromium.launch(headless=self.config.headless, args=self.config.browser_args)
+        try:
+            self._context = await self._browser.new_context(storage_state=self.auth.load_storage_state())
+        except FileNotFoundError:
+            logger.warning("No hay storage de autenticación; se usará un contexto sin sesión")
+            self._context = await self._browser.new_context()
+        await scripts.install_helpers_async(self._context)
+        METRICS.instrument_context_async(self._context)
+        if self.limiter is not None:
+            await self.limiter.route_context_async(self._context)
+        if self.cache is not None:
+            await self.cache.route_context_async(
+                self._context, fetch=self.limiter.fetch_async if self.limiter is not None else None
+            )
+        if self.blocker is not None:
+            await self.blocker.route_context_async(self._context)
+
+    async def close(self) -> None:
+        for closer in (self._context, self._browser):
+            if closer is not None:
+                try:
+                    await closer.close()
+                except Exception:
+                    pass
+        self._context = None
+        self._browser = None
+        if self._pw is not None:
+            await self._pw.stop()
+            self._pw = None
+
+    @asynccontextmanager
+    async def _page(self, url: str = INSTAGRAM_HOME) -> AsyncIterator[Page]:
+        """Abre una página en `url` dentro del límite de concurrencia y la cierra al salir."""
+        if self._context is None:
+            await self.start()
+        async with self._pages:
+            page = await self._context.new_page()
+            try:
+                await page.goto(url, timeout=30000)
+                yield page
+            finally:
+                try:
+                    await page.close()
+                except Exception:
+                    pass
+
+    async def _ensure_session(self) -> None:
+        if self._context is None:
+            await self.start()
+        cookies = await self._context.cookies()
+        has_session = any(c.get("name") == "sessionid" and c.get("value") for c in cookies)
+        logger.info("Autenticado: %s", "sí" if has_session else "no")
+        if not has_session:
+            raise RuntimeError("No hay sesión autenticada (cookie sessionid ausente). Ejecute 'auth' primero.")
+
+    async def _dismiss_cookies(self, page: Page) -> None:
+        try:
+            for name in _COOKIE_BUTTONS:
+                btn = page.get_by_role("button", name=name).first
+                if await btn.is_visible():
+                    await btn.click()
+                    return
+        except Exception:
+            pass
+
+    async def get_profile_data(
+        self,
+        profile_url: str,
+        posts_limit: Optional[int] = None,
+        since: Optional[datetime] = None,
+        page_size: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Awaitable equivalente a `BrowserInstagramScraper.get_profile_data` (pagina el timeline igual)."""
+        username = extract_username(profile_url)
+        limit = posts_limit or self.config.posts_limit
+        async with self._page() as page:
+            logger.info("Consultando API web_profile_info para %s (async)", username)
+            result = await page.evaluate(*scripts.profile(username))
+            data = profiles.profile_from_response(result, limit)
+            data["latest_posts"] = [
+                post async for post in self._timeline(page, result["data"]["user"], limit, since, page_size)
+            ]
+        return data
+
+    def _timeline(
+        self,
+        page: Page,
+        user: Dict[str, Any],
+        limit: Optional[int],
+        since: Optional[datetime],
+        page_size: Optional[int],
+        delay_ms: int = 1000,
+        retry_tries: int = 10,
+        retry_base_ms: int = 2500,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        user_id = str(user.get("id"))
+        size = page_size or self.config.posts_page_size
+
+        async def fetch(cursor: str) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+            await page.wait_for_timeout(delay_ms)
+            result = await page.evaluate(*scripts.timeline_page(user_id, size, cursor, retry_tries, retry_base_ms))
+            return [profiles.post_from_feed(it) for it in result.get("posts") or []], result.get("next_max_id")
+
+        return profiles.timeline_posts_async(user, fetch, limit, since)
+
+    async def get_following_details(
+        self,
+        profile_url: str,
+        following_limit: Optional[int] = None,
+        page_size: int = 12,
+        chunk: int = 2,
+        delay_ms: int = 3000,
+        retry_tries: int = 10,
+        retry_base_ms: int = 2500,
+        force_ui: bool = False,
+    ) -> Dict[str, Any]:
+        """Awaitable equivalente a `BrowserInstagramScraper.get_following_details`."""
+        username = extract_username(profile_url)
+        limit = following_limit or 20
+        try:
+            logger.info("Consultando seguidos y detalles para %s (async)", username)
+            await self._ensure_session()
+            if not force_ui:
+                try:
+                    async with self._page() as page:
+                        result = await page.evaluate(
+                            *scripts.following_api(username, limit, page_size, chunk, delay_ms, retry_tries, retry_base_ms)
+                        )
+                    items = [FollowingRecord.from_dict(it) for it in result.get("following_details", []) or []]
+                    logger.info("Items recogidos (API): %d", len(items))
+                    result["following_details"] = await asyncio.gather(
+                        *(self._enrich_item(it, retry_tries, retry_base_ms) for it in items)
+                    )
+                    logger.info("Count (seguidos del perfil): %s", str(result.get("following_count")))
+                    return result
+                except Exception:
+                    pass
+            # Fallback UI o modo forzado por flag
+            return await self._following_from_ui(username, limit, delay_ms, retry_tries, retry_base_ms)
+        except Exception as e:
+            logger.error("Fallo inesperado en get_following_details: %s", e)
+            return {"username": username, "following_count": None, "following_details": []}
+
+    async def _enrich_item(self, it: FollowingRecord, retry_tries: int, retry_base_ms: int) -> FollowingRecord:
+        """Completa un item con HTML (og tags) y, si aún faltan campos, con el DOM del perfil."""
+        uname = it.username
+        METRICS.stage("api")
+        if not uname or not it.incomplete:
+            return it
+        used_html = used_dom = False
+        try:
+            async with self._page() as page:
+                try:
+                    it.merge_missing(await page.evaluate(*scripts.html_profile(uname, retry_tries, retry_base_ms)))
+                    used_html = True
+                except Exception:
+                    pass
+                if it.incomplete:
+                    await page.goto(f"{INSTAGRAM_ORIGIN}/{uname}/", timeout=30000)
+                    await page.wait_for_load_state("domcontentloaded")
+                    await page.wait_for_timeout(500)
+                    it.merge_missing(await page.evaluate(*scripts.dom_profile()))
+                    used_dom = True
+        except Exception:
+            pass
+        METRICS.stage("html", int(used_html))
+        METRICS.stage("dom", int(used_dom))
+        logger.info(
+            "%s | HTML=%s | DOM=%s | final: nombre=%s, seguidores=%s, seguidos=%s",
+            uname,
+            str(used_html),
+            str(used_dom),
+            it.full_name,
+            str(it.followers),
+            str(it.following),
+        )
+        return it
+
+    def _harvester(self, page: Page, kind: str) -> Optional[FriendshipHarvester]:
+        """Escucha las respuestas del diálogo de `kind` si `config.ui_harvest` está activo."""
+        if not self.config.ui_harvest:
+            return None
+        harvester = FriendshipHarvester(kind)
+        harvester.attach_async(page)
+        return harvester
+
+    async def _collect_usernames(
+        self,
+        page: Page,
+        limit: int,
+        delay_ms: int,
+        harvester: Optional[FriendshipHarvester] = None,
+    ) -> Tuple[List[str], Dict[str, str]]:
+        """Igual que `BrowserInstagramScraper._collect_usernames`: colector MutationObserver en la página."""
+        usernames: List[str] = []
+        seen: Set[str] = set()
+        names: Dict[str, str] = {}
+        wait_ms = max(delay_ms, 2000)
+        empty_rounds = 0
+        try:
+            await page.evaluate(scripts.LIST_COLLECTOR_JS)
+        except Exception:
+            pass
+        while len(usernames) < limit:
+            try:
+                fresh = await page.evaluate(scripts.LIST_COLLECTOR_STEP_JS, wait_ms)
+                if fresh is None:
+                    await page.evaluate(scripts.LIST_COLLECTOR_JS)
+                    fresh = []
+            except Exception:
+                await page.mouse.wheel(0, 3000)
+                await page.wait_for_timeout(800)
+                fresh = []
+            if harvester is not None:
+                fresh = harvester.take_new() + fresh
+            added = 0
+            for uname, name in fresh:
+                if name and uname not in names:
+                    names[uname] = name
+                if uname in seen:
+                    continue
+                seen.add(uname)
+                usernames.append(uname)
+                added += 1
+                if len(usernames) >= limit:
+                    break
+            if harvester is not None and harvester.exhausted and harvester.users:
+                break
+            empty_rounds = 0 if added else empty_rounds + 1
+            if empty_rounds >= 3:
+                logger.info("Sin nuevos usernames tras %d rondas; procesando %d usuarios", empty_rounds, len(usernames))
+                break
+        return usernames[:limit], names
+
+    async def _following_from_ui(
+        self,
+        username: str,
+        limit: int,
+        delay_ms: int,
+        retry_tries: int,
+        retry_base_ms: int,
+    ) -> Dict[str, Any]:
+        async with self._page(f"{INSTAGRAM_ORIGIN}/{username}/") as page:
+            await self._dismiss_cookies(page)
+            harvester = self._harvester(page, "following")
+            try:
+                await page.wait_for_selector("a[href$='/following/']", timeout=20000)
+                await page.locator("a[href$='/following/']").first.click()
+                try:
+                    await page.wait_for_selector("div[role='dialog']", timeout=8000)
+                except Exception:
+                    pass
+                usernames, dialog_names = await self._collect_usernames(page, limit, delay_ms, harvester)
+            finally:
+                if harvester is not None:
+                    harvester.detach()
+        out = await asyncio.gather(
+            *(self._ui_following_item(uname, dialog_names.get(uname), retry_tries, retry_base_ms) for uname in usernames)
+        )
+        return {"username": username, "following_count": None, "following_details": list(out)}
+
+    async def _ui_following_item(self, uname: str, dialog_name: Optional[str], retry_tries: int, retry_base_ms: int) -> FollowingRecord:
+        """Detalle de un seguido hallado en la UI: API, luego HTML og y por último DOM del perfil."""
+        logger.info("Procesando usuario desde UI: %s", uname)
+        METRICS.stage("ui")
+        item = FollowingRecord.from_user(uname, None)
+        try:
+            async with self._page() as page:
+                try:
+                    item = FollowingRecord.from_dict(await page.evaluate(*scripts.user_details(uname, retry_tries, retry_base_ms)))
+                    if not item.full_name and dialog_name:
+                        item.full_name = dialog_name
+                except Exception:
+                    item.merge_missing({"full_name": dialog_name})
+                if item.followers is None or item.following is None or not item.full_name:
+                    try:
+                        item.merge_missing(await page.evaluate(*scripts.html_counts(uname, retry_tries, retry_base_ms)))
+                    except Exception:
+                        pass
+                if item.followers is None or item.following is None or not item.full_name:
+                    await page.goto(f"{INSTAGRAM_ORIGIN}/{uname}/", timeout=30000)
+                    await self._dismiss_cookies(page)
+                    await page.wait_for_load_state("domcontentloaded")
+                    try:
+                        await page.wait_for_selector(
+                            "meta[property='og:description'], header section ul li a[href$='/followers/'], header section ul li a[href$='/following/']",
+                            timeout=12000,
+                        )
+                    except Exception:
+                        pass
+                    await page.wait_for_timeout(900)
+                    item.merge_missing(await page.evaluate(*scripts.dom_profile(detailed=True)))
+        except Exception:
+            pass
+        logger.info(
+            "[UI] %s | nombre='%s' | bio_len=%s | seguidores=%s | seguidos=%s",
+            uname,
+            item.full_name or "",
+            len(item.biography or ""),
+            str(item.followers),
+            str(item.following),
+        )
+        return item
+
+    async def get_followers_counts_for_followers(
+        self,
+        profile_url: str,
+        followers_limit: Optional[int] = None,
+        page_size: int = 12,
+        chunk: int = 2,
+        delay_ms: int = 3000,
+        retry_tries: int = 10,
+        retry_base_ms: int = 2500,
+    ) -> Dict[str, Any]:
+        """Awaitable equivalente a `BrowserInstagramScraper.get_followers_counts_for_followers`."""
+        username = extract_username(profile_url)
+        limit = followers_limit or 20
+        logger.info("Consultando seguidores y conteos para %s (async)", username)
+        await self._ensure_session()
+        try:
+            async with self._page() as page:
+                result = await page.evaluate(
+                    *scripts.followers_api(username, limit, page_size, chunk, delay_ms, retry_tries, retry_base_ms)
+                )
+            items = [FollowerRecord.from_dict(it) for it in result.get("followers_of_followers") or []]
+            result["followers_of_followers"] = items
+            logger.info("Items recogidos (API): %d", len(items))
+            logger.info("Count (followers del perfil): %s", str(result.get("count")))
+            return result
+        except Exception:
+            return await self._followers_from_ui(username, limit, delay_ms, retry_tries, retry_base_ms)
+
+    async def _followers_from_ui(
+        self,
+        username: str,
+        limit: int,
+        delay_ms: int,
+        retry_tries: int,
+        retry_base_ms: int,
+    ) -> Dict[str, Any]:
+        async with self._page(f"{INSTAGRAM_ORIGIN}/{username}/") as page:
+            try:
+                count_val = await page.evaluate(*scripts.followers_count(username, retry_tries, retry_base_ms))
+            except Exception:
+                count_val = None
+            if count_val is None:
+                try:
+                    count_val = await page.evaluate(*scripts.dom_followers())
+                except Exception:
+                    pass
+            try:
+                if await page.evaluate(scripts.IS_PRIVATE_JS):
+                    logger.warning("Perfil privado: el listado de seguidores no está disponible si no sigues la cuenta")
+                    return {"username": username, "count": count_val, "followers_of_followers": []}
+            except Exception:
+                pass
+            await self._dismiss_cookies(page)
+            harvester = self._harvester(page, "followers")
+            try:
+                await page.wait_for_selector("a[href$='/followers/']", timeout=20000)
+                await page.locator("a[href$='/followers/']").first.click()
+                await page.wait_for_selector("div[role='dialog']", timeout=20000)
+                usernames, _ = await self._collect_usernames(page, limit, delay_ms, harvester)
+            finally:
+                if harvester is not None:
+                    harvester.detach()
+        out = list(await asyncio.gather(*(self._ui_follower_count(uname, retry_tries, retry_base_ms) for uname in usernames)))
+        logger.info("Items recogidos (UI): %d", len(out))
+        logger.info("Count (followers del perfil): %s", str(count_val))
+        return {"username": username, "count": count_val, "followers_of_followers": out}
+
+    async def _ui_follower_count(self, uname: str, retry_tries: int, retry_base_ms: int) -> FollowerRecord:
+        METRICS.stage("ui")
+        item = FollowerRecord(uname)
+        try:
+            async with self._page() as page:
+                try:
+                    item = FollowerRecord.from_dict(await page.evaluate(*scripts.follower_count(uname, retry_tries, retry_base_ms)))
+                except Exception:
+                    pass
+                if item.followers is None:
+                    await page.goto(f"{INSTAGRAM_ORIGIN}/{uname}/", timeout=30000)
+                    item = FollowerRecord.from_dict({"username": uname, "followers": await page.evaluate(*scripts.dom_followers())})
+        except Exception:
+            pass
+        return item
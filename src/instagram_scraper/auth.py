@@ -4,7 +4,7 @@ import json
 import logging
 import time
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, Optional
 
 from cryptography.fernet import Fernet, InvalidToken
 from playwright.sync_api import Playwright, sync_playwright, TimeoutError as PlaywrightTimeout
@@ -431,13 +431,17 @@ class FacebookAuthenticator:
                 context.close()
                 browser.close()
 
-    def create_context_from_storage(self, pw: Playwright):
-        """Crea un contexto Playwright usando el storage_state descifrado."""
+    def load_storage_state(self) -> Dict[str, Any]:
+        """Descifra y devuelve el storage_state guardado por `login_with_facebook`."""
         enc_path = Path(self.config.storage_path)
         if not enc_path.exists():
             raise FileNotFoundError("No se encontró el archivo de storage cifrado. Ejecute el comando de autenticación primero.")
         decrypted = self._decrypt_to_text(enc_path)
-        storage_state = json.loads(decrypted)
-        browser = pw.chromium.launch(headless=self.config.headless)
+        return json.loads(decrypted)
+
+    def create_context_from_storage(self, pw: Playwright):
+        """Crea un contexto Playwright usando el storage_state descifrado."""
+        storage_state = self.load_storage_state()
+        browser = pw.chromium.launch(headless=self.config.headless, args=self.config.browser_args)
         context = browser.new_context(storage_state=storage_state)
         return browser, context
\ No newline at end of file
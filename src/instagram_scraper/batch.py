@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import logging
+import sys
+from collections import deque
+from contextlib import ExitStack
+from datetime import datetime
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from playwright.sync_api import Page
+
+from .browser_scraper import BrowserInstagramScraper
+from .utils import extract_username
+from . import scripts
+
+
+logger = logging.getLogger(__name__)
+
+BATCH_COMMANDS = ("scrape", "following", "followers")
+
+# Intervalo de sondeo de los trabajos en vuelo mientras ninguno ha terminado
+POLL_MS = 200
+
+_START_JOB_JS = (
+    "(call) => { window.__igJobDone = false;"
+    " window.__igJob = Promise.resolve().then(() => (" + scripts.CALL_JS + ")(call))"
+    ".then(v => ({ ok: true, value: v }), e => ({ ok: false, error: String((e && e.message) || e) }))"
+    ".then(r => { window.__igJobDone = true; return r; });"
+    " return true; }"
+)
+
+
+def read_targets(source: str) -> List[str]:
+    """Lee enlaces de perfil (uno por línea) desde un archivo, o desde stdin si `source` es "-".
+
+    Ignora líneas vacías y comentarios (#), descarta URLs inválidas con un aviso y
+    devuelve los usernames sin duplicados, en el orden de primera aparición.
+    """
+    if source == "-":
+        lines: Iterable[str] = sys.stdin
+        return _dedupe_usernames(lines)
+    with open(source, encoding="utf-8") as f:
+        return _dedupe_usernames(f)
+
+
+def _dedupe_usernames(lines: Iterable[str]) -> List[str]:
+    seen = set()
+    usernames: List[str] = []
+    for raw in lines:
+        line = raw.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            uname = extract_username(line)
+        except ValueError as e:
+            logger.warning("Entrada ignorada '%s': %s", line, e)
+            continue
+        key = uname.lower()
+        if key in seen:
+            continue
+        seen.add(key)
+        usernames.append(uname)
+    return usernames
+
+
+def _start_job(page: Page, call: scripts.IgCall) -> None:
+    """Lanza la llamada a `window.__ig` en la página sin esperar su resultado."""
+    page.evaluate(_START_JOB_JS, call[1])
+
+
+def _job_settled(page: Page) -> bool:
+    """Si el trabajo lanzado con `_start_job` ya terminó (una página caída cuenta como terminada)."""
+    try:
+        return bool(page.evaluate("() => window.__igJobDone === true"))
+    except Exception:
+        return True
+
+
+def _await_job(page: Page) -> Tuple[bool, Any]:
+    outcome = page.evaluate("() => window.__igJob")
+    if outcome.get("ok"):
+        return True, outcome.get("value")
+    return False, outcome.get("error")
+
+
+class BatchRunner:
+    """Procesa muchos perfiles con una sola sesión autenticada del pool.
+
+    Presta un único contexto con `concurrency` páginas y mantiene una consulta
+    de API en vuelo por página; los fallbacks (enriquecimiento, modo UI) se
+    resuelven en la misma página al recoger cada resultado. Los registros se
+    entregan a medida que terminan: se recoge la primera página cuyo trabajo
+    ha terminado y se le asigna el siguiente perfil, sin esperar a las demás. Si el pool tiene varias cuentas, cada
+    worker usa su propio contexto, y con él la sesión de otra cuenta.
+    """
+
+    def __init__(
+        self,
+        scraper: BrowserInstagramScraper,
+        command: str,
+        concurrency: int = 3,
+        posts_limit: Optional[int] = None,
+        posts_since: Optional[datetime] = None,
+        posts_page_size: Optional[int] = None,
+        limit: Optional[int] = None,
+        page_size: int = 12,
+        chunk: int = 2,
+        delay_ms: int = 3000,
+        retry_tries: int = 10,
+        retry_base_ms: int = 2500,
+        force_ui: bool = False,
+    ) -> None:
+        if command not in BATCH_COMMANDS:
+            raise ValueError(f"Comando no soportado en modo batch: {command}")
+        if scraper.pool is None:
+            raise ValueError("BatchRunner requiere un BrowserInstagramScraper con pool")
+        self.scraper = scraper
+        self.command = command
+        self.concurrency = max(1, concurrency)
+        self.posts_limit = posts_limit or scraper.config.posts_limit
+        self.posts_since = posts_since
+        self.posts_page_size = posts_page_size
+        self.limit = limit or 20
+        self.page_size = page_size
+        self.chunk = chunk
+        self.delay_ms = delay_ms
+        self.retry_tries = retry_tries
+        self.retry_base_ms = retry_base_ms
+        self.force_ui = force_ui
+
+    def run(self, usernames: List[str]) -> Iterator[Dict[str, Any]]:
+        pending: Deque[str] = deque(usernames)
+        if not pending:
+            return
+        workers = min(self.concurrency, len(pending))
+        with ExitStack() as stack:
+            pages = self._worker_pages(stack, workers)
+            active: Dict[int, str] = {}
+            for idx, page in enumerate(pages):
+                if pending:
+                    active[idx] = self._launch(page, pending.popleft())
+            while active:
+                idx = self._next_settled(pages, active)
+                uname = active.pop(idx)
+                yield self._collect(pages[idx], uname)
+                if pending:
+                    active[idx] = self._launch(pages[idx], pending.popleft())
+
+    def _next_settled(self, pages: List[Page], active: Dict[int, str]) -> int:
+        """Primera página (en orden de lanzamiento) cuyo trabajo terminó; sondea cada `POLL_MS` mientras ninguno termina."""
+        while True:
+            for idx in active:
+                if (self.command == "following" and self.force_ui) or _job_settled(pages[idx]):
+                    return idx
+            # Espera cediendo el control a Playwright para que sigan llegando respuestas y eventos
+            pages[next(iter(active))].wait_for_timeout(POLL_MS)
+
+    def _worker_pages(self, stack: ExitStack, workers: int) -> List[Page]:
+        """Una página por worker: pestañas de un mismo contexto o, con varias cuentas, un contexto (y una cuenta) por worker."""
+        pool = self.scraper.pool
+        if pool.accounts is None or len(pool.accounts) < 2:
+            session = stack.enter_context(pool.lease(pages=workers))
+            self.scraper._ensure_session(session.context)
+            return session.pages[:workers]
+        pages: List[Page] = []
+        for _ in range(workers):
+            session = stack.enter_context(pool.lease())
+            self.scraper._ensure_session(session.context)
+            pages.append(session.page)
+        return pages
+
+    def _call(self, username: str) -> Optional[scripts.IgCall]:
+        if self.command == "scrape":
+            return scripts.profile(username)
+        if self.command == "following":
+            if self.force_ui:
+                return None
+            return scripts.following_api(
+                username, self.limit, self.page_size, self.chunk, self.delay_ms, self.retry_tries, self.retry_base_ms
+            )
+        return scripts.followers_api(
+            username, self.limit, self.page_size, self.chunk, self.delay_ms, self.retry_tries, self.retry_base_ms
+        )
+
+    def _launch(self, page: Page, username: str) -> str:
+        call = self._call(username)
+        if call is not None:
+            logger.info("Lanzando consulta batch (%s) para %s", self.command, username)
+            _start_job(page, call)
+        return username
+
+    def _collect(self, page: Page, username: str) -> Dict[str, Any]:
+        try:
+            if self.command == "following" and self.force_ui:
+                ok, value = False, "force_ui"
+            else:
+                ok, value = _await_job(page)
+            return {"target": username, "command": self.command, "ok": True, "data": self._finish(page, username, ok, value)}
+        except Exception as e:
+            logger.error("Fallo en batch (%s) para %s: %s", self.command, username, e)
+            return {"target": username, "command": self.command, "ok": False, "error": str(e)}
+
+    def _finish(self, page: Page, username: str, ok: bool, value: Any) -> Dict[str, Any]:
+        scraper = self.scraper
+        if self.command == "scrape":
+            if not ok:
+                raise RuntimeError(value)
+            return scraper._parse_profile(value, self.posts_limit, page, self.posts_since, self.posts_page_size)
+        if self.command == "following":
+            if ok:
+                try:
+                    return scraper._enrich_following(page, value, self.retry_tries, self.retry_base_ms)
+                except Exception:
+                    pass
+            return scraper._following_from_ui(
+                page, username, self.limit, self.delay_ms, self.retry_tries, self.retry_base_ms
+            )
+        if ok:
+            return scraper._followers_result(value)
+        return scraper._followers_from_ui(
+            page, username, self.limit, self.delay_ms, self.retry_tries, self.retry_base_ms
+        )
@@ -0,0 +1,284 @@
+from __future__ import annotations
+
+import csv
+import json
+import logging
+import math
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_SUFFIXES = (".csv", ".jsonl", ".json", ".xlsx", ".parquet", ".arrow", ".feather")
+
+# Umbrales de MAD de Nigrini (conformidad cercana, aceptable, marginal; por encima: no conforme)
+MAD_THRESHOLDS = {
+    "first": (0.006, 0.012, 0.015),
+    "first_two": (0.0012, 0.0018, 0.0022),
+}
+_MAD_LABELS = ("cercana", "aceptable", "marginal", "no conforme")
+
+# Dígitos de cada prueba y su distribución de Benford: P(d) = log10(1 + 1/d)
+DIGITS = {
+    "first": np.arange(1, 10),
+    "first_two": np.arange(10, 100),
+}
+EXPECTED = {name: np.log10(1 + 1 / d) for name, d in DIGITS.items()}
+
+
+# --- Carga de conteos desde las exportaciones de `followers` ---
+
+
+def _csv_counts(path: Path) -> Iterator[Any]:
+    with path.open(newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        if "seguidores" not in header:
+            raise ValueError(f"{path}: falta la columna 'seguidores'")
+        idx = header.index("seguidores")
+        for row in reader:
+            yield row[idx] if idx < len(row) else None
+
+
+def _jsonl_counts(path: Path) -> Iterator[Any]:
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line).get("followers")
+
+
+def _json_counts(path: Path) -> Iterator[Any]:
+    data = json.loads(path.read_text(encoding="utf-8"))
+    for it in data.get("followers_of_followers") or data.get("following_details") or []:
+        yield it.get("followers")
+
+
+def _xlsx_counts(path: Path) -> Iterator[Any]:
+    from openpyxl import load_workbook
+
+    wb = load_workbook(str(path), read_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = list(next(rows, []))
+        if "seguidores" not in header:
+            raise ValueError(f"{path}: falta la columna 'seguidores'")
+        idx = header.index("seguidores")
+        for row in rows:
+            yield row[idx] if idx < len(row) else None
+    finally:
+        wb.close()
+
+
+def _arrow_counts(path: Path) -> np.ndarray:
+    from .export import _pyarrow
+
+    pa = _pyarrow()
+    if path.suffix.lower() == ".parquet":
+        import pyarrow.parquet as pq
+
+        column = pq.read_table(str(path), columns=["seguidores"]).column("seguidores")
+    else:
+        import pyarrow.ipc as ipc
+
+        with pa.memory_map(str(path)) as source:
+            column = ipc.open_file(source).read_all().column("seguidores")
+    return column.drop_null().to_numpy().astype(np.int64, copy=False)
+
+
+def _to_int64(values: Iterable[Any]) -> np.ndarray:
+    def ints() -> Iterator[int]:
+        for v in values:
+            if v is None or v == "":
+                continue
+            try:
+                yield int(v)
+            except (TypeError, ValueError):
+                continue
+
+    return np.fromiter(ints(), dtype=np.int64)
+
+
+def load_counts(path: Path) -> np.ndarray:
+    """Conteos de seguidores (int64, sin nulos) de una exportación o de todas las de un directorio."""
+    if path.is_dir():
+        files = sorted(p for p in path.iterdir() if p.suffix.lower() in SUPPORTED_SUFFIXES)
+        if not files:
+            raise ValueError(f"{path}: no hay exportaciones ({', '.join(SUPPORTED_SUFFIXES)})")
+        parts = [load_counts(p) for p in files]
+        logger.info("Leídas %d exportaciones de %s", len(files), path)
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+    suffix = path.suffix.lower()
+    if suffix in (".parquet", ".arrow", ".feather"):
+        return _arrow_counts(path)
+    readers = {".csv": _csv_counts, ".jsonl": _jsonl_counts, ".json": _json_counts, ".xlsx": _xlsx_counts}
+    if suffix not in readers:
+        raise ValueError(f"Formato no soportado: {path.name}")
+    return _to_int64(readers[suffix](path))
+
+
+# --- Dígitos y estadísticos (vectorizados) ---
+
+
+def leading_digits(counts: np.ndarray, ndigits: int = 1) -> np.ndarray:
+    """Primeros `ndigits` dígitos de cada conteo; descarta los que tienen menos cifras."""
+    x = np.asarray(counts, dtype=np.int64)
+    x = x[x >= 10 ** (ndigits - 1)]
+    # 10**floor(log10(x)) y corrección de los redondeos de coma flotante en potencias de 10
+    scale = np.power(10, np.floor(np.log10(x)).astype(np.int64))
+    scale = np.where(x >= scale * 10, scale * 10, scale)
+    scale = np.where(x < scale, scale // 10, scale)
+    return x * 10 ** (ndigits - 1) // scale
+
+
+def _chi2_sf(x: float, df: int) -> float:
+    """P(X > x) para una chi-cuadrado con `df` grados de libertad (gamma incompleta regularizada)."""
+    if x <= 0:
+        return 1.0
+    a, z = df / 2.0, x / 2.0
+    log_prefix = a * math.log(z) - z - math.lgamma(a)
+    if z < a + 1:
+        # Serie de la gamma inferior
+        term = total = 1.0 / a
+        n = a
+        for _ in range(10000):
+            n += 1
+            term *= z / n
+            total += term
+            if abs(term) < abs(total) * 1e-14:
+                break
+        return max(0.0, 1.0 - total * math.exp(log_prefix))
+    # Fracción continua (Lentz) de la gamma superior
+    tiny = 1e-300
+    b = z + 1 - a
+    c = 1 / tiny
+    d = 1 / b
+    h = d
+    for i in range(1, 10000):
+        an = -i * (i - a)
+        b += 2
+        d = an * d + b
+        d = tiny if abs(d) < tiny else d
+        c = b + an / c
+        c = tiny if abs(c) < tiny else c
+        d = 1 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1) < 1e-14:
+            break
+    return min(1.0, h * math.exp(log_prefix))
+
+
+def _ks_sf(d: float, n: int) -> float:
+    """p-valor asintótico de Kolmogorov para el estadístico `d` con `n` observaciones."""
+    lam = (math.sqrt(n) + 0.12 + 0.11 / math.sqrt(n)) * d
+    if lam < 1e-3:
+        return 1.0
+    k = np.arange(1, 101)
+    return float(min(1.0, max(0.0, 2 * np.sum((-1.0) ** (k - 1) * np.exp(-2 * (k * lam) ** 2)))))
+
+
+def _statistics(freqs: np.ndarray, n: int, expected: np.ndarray) -> Dict[str, np.ndarray]:
+    """Chi-cuadrado, MAD y KS de una o varias filas de frecuencias observadas (vectorizado)."""
+    props = freqs / n
+    return {
+        "chi2": np.sum((freqs - n * expected) ** 2 / (n * expected), axis=-1),
+        "mad": np.mean(np.abs(props - expected), axis=-1),
+        "ks": np.max(np.abs(np.cumsum(props, axis=-1) - np.cumsum(expected)), axis=-1),
+    }
+
+
+def mad_conformity(test: str, mad: float) -> str:
+    for limit, label in zip(MAD_THRESHOLDS[test], _MAD_LABELS):
+        if mad <= limit:
+            return label
+    return _MAD_LABELS[-1]
+
+
+def digit_test(
+    counts: np.ndarray,
+    test: str = "first",
+    bootstrap: int = 1000,
+    confidence: float = 0.95,
+    rng: Optional[np.random.Generator] = None,
+) -> Dict[str, Any]:
+    """Prueba de Benford (`first` o `first_two`) con intervalos bootstrap.
+
+    El bootstrap remuestrea las frecuencias de dígitos con una multinomial
+    (`bootstrap` réplicas en una sola matriz), equivalente a remuestrear los
+    conteos pero sin volver a recorrerlos.
+    """
+    digits = DIGITS[test]
+    expected = EXPECTED[test]
+    lead = leading_digits(counts, 1 if test == "first" else 2)
+    n = int(lead.size)
+    if n == 0:
+        return {"test": test, "n": 0}
+    freqs = np.bincount(lead - digits[0], minlength=digits.size).astype(np.float64)
+    stats = _statistics(freqs, n, expected)
+    chi2, mad, ks = float(stats["chi2"]), float(stats["mad"]), float(stats["ks"])
+    result: Dict[str, Any] = {
+        "test": test,
+        "n": n,
+        "digits": digits.tolist(),
+        "observed": (freqs / n).round(6).tolist(),
+        "expected": expected.round(6).tolist(),
+        "chi2": round(chi2, 4),
+        "chi2_df": int(digits.size - 1),
+        "chi2_p": _chi2_sf(chi2, digits.size - 1),
+        "mad": round(mad, 6),
+        "mad_conformity": mad_conformity(test, mad),
+        "ks": round(ks, 6),
+        "ks_critical": round(math.sqrt(-0.5 * math.log((1 - confidence) / 2)) / math.sqrt(n), 6),
+        "ks_p": _ks_sf(ks, n),
+    }
+    if bootstrap > 0:
+        rng = rng or np.random.default_rng()
+        samples = rng.multinomial(n, freqs / n, size=bootstrap).astype(np.float64)
+        boot = _statistics(samples, n, expected)
+        lo, hi = (1 - confidence) / 2 * 100, (1 + confidence) / 2 * 100
+        result["bootstrap"] = {
+            "replicas": bootstrap,
+            "confidence": confidence,
+            **{k: [round(float(v), 6) for v in np.percentile(boot[k], [lo, hi])] for k in ("chi2", "mad", "ks")},
+            "observed": np.percentile(samples / n, [lo, hi], axis=0).round(6).T.tolist(),
+        }
+    return result
+
+
+def analyze(counts: np.ndarray, bootstrap: int = 1000, confidence: float = 0.95, seed: Optional[int] = None) -> Dict[str, Any]:
+    """Informe de primer dígito y primeros dos dígitos de un arreglo de conteos de seguidores."""
+    counts = np.asarray(counts, dtype=np.int64)
+    rng = np.random.default_rng(seed)
+    return {
+        "rows": int(counts.size),
+        "zeros": int(np.count_nonzero(counts <= 0)),
+        "first": digit_test(counts, "first", bootstrap, confidence, rng),
+        "first_two": digit_test(counts, "first_two", bootstrap, confidence, rng),
+    }
+
+
+def format_report(report: Dict[str, Any]) -> List[str]:
+    """Líneas legibles del informe (tabla de primer dígito y resumen de ambas pruebas)."""
+    lines = [f"Conteos: {report['rows']} (con 0 seguidores: {report['zeros']})"]
+    first = report["first"]
+    if first.get("n"):
+        lines.append("dígito  observado  Benford")
+        for d, o, e in zip(first["digits"], first["observed"], first["expected"]):
+            lines.append(f"{d:>6}  {o:>9.4f}  {e:>7.4f}")
+    for key in ("first", "first_two"):
+        t = report[key]
+        if not t.get("n"):
+            lines.append(f"[{key}] sin datos suficientes")
+            continue
+        line = (
+            f"[{key}] n={t['n']} chi2={t['chi2']} (gl={t['chi2_df']}, p={t['chi2_p']:.4g}) "
+            f"MAD={t['mad']} ({t['mad_conformity']}) KS={t['ks']} (crítico {t['ks_critical']}, p={t['ks_p']:.4g})"
+        )
+        boot = t.get("bootstrap")
+        if boot:
+            line += f" | IC{int(boot['confidence'] * 100)}% MAD={boot['mad']} chi2={boot['chi2']}"
+        lines.append(line)
+    return lines
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import logging
+from typing import Any, Iterable, Optional
+from urllib.parse import urlparse
+
+from .config import Config
+from .metrics import METRICS
+
+
+logger = logging.getLogger(__name__)
+
+BLOCKED_TYPES = ("image", "media", "font")
+
+_ANALYTICS_HOSTS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "connect.facebook.net",
+    "scorecardresearch.com",
+)
+_ANALYTICS_PATHS = ("/ajax/bz", "/logging_client_events", "/api/v1/web/logging")
+
+
+class ResourceBlocker:
+    """Política de recursos de los contextos de scraping vía `context.route`.
+
+    Aborta imágenes, vídeo/audio y fuentes, además de los scripts y beacons
+    de analítica, y deja pasar documentos, XHR/fetch, scripts y estilos
+    propios: el scraper solo lee etiquetas meta, texto de la cabecera y JSON.
+    Cada bloqueo se cuenta en `METRICS` por tipo. Lo abortado no llega a
+    descargarse, así que su tamaño no se conoce: el ahorro se observa en los
+    bytes transferidos que `METRICS` mide por tipo de recurso, comparando con
+    una ejecución con `--load-resources`.
+
+    Es la primera ruta que se evalúa (registrar después de la caché y del
+    limitador), así lo bloqueado no consume tokens del control de tasa.
+    """
+
+    def __init__(self, types: Iterable[str] = BLOCKED_TYPES, analytics: bool = True) -> None:
+        self.types = frozenset(types)
+        self.analytics = analytics
+
+    @classmethod
+    def from_config(cls, config: Config) -> Optional["ResourceBlocker"]:
+        """Crea la política según la config; None si `block_resources` está desactivado."""
+        if not config.block_resources:
+            return None
+        return cls()
+
+    def category(self, url: str, resource_type: str) -> Optional[str]:
+        """Categoría bloqueada de una petición (`image`, `media`, `font`, `analytics`) o None si pasa."""
+        if resource_type in self.types:
+            return resource_type
+        if self.analytics and resource_type in ("script", "xhr", "fetch", "ping", "image", "other"):
+            parsed = urlparse(url)
+            host = parsed.hostname or ""
+            if any(host == h or host.endswith("." + h) for h in _ANALYTICS_HOSTS):
+                return "analytics"
+            if any(parsed.path.startswith(p) for p in _ANALYTICS_PATHS):
+                return "analytics"
+        return None
+
+    def _record(self, kind: str) -> None:
+        METRICS.blocked(kind)
+
+    # --- Integración con Playwright (context.route) ---
+
+    def route_context(self, context: Any) -> None:
+        """Aplica la política a todas las peticiones de un contexto (API síncrona)."""
+        context.route("**/*", self._handle_route)
+
+    async def route_context_async(self, context: Any) -> None:
+        await context.route("**/*", self._handle_route_async)
+
+    def _handle_route(self, route: Any) -> None:
+        request = route.request
+        kind = self.category(request.url, request.resource_type)
+        if kind is None:
+            route.fallback()
+            return
+        self._record(kind)
+        route.abort("blockedbyclient")
+
+    async def _handle_route_async(self, route: Any) -> None:
+        request = route.request
+        kind = self.category(request.url, request.resource_type)
+        if kind is None:
+            await route.fallback()
+            return
+        self._record(kind)
+        await route.abort("blockedbyclient")
@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+import logging
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Any, Dict, Iterator, List, Optional
+
+from playwright.sync_api import Browser, BrowserContext, Page, Playwright, sync_playwright
+
+from .accounts import Account, AccountPool
+from .auth import FacebookAuthenticator
+from .blocking import ResourceBlocker
+from .cache import ProfileCache
+from .config import Config
+from .metrics import METRICS
+from .ratelimit import AdaptiveRateLimiter
+from .utils import INSTAGRAM_HOME, INSTAGRAM_ORIGIN
+from . import scripts
+
+
+logger = logging.getLogger(__name__)
+
+
+def attach_network(
+    context: BrowserContext,
+    cache: Optional[ProfileCache] = None,
+    limiter: Optional[AdaptiveRateLimiter] = None,
+    blocker: Optional[ResourceBlocker] = None,
+    accounts: Optional[AccountPool] = None,
+    account: Optional[Account] = None,
+) -> None:
+    """Conecta al contexto la biblioteca `window.__ig`, las métricas, el limitador de tasa, la caché y la política de recursos.
+
+    Las rutas se evalúan en orden inverso al registro: primero el bloqueo de
+    recursos, luego la caché y por último el limitador (o, con `account`, el
+    turno de esa cuenta en `accounts`).
+    """
+    scripts.install_helpers(context)
+    METRICS.instrument_context(context)
+    fetch = None
+    if limiter is not None:
+        limiter.route_context(context)
+        fetch = limiter.fetch
+    if accounts is not None and account is not None:
+        accounts.route_context(context, account)
+        fetch = partial(accounts.fetch, account=account)
+    if cache is not None:
+        cache.route_context(context, fetch=fetch)
+    if blocker is not None:
+        blocker.route_context(context)
+
+
+@dataclass(slots=True)
+class PooledSession:
+    """Contexto autenticado de larga vida prestado por `BrowserPool`."""
+
+    context: BrowserContext
+    pages: List[Page]
+    account: Optional[Account] = None
+    uses: int = 0
+    created_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def page(self) -> Page:
+        return self.pages[0]
+
+
+class BrowserPool:
+    """Pool de contextos Playwright reutilizables entre llamadas del scraper.
+
+    Chromium se lanza una sola vez y el storage_state se descifra una sola vez;
+    cada contexto se crea con esa sesión, carga la home de Instagram y queda
+    listo para prestarse. Antes de cada préstamo se comprueba su salud y, tras
+    `max_uses` préstamos, se cierra y se reemplaza por uno nuevo. Con `cache`,
+    cada contexto sirve `web_profile_info` y el HTML de perfiles desde la caché;
+    con `limiter`, todos los contextos comparten el mismo control de tasa. Con
+    `config.block_resources`, no descargan imágenes, vídeo, fuentes ni analítica.
+
+    Con `accounts`, cada contexto nuevo usa la sesión de la cuenta que le asigna
+    el planificador (sin pausa y con menos contextos) en lugar de la sesión
+    única de `auth`, y sus peticiones siguen el ritmo y el presupuesto de esa
+    cuenta. Los contextos de cuentas en pausa no se prestan hasta que termina.
+
+    La API síncrona de Playwright no es thread-safe: un pool pertenece al hilo
+    que lo crea.
+    """
+
+    def __init__(
+        self,
+        config: Config,
+        auth: Optional[FacebookAuthenticator] = None,
+        size: Optional[int] = None,
+        max_uses: Optional[int] = None,
+        cache: Optional[ProfileCache] = None,
+        limiter: Optional[AdaptiveRateLimiter] = None,
+        accounts: Optional[AccountPool] = None,
+    ) -> None:
+        self.config = config
+        self.auth = auth or FacebookAuthenticator(config)
+        self.accounts = accounts
+        self.size = max(1, size if size is not None else config.pool_size)
+        self.max_uses = max(1, max_uses if max_uses is not None else config.pool_max_uses)
+        self.cache = cache
+        self.limiter = limiter
+        self.blocker = ResourceBlocker.from_config(config)
+        self._pw: Optional[Playwright] = None
+        self._browser: Optional[Browser] = None
+        self._storage_state: Optional[Dict[str, Any]] = None
+        self._idle: List[PooledSession] = []
+
+    def __enter__(self) -> "BrowserPool":
+        self.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def start(self) -> None:
+        if self._pw is not None:
+            return
+        self._pw = sync_playwright().start()
+        if self.accounts is not None:
+            return
+        try:
+            self._storage_state = self.auth.load_storage_state()
+        except FileNotFoundError:
+            logger.warning("No hay storage de autenticación; el pool usará contextos sin sesión")
+            self._storage_state = None
+
+    def close(self) -> None:
+        for session in self._idle:
+            self._dispose(session)
+        self._idle.clear()
+        if self._browser is not None:
+            try:
+                self._browser.close()
+            except Exception:
+                pass
+            self._browser = None
+        if self._pw is not None:
+            self._pw.stop()
+            self._pw = None
+
+    @contextmanager
+    def lease(self, pages: int = 1) -> Iterator[PooledSession]:
+        """Presta un contexto sano con al menos `pages` páginas en la home de Instagram."""
+        session = self._acquire(max(1, pages))
+        healthy = True
+        try:
+            yield session
+        except BaseException:
+            healthy = self._is_healthy(session)
+            raise
+        finally:
+            self._release(session, healthy)
+
+    def _ensure_browser(self) -> Browser:
+        if self._pw is None:
+            self.start()
+        if self._browser is None or not self._browser.is_connected():
+            logger.info("Lanzando Chromium para el pool")
+            self._browser = self._pw.chromium.launch(headless=self.config.headless, args=self.config.browser_args)
+        return self._browser
+
+    def _new_session(self) -> PooledSession:
+        browser = self._ensure_browser()
+        account = self.accounts.checkout() if self.accounts is not None else None
+        try:
+            if account is not None:
+                logger.info("Nuevo contexto del pool con la cuenta %s", account.name)
+                context = browser.new_context(storage_state=account.storage_state)
+            elif self._storage_state is not None:
+                context = browser.new_context(storage_state=self._storage_state)
+            else:
+                context = browser.new_context()
+            attach_network(context, self.cache, self.limiter, self.blocker, self.accounts, account)
+            page = context.new_page()
+            page.goto(INSTAGRAM_HOME, timeout=30000)
+        except BaseException:
+            if account is not None:
+                self.accounts.checkin(account)
+            raise
+        return PooledSession(context=context, pages=[page], account=account)
+
+    def _parked(self, session: PooledSession) -> bool:
+        return self.accounts is not None and session.account is not None and self.accounts.parked(session.account)
+
+    def _acquire(self, pages: int) -> PooledSession:
+        for i in range(len(self._idle) - 1, -1, -1):
+            if self._parked(self._idle[i]):
+                continue
+            session = self._idle.pop(i)
+            if self._is_healthy(session):
+                break
+            logger.info("Descartando contexto no saludable del pool")
+            self._dispose(session)
+        else:
+            session = self._new_session()
+        while len(session.pages) < pages:
+            extra = session.context.new_page()
+            extra.goto(INSTAGRAM_HOME, timeout=30000)
+            session.pages.append(extra)
+        return session
+
+    def _release(self, session: PooledSession, healthy: bool) -> None:
+        session.uses += 1
+        if healthy and len(self._idle) >= self.size and not self._parked(session):
+            # Deja sitio a un contexto usable antes que a uno de una cuenta en pausa
+            for i, idle in enumerate(self._idle):
+                if self._parked(idle):
+                    self._dispose(self._idle.pop(i))
+                    break
+        if not healthy or session.uses >= self.max_uses or len(self._idle) >= self.size:
+            if session.uses >= self.max_uses:
+                logger.info("Reciclando contexto del pool tras %d usos", session.uses)
+            self._dispose(session)
+            return
+        self._idle.append(session)
+
+    def _is_healthy(self, session: PooledSession) -> bool:
+        """Comprueba navegador y páginas; devuelve a la home las que quedaron fuera de Instagram."""
+        try:
+            if self._browser is None or not self._browser.is_connected():
+                return False
+            for page in session.pages:
+                if page.is_closed():
+                    return False
+                origin = page.evaluate("() => location.origin")
+                if origin != INSTAGRAM_ORIGIN:
+                    page.goto(INSTAGRAM_HOME, timeout=30000)
+            return True
+        except Exception:
+            return False
+
+    def _dispose(self, session: PooledSession) -> None:
+        if session.account is not None and self.accounts is not None:
+            self.accounts.checkin(session.account)
+            session.account = None
+        try:
+            session.context.close()
+        except Exception:
+            pass
@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import html as _html
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+from .config import Config
+from . import profiles
+
+
+logger = logging.getLogger(__name__)
+
+# Campos cacheados por username; cada uno guarda su propia marca de tiempo.
+FIELDS = ("user", "html")
+
+_PROFILE_API_PATH = "/api/v1/users/web_profile_info/"
+_PROFILE_PAGE_RE = re.compile(r"^/([A-Za-z0-9._]+)/$")
+_RESERVED_PATHS = {"accounts", "explore", "direct", "reels", "stories", "p", "api"}
+
+
+class ProfileCache:
+    """Caché persistente en SQLite de `web_profile_info` y de las etiquetas og del perfil.
+
+    Cada fila se indexa por username (en minúsculas) y guarda por separado el
+    `data.user` de la API (`user`) y el og:title/og:description del HTML
+    (`html`), cada uno con su marca de tiempo: un campo caduca a los `ttl`
+    segundos sin invalidar el otro. Con más de `max_entries` filas se expulsan
+    las de acceso más antiguo (LRU).
+
+    Es segura entre hilos; los motores de navegador la conectan vía
+    `context.route` (`route_context` / `route_context_async`) y el backend
+    HTTP la consulta directamente.
+    """
+
+    def __init__(self, path: str, ttl: int = 86400, max_entries: int = 50000) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS profiles ("
+            " username TEXT PRIMARY KEY,"
+            " user_json TEXT, user_at REAL,"
+            " html_json TEXT, html_at REAL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS profiles_accessed ON profiles(accessed_at)")
+        self._conn.commit()
+
+    @classmethod
+    def from_config(cls, config: Config, ttl: Optional[int] = None) -> Optional["ProfileCache"]:
+        """Crea la caché según la config; devuelve None si el TTL efectivo es 0 o negativo."""
+        ttl = config.cache_ttl if ttl is None else ttl
+        if ttl <= 0:
+            return None
+        return cls(config.cache_path, ttl=ttl, max_entries=config.cache_max_entries)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+        if self.hits or self.misses:
+            logger.info("Caché de perfiles: %d aciertos, %d fallos", self.hits, self.misses)
+
+    def get(self, username: str, field: str, max_age: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Devuelve el campo si existe y tiene menos de `max_age` segundos (por defecto `ttl`)."""
+        if field not in FIELDS:
+            raise ValueError(f"Campo de caché desconocido: {field}")
+        key = username.lower()
+        now = time.time()
+        age_limit = self.ttl if max_age is None else max_age
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {field}_json, {field}_at FROM profiles WHERE username = ?", (key,)
+            ).fetchone()
+            if row is None or row[0] is None or now - row[1] > age_limit:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE profiles SET accessed_at = ? WHERE username = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, username: str, field: str, value: Dict[str, Any]) -> None:
+        if field not in FIELDS:
+            raise ValueError(f"Campo de caché desconocido: {field}")
+        key = username.lower()
+        now = time.time()
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                f"INSERT INTO profiles (username, {field}_json, {field}_at, accessed_at) VALUES (?, ?, ?, ?)"
+                f" ON CONFLICT(username) DO UPDATE SET {field}_json = excluded.{field}_json,"
+                f" {field}_at = excluded.{field}_at, accessed_at = excluded.accessed_at",
+                (key, payload, now, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM profiles").fetchone()
+        extra = count - self.max_entries
+        if extra > 0:
+            self._conn.execute(
+                "DELETE FROM profiles WHERE username IN (SELECT username FROM profiles ORDER BY accessed_at LIMIT ?)",
+                (extra,),
+            )
+
+    # --- Integración con Playwright (context.route) ---
+
+    def route_context(self, context: Any, fetch: Optional[Callable[[Any], Any]] = None) -> None:
+        """Sirve desde la caché los fetch de `web_profile_info` y del HTML de perfiles (API síncrona).
+
+        `fetch(route)` resuelve los fallos de caché (por defecto `route.fetch()`);
+        permite pasarlos por `AdaptiveRateLimiter.fetch`.
+        """
+        context.route(lambda url: self._route_key(url) is not None, lambda route: self._handle_route(route, fetch))
+
+    async def route_context_async(self, context: Any, fetch: Optional[Callable[[Any], Awaitable[Any]]] = None) -> None:
+        """Igual que `route_context` para un `BrowserContext` de `playwright.async_api`."""
+        await context.route(
+            lambda url: self._route_key(url) is not None, lambda route: self._handle_route_async(route, fetch)
+        )
+
+    def _route_key(self, url: str) -> Optional[tuple]:
+        parsed = urlparse(url)
+        if parsed.path == _PROFILE_API_PATH:
+            username = (parse_qs(parsed.query).get("username") or [None])[0]
+            return ("user", username) if username else None
+        m = _PROFILE_PAGE_RE.match(parsed.path)
+        if m and not parsed.query and m.group(1) not in _RESERVED_PATHS:
+            return ("html", m.group(1))
+        return None
+
+    def _cached_body(self, request: Any) -> Optional[tuple]:
+        """(field, username, cuerpo cacheado o None) para un fetch cacheable; None si no aplica."""
+        if request.method != "GET" or request.resource_type not in ("fetch", "xhr"):
+            return None
+        field, username = self._route_key(request.url)
+        value = self.get(username, field)
+        if value is None:
+            return field, username, None
+        if field == "user":
+            return field, username, ("application/json", json.dumps({"data": {"user": value}, "status": "ok"}))
+        return field, username, ("text/html; charset=utf-8", _og_html(value))
+
+    def _store(self, field: str, username: str, status: int, body: str) -> None:
+        if status != 200:
+            return
+        try:
+            if field == "user":
+                user = (json.loads(body).get("data") or {}).get("user")
+                if user:
+                    self.put(username, "user", user)
+            else:
+                meta = profiles.parse_og_meta(body)
+                if meta.get("og:title") or meta.get("og:description"):
+                    self.put(username, "html", {k: meta.get(k) for k in ("og:title", "og:description")})
+        except Exception as e:
+            logger.debug("No se pudo cachear %s de %s: %s", field, username, e)
+
+    def _handle_route(self, route: Any, fetch: Optional[Callable[[Any], Any]] = None) -> None:
+        cached = self._cached_body(route.request)
+        if cached is None:
+            route.fallback()
+            return
+        field, username, body = cached
+        if body is not None:
+            route.fulfill(status=200, content_type=body[0], body=body[1])
+            return
+        response = fetch(route) if fetch is not None else route.fetch()
+        self._store(field, username, response.status, response.text())
+        route.fulfill(response=response)
+
+    async def _handle_route_async(self, route: Any, fetch: Optional[Callable[[Any], Awaitable[Any]]] = None) -> None:
+        cached = self._cached_body(route.request)
+        if cached is None:
+            await route.fallback()
+            return
+        field, username, body = cached
+        if body is not None:
+            await route.fulfill(status=200, content_type=body[0], body=body[1])
+            return
+        response = await (fetch(route) if fetch is not None else route.fetch())
+        self._store(field, username, response.status, await response.text())
+        await route.fulfill(response=response)
+
+
+def _og_html(meta: Dict[str, Any]) -> str:
+    """HTML mínimo con las etiquetas og cacheadas, suficiente para los parsers de los scripts."""
+    tags = "".join(
+        f'<meta property="{k}" content="{_html.escape(v or "", quote=True)}">' for k, v in meta.items() if v
+    )
+    return f"<!DOCTYPE html><html><head>{tags}</head><body></body></html>"
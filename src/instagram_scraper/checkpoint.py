@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Type, Union
+
+from .records import RECORD_TYPES, Record, RecordColumns
+
+
+logger = logging.getLogger(__name__)
+
+# Una página de friendships: (usernames, next_max_id)
+PageFetcher = Callable[[Optional[str]], Tuple[List[str], Optional[str]]]
+
+
+class CrawlCheckpoint:
+    """Estado reanudable de un recorrido `following`/`followers`.
+
+    Guarda el perfil objetivo, el cursor `next_max_id` de la siguiente página,
+    los usernames ya paginados pero aún sin consultar (`pending`) y cuántos se
+    completaron. Los resultados parciales se añaden a un `.jsonl` junto al
+    `.json` de estado; ambos se reescriben tras cada página y cada lote, de
+    modo que un proceso interrumpido continúa sin repetir páginas completadas.
+    El estado guarda el tamaño del `.jsonl` tras cada lote: si el proceso se
+    corta entre la escritura de un lote y la del estado, al cargar se recorta
+    el `.jsonl` a ese tamaño y el lote se repite sin duplicar filas.
+
+    Sin `path` el estado vive solo en memoria (recorridos no reanudables). Con
+    `keep_path`, `path` es temporal y `keep` lo mueve a `keep_path`.
+    `record_type` (`FollowingRecord`/`FollowerRecord`) es el tipo con el que
+    `results` devuelve lo guardado; los registros solo pasan a dict al
+    escribirse en el `.jsonl`.
+    """
+
+    def __init__(
+        self, path: Optional[Path] = None, record_type: Optional[Type[Any]] = None, keep_path: Optional[Path] = None
+    ) -> None:
+        self.path = path
+        self.record_type = record_type
+        self.results_path = path.with_suffix(".jsonl") if path is not None else None
+        self.keep_path = keep_path
+        self.results_size = 0
+        self.target: Optional[Dict[str, Any]] = None
+        self.cursor: Optional[str] = None
+        self.started = False
+        self.exhausted = False
+        self.pending: List[str] = []
+        self.done = 0
+
+    @classmethod
+    def open(cls, directory: str, command: str, username: str, resume: bool = False) -> "CrawlCheckpoint":
+        """Checkpoint de `command` sobre `username`; con `resume` carga el estado previo si existe.
+
+        Sin `resume` el estado se escribe en un directorio temporal y solo pasa
+        a `directory` (con `keep`) si el recorrido queda a medias.
+        """
+        path = Path(directory) / f"{command}_{username.lower()}.json"
+        cp = cls(path, RECORD_TYPES.get(command))
+        if resume and path.exists():
+            cp._load()
+            logger.info("Reanudando %s de %s: %d usuarios completados, %d pendientes", command, username, cp.done, len(cp.pending))
+            return cp
+        if resume:
+            logger.info("No hay checkpoint previo para %s de %s; se empieza de cero", command, username)
+        cp.clear()
+        if not resume:
+            temp = Path(tempfile.mkdtemp(prefix="ig-checkpoint-")) / path.name
+            cp = cls(temp, cp.record_type, keep_path=path)
+        return cp
+
+    @property
+    def complete(self) -> bool:
+        return self.exhausted and not self.pending
+
+    def _load(self) -> None:
+        state = json.loads(self.path.read_text(encoding="utf-8"))
+        self.target = state.get("target")
+        self.cursor = state.get("cursor")
+        self.started = bool(state.get("started"))
+        self.exhausted = bool(state.get("exhausted"))
+        self.pending = list(state.get("pending") or [])
+        self.done = int(state.get("done") or 0)
+        size = state.get("results_size")
+        if size is not None and self.results_path.exists() and self.results_path.stat().st_size > size:
+            # Lote escrito en el .jsonl pero no registrado en el estado: se descarta y se vuelve a consultar
+            logger.info("Descartando del checkpoint resultados no confirmados en %s", self.results_path)
+            os.truncate(self.results_path, size)
+        self.results_size = int(size or 0)
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        state = {
+            "target": self.target,
+            "cursor": self.cursor,
+            "started": self.started,
+            "exhausted": self.exhausted,
+            "pending": self.pending,
+            "done": self.done,
+            "results_size": self.results_size,
+        }
+        tmp = self.path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(state, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def clear(self) -> None:
+        """Borra el estado y los resultados parciales en disco y reinicia el recorrido."""
+        self.target = None
+        self.cursor = None
+        self.started = False
+        self.exhausted = False
+        self.pending = []
+        self.done = 0
+        self.results_size = 0
+        if self.path is not None:
+            for p in (self.path, self.results_path):
+                if p.exists():
+                    p.unlink()
+            if self.keep_path is not None:
+                shutil.rmtree(self.path.parent, ignore_errors=True)
+
+    def keep(self) -> None:
+        """Mueve un checkpoint temporal a su ruta definitiva para continuar con `--resume`."""
+        if self.path is None or self.keep_path is None:
+            return
+        self.save()
+        self.keep_path.parent.mkdir(parents=True, exist_ok=True)
+        keep_results = self.keep_path.with_suffix(".jsonl")
+        if self.results_path.exists():
+            shutil.move(str(self.results_path), str(keep_results))
+        elif keep_results.exists():
+            keep_results.unlink()
+        shutil.move(str(self.path), str(self.keep_path))
+        shutil.rmtree(self.path.parent, ignore_errors=True)
+        self.path, self.results_path, self.keep_path = self.keep_path, keep_results, None
+
+    def set_target(self, target: Dict[str, Any]) -> None:
+        self.target = target
+        self.save()
+
+    def page_loaded(self, usernames: List[str], next_max_id: Optional[str], limit: Optional[int]) -> None:
+        room = None if limit is None else max(0, limit - self.done - len(self.pending))
+        self.pending.extend(usernames if room is None else usernames[:room])
+        self.cursor = next_max_id
+        self.started = True
+        self.exhausted = (not next_max_id) or (limit is not None and self.done + len(self.pending) >= limit)
+        self.save()
+
+    def batch_done(self, items: List[Record]) -> None:
+        if self.results_path is not None:
+            with self.results_path.open("a", encoding="utf-8") as f:
+                for it in items:
+                    f.write(json.dumps(it.to_dict(), ensure_ascii=False) + "\n")
+            self.results_size = self.results_path.stat().st_size
+        del self.pending[: len(items)]
+        self.done += len(items)
+        self.save()
+
+    def results(self) -> Iterator[Record]:
+        """Resultados ya guardados por ejecuciones anteriores, en orden."""
+        if self.results_path is None or not self.results_path.exists():
+            return
+        with self.results_path.open(encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    data = json.loads(line)
+                    yield self.record_type.from_dict(data) if self.record_type is not None else data
+
+    def batches(self, fetch_page: PageFetcher, limit: Optional[int], chunk: int) -> Iterator[List[str]]:
+        """Lotes de `chunk` usernames por consultar, pidiendo páginas solo cuando hacen falta.
+
+        Tras procesar cada lote, el llamador debe registrar sus resultados con
+        `batch_done` antes de pedir el siguiente.
+        """
+        size = max(1, chunk)
+        if limit is not None and self.done >= limit:
+            self.pending = []
+            self.exhausted = True
+        while True:
+            while len(self.pending) >= size or (self.pending and self.exhausted):
+                batch = self.pending[:size]
+                done_before = self.done
+                yield batch
+                if self.done == done_before:
+                    raise RuntimeError("Lote sin registrar en el checkpoint (falta batch_done)")
+            if self.exhausted:
+                return
+            if self.started and not self.cursor:
+                self.exhausted = True
+                self.save()
+                continue
+            users, next_max_id = fetch_page(self.cursor)
+            self.page_loaded(users, next_max_id, limit)
+
+
+class PostCheckpoint:
+    """Estado reanudable de una exportación de posts (`posts`).
+
+    Guarda el `NodeIterator` congelado de Instaloader (`freeze()._asdict()`:
+    cursor de la página, lo que quedaba de ella y su fecha de caducidad),
+    cuántos posts se escribieron ya y en qué archivo. Sin `path` vive solo en
+    memoria.
+    """
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        self.path = path
+        self.iterator: Optional[Dict[str, Any]] = None
+        self.written = 0
+        self.output: Optional[str] = None
+
+    @classmethod
+    def open(cls, directory: str, username: str, resume: bool = False) -> "PostCheckpoint":
+        cp = cls(Path(directory) / f"posts_{username.lower()}.json")
+        if resume and cp.path.exists():
+            state = json.loads(cp.path.read_text(encoding="utf-8"))
+            cp.iterator = state.get("iterator")
+            cp.written = int(state.get("written") or 0)
+            cp.output = state.get("output")
+            logger.info("Reanudando posts de %s: %d ya exportados en %s", username, cp.written, cp.output)
+        else:
+            if resume:
+                logger.info("No hay checkpoint previo de posts de %s; se empieza de cero", username)
+            cp.clear()
+        return cp
+
+    def save(self, iterator: Dict[str, Any], written: int, output: Optional[str] = None) -> None:
+        self.iterator = iterator
+        self.written = written
+        self.output = output or self.output
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        state = {"iterator": self.iterator, "written": self.written, "output": self.output}
+        tmp = self.path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(state, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def clear(self) -> None:
+        self.iterator = None
+        self.written = 0
+        self.output = None
+        if self.path is not None and self.path.exists():
+            self.path.unlink()
+
+
+def _collection(cp: CrawlCheckpoint, items: Iterator[Record]) -> Union[RecordColumns, List[Record]]:
+    if cp.record_type is None:
+        return list(items)
+    return RecordColumns(cp.record_type, items)
+
+
+def collect_resumable(items: Iterator[Record], cp: CrawlCheckpoint, what: str) -> Union[RecordColumns, List[Record]]:
+    """Consume `items` en un `RecordColumns`; si el recorrido se corta, devuelve lo guardado en el checkpoint."""
+    try:
+        return _collection(cp, items)
+    except Exception as e:
+        logger.error("Recorrido de %s interrumpido: %s. Progreso guardado en %s; repita con --resume", what, e, cp.path)
+        return _collection(cp, cp.results())
+
+
+def resumable_following_result(username: str, cp: CrawlCheckpoint, items: Union[RecordColumns, List[Record]]) -> Dict[str, Any]:
+    target = cp.target or {}
+    return {
+        "username": target.get("username") or username,
+        "following_count": target.get("following_count"),
+        "scraped_count": len(items),
+        "following_details": items,
+    }
+
+
+def resumable_followers_result(username: str, cp: CrawlCheckpoint, items: Union[RecordColumns, List[Record]]) -> Dict[str, Any]:
+    target = cp.target or {}
+    return {
+        "username": target.get("username") or username,
+        "count": target.get("followers_count"),
+        "scraped_count": len(items),
+        "followers_of_followers": items,
+    }
@@ -1,14 +1,79 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
 import json
 import logging
+import re
+import sys
+import time
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
 from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
 
-from .config import load_config
+from .accounts import AccountPool, session_files, session_path
+from .config import Config, load_config
 from .scraper import InstagramScraper
 from .auth import FacebookAuthenticator
 from .browser_scraper import BrowserInstagramScraper
+from .browser_pool import BrowserPool
+from .http_scraper import HttpInstagramScraper
+from .async_browser_scraper import AsyncBrowserInstagramScraper
+from .batch import BatchRunner, read_targets
+from .cache import ProfileCache
+from .metrics import METRICS
+from .ratelimit import AdaptiveRateLimiter
+from .checkpoint import CrawlCheckpoint, PostCheckpoint
+from .delta import DeltaCheckpoint
+from .graph import GraphCrawler, GraphStore, bfs_priority, bfs_priority_with_private
+from . import export
+from .records import Record, to_jsonable
+from .utils import extract_username
+
+
+def _add_target_arguments(sub: argparse.ArgumentParser) -> None:
+    target = sub.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="Enlace del perfil de Instagram")
+    target.add_argument("--urls-file", default=None, help="Modo batch: archivo con un enlace por línea ('-' para leer de stdin)")
+    sub.add_argument("--concurrency", type=int, default=3, help="Modo batch: perfiles en paralelo (páginas del navegador o hilos HTTP)")
+    sub.add_argument(
+        "--engine",
+        choices=["browser", "http", "async"],
+        default="browser",
+        help="browser (Playwright), http (sin navegador, reutiliza la sesión guardada) o async (Playwright asyncio, solo modo batch)",
+    )
+    _add_runtime_arguments(sub)
+
+
+def _add_runtime_arguments(sub: argparse.ArgumentParser) -> None:
+    sub.add_argument("--cache-ttl", type=int, default=None, help="Segundos de validez de la caché de perfiles (por defecto PROFILE_CACHE_TTL)")
+    sub.add_argument("--no-cache", action="store_true", help="No leer ni escribir la caché persistente de perfiles")
+    sub.add_argument("--rate", type=float, default=None, help="Tasa inicial del control adaptativo en peticiones/s (por defecto RATE_LIMIT_INITIAL)")
+    sub.add_argument("--no-rate-limit", action="store_true", help="Desactivar el control de tasa adaptativo y usar solo --delay-ms/--chunk")
+    sub.add_argument("--load-resources", action="store_true", help="No bloquear imágenes, vídeo, fuentes ni analítica en el navegador")
+    sub.add_argument("--accounts-dir", default=None, help="Directorio con una sesión por cuenta (por defecto ACCOUNTS_DIR); motor http y batch del navegador")
+    sub.add_argument("--metrics-dir", default=None, help="Directorio para metrics.json y metrics.prom (por defecto METRICS_DIR)")
+
+
+def _parse_date(value: str) -> datetime:
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"fecha inválida: {value!r} (use YYYY-MM-DD)")
+    # Las fechas de los posts son UTC sin zona
+    return moment.astimezone(timezone.utc).replace(tzinfo=None) if moment.tzinfo else moment
+
+
+def _posts_kwargs(args: argparse.Namespace) -> Dict[str, Any]:
+    """Opciones de paginación del timeline de `scrape` (motores browser y async)."""
+    kwargs: Dict[str, Any] = {}
+    if getattr(args, "since", None) is not None:
+        kwargs["since"] = args.since
+    if getattr(args, "posts_page_size", None):
+        kwargs["page_size"] = args.posts_page_size
+    return kwargs
 
 
 def build_parser() -> argparse.ArgumentParser:
@@ -18,45 +83,462 @@ def build_parser() -> argparse.ArgumentParser:
     # Subcomando de autenticación
     auth_parser = subparsers.add_parser("auth", help="Autenticación con Facebook y guardado de sesión")
     auth_parser.add_argument("--headless", type=str, default=None, help="true/false para ejecutar en modo headless")
+    auth_parser.add_argument("--account", default=None, help="Guardar la sesión como una cuenta más en ACCOUNTS_DIR (<nombre>.enc) para repartir la carga")
 
     # Subcomando de scraping con sesión Playwright
     scrape_parser = subparsers.add_parser("scrape", help="Scrapear perfil usando sesión autenticada")
-    scrape_parser.add_argument("--url", required=True, help="Enlace del perfil de Instagram")
-    scrape_parser.add_argument("--posts", type=int, default=None, help="Cantidad de posts recientes (por defecto POSTS_LIMIT)")
+    _add_target_arguments(scrape_parser)
+    scrape_parser.add_argument("--posts", type=int, default=None, help="Cantidad de posts recientes (por defecto POSTS_LIMIT); más allá de la primera página se pagina el timeline")
+    scrape_parser.add_argument("--since", type=_parse_date, default=None, help="Solo posts desde esta fecha (YYYY-MM-DD o ISO 8601, UTC); corta la paginación al pasarla")
+    scrape_parser.add_argument("--posts-page-size", type=int, default=None, help="Posts por página del timeline (por defecto POSTS_PAGE_SIZE)")
     scrape_parser.add_argument("--output", type=Path, default=None, help="Archivo de salida JSON (opcional)")
 
     followers_parser = subparsers.add_parser("followers", help="Listar seguidores y conteos de sus seguidores")
-    followers_parser.add_argument("--url", required=True, help="Enlace del perfil de Instagram")
+    _add_target_arguments(followers_parser)
     followers_parser.add_argument("--limit", type=int, default=20, help="Cantidad de seguidores a consultar")
-    followers_parser.add_argument("--output", type=Path, default=None, help="Archivo de salida JSON (opcional)")
+    followers_parser.add_argument("--output", type=Path, default=None, help="Archivo de salida (.xlsx/.csv/.jsonl/.parquet/.arrow se escriben por filas; otro formato, JSON)")
     followers_parser.add_argument("--page-size", type=int, default=12, help="Tamaño de página para paginación")
     followers_parser.add_argument("--chunk", type=int, default=2, help="Tamaño de lote para consultas de detalle")
-    followers_parser.add_argument("--delay-ms", type=int, default=3000, help="Retraso entre páginas/lotes en ms")
+    followers_parser.add_argument("--delay-ms", type=int, default=None, help="Retraso fijo entre páginas/lotes en ms (por defecto 0 con control de tasa, 3000 sin él)")
     followers_parser.add_argument("--retry-tries", type=int, default=10, help="Intentos de reintento ante 429/0")
     followers_parser.add_argument("--retry-base-ms", type=int, default=2500, help="Base de backoff en ms")
+    followers_parser.add_argument("--resume", action="store_true", help="Reanudar desde el checkpoint de la ejecución anterior")
+    followers_parser.add_argument("--delta", action="store_true", help="Recorrido incremental: solo páginas y usuarios nuevos respecto de la instantánea anterior")
+    followers_parser.add_argument("--delta-stop", type=int, default=None, help="--delta: usuarios conocidos seguidos que cortan la paginación (por defecto DELTA_STOP_AFTER)")
+    followers_parser.add_argument("--flush-every", type=int, default=None, help="Exportación por filas: vaciar a disco cada N registros (por defecto EXPORT_FLUSH_EVERY)")
 
     # Subcomando de seguidos (following) y detalles
     following_parser = subparsers.add_parser("following", help="Listar seguidos del perfil y detalles por usuario")
-    following_parser.add_argument("--url", required=True, help="Enlace del perfil de Instagram")
+    _add_target_arguments(following_parser)
     following_parser.add_argument("--limit", type=int, default=20, help="Cantidad de seguidos a consultar")
-    following_parser.add_argument("--output", type=Path, default=None, help="Archivo de salida (.xlsx/.csv recomendado)")
+    following_parser.add_argument("--output", type=Path, default=None, help="Archivo de salida (.xlsx/.csv/.jsonl/.parquet/.arrow se escriben por filas; otro formato, JSON)")
     following_parser.add_argument("--page-size", type=int, default=12, help="Tamaño de página para paginación")
     following_parser.add_argument("--chunk", type=int, default=2, help="Tamaño de lote para consultas de detalle")
-    following_parser.add_argument("--delay-ms", type=int, default=3000, help="Retraso entre páginas/lotes en ms")
+    following_parser.add_argument("--delay-ms", type=int, default=None, help="Retraso fijo entre páginas/lotes en ms (por defecto 0 con control de tasa, 3000 sin él)")
     following_parser.add_argument("--retry-tries", type=int, default=10, help="Intentos de reintento ante 429/0")
     following_parser.add_argument("--retry-base-ms", type=int, default=2500, help="Base de backoff en ms")
+    following_parser.add_argument("--resume", action="store_true", help="Reanudar desde el checkpoint de la ejecución anterior")
+    following_parser.add_argument("--delta", action="store_true", help="Recorrido incremental: solo páginas y usuarios nuevos respecto de la instantánea anterior")
+    following_parser.add_argument("--delta-stop", type=int, default=None, help="--delta: usuarios conocidos seguidos que cortan la paginación (por defecto DELTA_STOP_AFTER)")
+    following_parser.add_argument("--flush-every", type=int, default=None, help="Exportación por filas: vaciar a disco cada N registros (por defecto EXPORT_FLUSH_EVERY)")
     following_parser.add_argument("--force-ui", action="store_true", help="Forzar modo UI (diálogo de seguidos y scroll)")
 
+    # Subcomando de grafo de seguimiento multi-salto
+    graph_parser = subparsers.add_parser("graph", help="Recorrer en anchura el grafo de seguimiento alrededor de unas semillas")
+    seeds = graph_parser.add_mutually_exclusive_group(required=True)
+    seeds.add_argument("--seed", action="append", help="Perfil semilla (enlace o username); se puede repetir")
+    seeds.add_argument("--seeds-file", default=None, help="Archivo con una semilla por línea ('-' para leer de stdin)")
+    graph_parser.add_argument("--engine", choices=["browser", "http"], default="browser", help="browser (Playwright) o http (sin navegador)")
+    graph_parser.add_argument("--kinds", choices=["following", "followers", "both"], default="following", help="Listas que se recorren desde cada nodo")
+    graph_parser.add_argument("--depth", type=int, default=2, help="Saltos desde las semillas (las cuentas a esa distancia se guardan sin expandir)")
+    graph_parser.add_argument("--fan-out", type=int, default=200, help="Máximo de usuarios leídos por lista y nodo")
+    graph_parser.add_argument("--max-nodes", type=int, default=None, help="Máximo de nodos a expandir en esta ejecución (el resto queda en la frontera)")
+    graph_parser.add_argument("--include-private", action="store_true", help="Expandir también cuentas privadas (si la sesión las sigue)")
+    graph_parser.add_argument("--retry-failed", action="store_true", help="Volver a intentar los nodos que fallaron en ejecuciones anteriores")
+    graph_parser.add_argument("--db", default=None, help="Base SQLite del grafo (por defecto GRAPH_PATH); se reanuda si ya existe")
+    graph_parser.add_argument("--csr", type=Path, default=None, help="Exportar la adyacencia en CSR a este .npz al terminar (requiere numpy)")
+    graph_parser.add_argument("--page-size", type=int, default=50, help="Tamaño de página de friendships")
+    graph_parser.add_argument("--delay-ms", type=int, default=None, help="Retraso fijo entre páginas y nodos en ms (por defecto 0 con control de tasa, 3000 sin él)")
+    graph_parser.add_argument("--retry-tries", type=int, default=10, help="Intentos de reintento ante 429/0")
+    graph_parser.add_argument("--retry-base-ms", type=int, default=2500, help="Base de backoff en ms")
+    _add_runtime_arguments(graph_parser)
+
+    # Subcomando de análisis de Benford sobre exportaciones de seguidores
+    benford_parser = subparsers.add_parser("benford", help="Ley de Benford sobre los conteos de seguidores exportados")
+    benford_parser.add_argument("--input", type=Path, required=True, help="Exportación (.csv/.jsonl/.json/.xlsx/.parquet/.arrow) o directorio con varias")
+    benford_parser.add_argument("--bootstrap", type=int, default=1000, help="Réplicas bootstrap para los intervalos de confianza (0 = sin bootstrap)")
+    benford_parser.add_argument("--confidence", type=float, default=0.95, help="Nivel de confianza de los intervalos y del valor crítico KS")
+    benford_parser.add_argument("--seed", type=int, default=None, help="Semilla del bootstrap (resultados reproducibles)")
+    benford_parser.add_argument("--output", type=Path, default=None, help="Archivo de salida JSON con el informe completo (opcional)")
+
     # Subcomando de scraping con Instaloader (opcional)
     legacy_parser = subparsers.add_parser("legacy", help="Scrapear con Instaloader (login IG opcional)")
-    legacy_parser.add_argument("--url", required=True, help="Enlace del perfil de Instagram")
+    legacy_target = legacy_parser.add_mutually_exclusive_group(required=True)
+    legacy_target.add_argument("--url", help="Enlace del perfil de Instagram")
+    legacy_target.add_argument("--urls-file", default=None, help="Modo batch: archivo con un enlace por línea ('-' para leer de stdin)")
+    legacy_parser.add_argument("--concurrency", type=int, default=3, help="Modo batch: loaders de Instaloader en paralelo (comparten sesión y control de tasa)")
     legacy_parser.add_argument("--posts", type=int, default=None, help="Cantidad de posts recientes (por defecto POSTS_LIMIT)")
-    legacy_parser.add_argument("--output", type=Path, default=None, help="Archivo de salida JSON (opcional)")
-    legacy_parser.add_argument("--login", action="store_true", help="Intentar login IG con usuario/contraseña")
+    legacy_parser.add_argument("--output", type=Path, default=None, help="Archivo de salida JSON (JSON Lines en modo batch, opcional)")
+    legacy_parser.add_argument("--login", action="store_true", help="Reutilizar la sesión IG guardada o hacer login con usuario/contraseña")
+
+    # Subcomando de exportación del historial de posts con Instaloader
+    posts_parser = subparsers.add_parser("posts", help="Exportar el historial completo de posts con Instaloader (reanudable)")
+    posts_parser.add_argument("--url", required=True, help="Enlace del perfil de Instagram")
+    posts_parser.add_argument("--output", type=Path, required=True, help="Archivo de salida (.jsonl/.parquet/.arrow/.feather), escrito post a post")
+    posts_parser.add_argument("--limit", type=int, default=None, help="Máximo de posts a exportar en esta ejecución (el resto queda para --resume)")
+    posts_parser.add_argument("--resume", action="store_true", help="Reanudar desde el checkpoint de la ejecución anterior")
+    posts_parser.add_argument("--flush-every", type=int, default=None, help="Vaciar a disco (y guardar el checkpoint) cada N posts (por defecto EXPORT_FLUSH_EVERY)")
+    posts_parser.add_argument("--login", action="store_true", help="Reutilizar la sesión IG guardada o hacer login con usuario/contraseña")
 
     return parser
 
 
+def _open_cache(config: Config, args: argparse.Namespace) -> Optional[ProfileCache]:
+    if getattr(args, "no_cache", False):
+        return None
+    return ProfileCache.from_config(config, ttl=getattr(args, "cache_ttl", None))
+
+
+def _uses_accounts(config: Config, args: argparse.Namespace) -> bool:
+    """Si la ejecución reparte las peticiones entre las cuentas de ACCOUNTS_DIR (motor http o batch del navegador)."""
+    engine = getattr(args, "engine", "browser")
+    if engine != "http" and not (engine == "browser" and getattr(args, "urls_file", None)):
+        return False
+    return bool(session_files(getattr(args, "accounts_dir", None) or config.accounts_dir))
+
+
+def _open_accounts(config: Config, args: argparse.Namespace) -> Optional[AccountPool]:
+    if not _uses_accounts(config, args):
+        return None
+    return AccountPool.from_config(config, getattr(args, "accounts_dir", None))
+
+
+def _open_limiter(config: Config, args: argparse.Namespace) -> Optional[AdaptiveRateLimiter]:
+    """Crea el limitador de la ejecución y resuelve el `--delay-ms` por defecto según haya o no."""
+    limiter = None
+    accounts = _uses_accounts(config, args)
+    if accounts:
+        # Con varias cuentas el ritmo, el presupuesto y las pausas tras 429 son por cuenta
+        logging.getLogger(__name__).info("Control de tasa por cuenta (ACCOUNT_RATE); se omite el limitador global")
+    elif not getattr(args, "no_rate_limit", False):
+        limiter = AdaptiveRateLimiter.from_config(config, rate=getattr(args, "rate", None))
+    if hasattr(args, "delay_ms") and args.delay_ms is None:
+        args.delay_ms = 0 if limiter is not None or accounts else 3000
+    return limiter
+
+
+def _build_scraper(config: Config, args: argparse.Namespace, stack: ExitStack, limiter: Optional[AdaptiveRateLimiter] = None):
+    """Scraper de una ejecución `--url`; la caché (y el cliente HTTP) se cierran al salir de `stack`."""
+    cache = _open_cache(config, args)
+    if cache is not None:
+        stack.callback(cache.close)
+    if getattr(args, "engine", "browser") == "http":
+        return stack.enter_context(
+            HttpInstagramScraper(config, cache=cache, limiter=limiter, accounts=_open_accounts(config, args))
+        )
+    return BrowserInstagramScraper(config, cache=cache, limiter=limiter)
+
+
+def _open_checkpoint(config: Config, args: argparse.Namespace, username: str) -> CrawlCheckpoint:
+    if getattr(args, "delta", False):
+        return DeltaCheckpoint.from_config(config, args.command, username, args.delta_stop)
+    return CrawlCheckpoint.open(config.checkpoint_dir, args.command, username, resume=getattr(args, "resume", False))
+
+
+def _finish_checkpoint(cp: CrawlCheckpoint) -> None:
+    """Borra el checkpoint si el recorrido terminó; si no, lo conserva para `--resume`."""
+    if cp.complete:
+        cp.clear()
+    elif cp.started:
+        cp.keep()
+        logging.getLogger(__name__).warning("Recorrido incompleto (%d usuarios); continúe con --resume", cp.done)
+    else:
+        cp.clear()
+
+
+def _scrape_one(scraper, command: str, username: str, args: argparse.Namespace, config: Optional[Config] = None) -> Dict[str, Any]:
+    url = f"https://www.instagram.com/{username}/"
+    if command == "scrape":
+        return scraper.get_profile_data(url, posts_limit=args.posts, **_posts_kwargs(args))
+    kwargs = dict(
+        page_size=args.page_size,
+        chunk=args.chunk,
+        delay_ms=args.delay_ms,
+        retry_tries=args.retry_tries,
+        retry_base_ms=args.retry_base_ms,
+    )
+    cp = _open_checkpoint(config, args, username) if config is not None else None
+    try:
+        if command == "following":
+            data = scraper.get_following_details(url, following_limit=args.limit, force_ui=args.force_ui, checkpoint=cp, **kwargs)
+        else:
+            data = scraper.get_followers_counts_for_followers(url, followers_limit=args.limit, checkpoint=cp, **kwargs)
+    except BaseException:
+        if cp is not None and not isinstance(cp, DeltaCheckpoint):
+            _finish_checkpoint(cp)
+        raise
+    if isinstance(cp, DeltaCheckpoint):
+        return cp.finish(data)
+    if cp is not None:
+        _finish_checkpoint(cp)
+    return data
+
+
+def _http_batch(
+    config: Config,
+    args: argparse.Namespace,
+    usernames: List[str],
+    cache: Optional[ProfileCache],
+    limiter: Optional[AdaptiveRateLimiter],
+) -> Iterator[Dict[str, Any]]:
+    """Modo batch del backend HTTP: `--concurrency` perfiles en paralelo sobre un cliente keep-alive."""
+    def one(username: str) -> Dict[str, Any]:
+        try:
+            return {"target": username, "command": args.command, "ok": True, "data": _scrape_one(scraper, args.command, username, args, config)}
+        except Exception as e:
+            logging.getLogger(__name__).error("Fallo en batch (%s) para %s: %s", args.command, username, e)
+            return {"target": username, "command": args.command, "ok": False, "error": str(e)}
+
+    workers = max(1, args.concurrency)
+    pool_size = max(10, workers * max(1, getattr(args, "chunk", 1)))
+    accounts = _open_accounts(config, args)
+    with HttpInstagramScraper(config, pool_size=pool_size, cache=cache, limiter=limiter, accounts=accounts) as scraper:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            yield from executor.map(one, usernames)
+    if accounts is not None:
+        logging.getLogger(__name__).info("Cuentas: %s", accounts.summary())
+
+
+def _browser_batch(
+    config: Config,
+    args: argparse.Namespace,
+    usernames: List[str],
+    cache: Optional[ProfileCache],
+    limiter: Optional[AdaptiveRateLimiter],
+) -> Iterator[Dict[str, Any]]:
+    accounts = _open_accounts(config, args)
+    with BrowserPool(config, cache=cache, limiter=limiter, accounts=accounts) as pool:
+        scraper = BrowserInstagramScraper(config, pool=pool)
+        runner = BatchRunner(
+            scraper,
+            args.command,
+            concurrency=args.concurrency,
+            posts_limit=getattr(args, "posts", None),
+            posts_since=getattr(args, "since", None),
+            posts_page_size=getattr(args, "posts_page_size", None),
+            limit=getattr(args, "limit", None),
+            page_size=getattr(args, "page_size", 12),
+            chunk=getattr(args, "chunk", 2),
+            delay_ms=getattr(args, "delay_ms", 3000),
+            retry_tries=getattr(args, "retry_tries", 10),
+            retry_base_ms=getattr(args, "retry_base_ms", 2500),
+            force_ui=getattr(args, "force_ui", False),
+        )
+        yield from runner.run(usernames)
+    if accounts is not None:
+        logging.getLogger(__name__).info("Cuentas: %s", accounts.summary())
+
+
+async def _async_batch(
+    config: Config,
+    args: argparse.Namespace,
+    usernames: List[str],
+    cache: Optional[ProfileCache],
+    limiter: Optional[AdaptiveRateLimiter],
+    emit: Callable[[Dict[str, Any]], None],
+) -> None:
+    """Modo batch asyncio: todos los perfiles en vuelo sobre un contexto, `--concurrency` páginas a la vez."""
+    async def one(username: str) -> Dict[str, Any]:
+        url = f"https://www.instagram.com/{username}/"
+        try:
+            if args.command == "scrape":
+                data = await scraper.get_profile_data(url, posts_limit=args.posts, **_posts_kwargs(args))
+            else:
+                kwargs = dict(
+                    page_size=args.page_size,
+                    chunk=args.chunk,
+                    delay_ms=args.delay_ms,
+                    retry_tries=args.retry_tries,
+                    retry_base_ms=args.retry_base_ms,
+                )
+                if args.command == "following":
+                    data = await scraper.get_following_details(url, following_limit=args.limit, force_ui=args.force_ui, **kwargs)
+                else:
+                    data = await scraper.get_followers_counts_for_followers(url, followers_limit=args.limit, **kwargs)
+            return {"target": username, "command": args.command, "ok": True, "data": data}
+        except Exception as e:
+            logging.getLogger(__name__).error("Fallo en batch (%s) para %s: %s", args.command, username, e)
+            return {"target": username, "command": args.command, "ok": False, "error": str(e)}
+
+    async with AsyncBrowserInstagramScraper(config, concurrency=args.concurrency, cache=cache, limiter=limiter) as scraper:
+        for future in asyncio.as_completed([one(u) for u in usernames]):
+            emit(await future)
+
+
+def _run_legacy_batch(scraper: InstagramScraper, args: argparse.Namespace) -> None:
+    """Modo batch de `legacy`: perfiles repartidos entre loaders de Instaloader, salida en JSON Lines."""
+    t0 = time.time()
+    usernames = read_targets(args.urls_file)
+    logging.getLogger(__name__).info("Perfiles únicos a procesar: %d", len(usernames))
+    out_path = getattr(args, "output", None)
+    if out_path:
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        sink = out_path.open("w", encoding="utf-8")
+    else:
+        sink = sys.stdout
+    done = 0
+    try:
+        for record in scraper.get_profiles_data(usernames, posts_limit=args.posts, concurrency=args.concurrency):
+            sink.write(json.dumps(record, ensure_ascii=False) + "\n")
+            sink.flush()
+            done += 1
+    finally:
+        if sink is not sys.stdout:
+            sink.close()
+    logging.getLogger(__name__).info("Batch completado: %d perfiles en %ss", done, round(time.time() - t0, 2))
+
+
+def run_batch(config: Config, args: argparse.Namespace, limiter: Optional[AdaptiveRateLimiter] = None) -> None:
+    """Ejecuta scrape/following/followers sobre una lista de perfiles y escribe JSON Lines."""
+    t0 = time.time()
+    usernames = read_targets(args.urls_file)
+    logging.getLogger(__name__).info("Perfiles únicos a procesar: %d", len(usernames))
+    out_path = getattr(args, "output", None)
+    if out_path:
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        sink = out_path.open("w", encoding="utf-8")
+    else:
+        sink = sys.stdout
+    done = 0
+
+    def emit(record: Dict[str, Any]) -> None:
+        nonlocal done
+        sink.write(json.dumps(record, ensure_ascii=False, default=to_jsonable) + "\n")
+        sink.flush()
+        done += 1
+
+    cache = _open_cache(config, args)
+    try:
+        if args.engine == "async":
+            asyncio.run(_async_batch(config, args, usernames, cache, limiter, emit))
+        else:
+            if args.engine == "http":
+                records = _http_batch(config, args, usernames, cache, limiter)
+            else:
+                records = _browser_batch(config, args, usernames, cache, limiter)
+            for record in records:
+                emit(record)
+    finally:
+        if cache is not None:
+            cache.close()
+        if sink is not sys.stdout:
+            sink.close()
+    logging.getLogger(__name__).info("Batch completado: %d perfiles en %ss", done, round(time.time() - t0, 2))
+
+
+def _write_metrics(config: Config, args: argparse.Namespace, limiter: Optional[AdaptiveRateLimiter]) -> None:
+    """Vuelca las métricas de la ejecución (JSON + textfile de Prometheus) si hay directorio configurado."""
+    log = logging.getLogger(__name__)
+    METRICS.log_summary()
+    extra: Dict[str, float] = {}
+    if limiter is not None:
+        log.info("Control de tasa: %s", limiter.summary())
+        extra["rate_limit_final_rps"] = round(limiter.rate, 4)
+        extra["rate_limit_cuts"] = limiter.cuts
+    directory = getattr(args, "metrics_dir", None) or config.metrics_dir
+    if not directory:
+        return
+    try:
+        path = METRICS.write(directory, extra)
+        log.info("Métricas guardadas en %s (y metrics.prom)", path)
+    except OSError as e:
+        log.warning("No se pudieron escribir las métricas en %s: %s", directory, e)
+
+
+def _run_posts(config: Config, args: argparse.Namespace, parser: argparse.ArgumentParser) -> None:
+    t0 = time.time()
+    output: Path = args.output
+    if output.suffix.lower() not in {".jsonl", ".parquet", ".arrow", ".feather"}:
+        parser.error("posts: --output debe ser .jsonl, .parquet, .arrow o .feather")
+    username = extract_username(args.url)
+    cp = PostCheckpoint.open(config.checkpoint_dir, username, args.resume)
+    if cp.output and Path(cp.output) != output:
+        parser.error(f"El checkpoint de {username} corresponde a {cp.output}; repita con ese --output o sin --resume")
+    cp.output = str(output)
+    if cp.written and output.suffix.lower() == ".jsonl":
+        # Lo escrito después del último checkpoint se vuelve a pedir: se descarta del archivo
+        export.truncate_lines(output, cp.written)
+    scraper = InstagramScraper(config)
+    if args.login:
+        scraper.login_if_available()
+    before = cp.written
+    sink = export.open_sink(
+        output, "posts", args.flush_every or config.export_flush_every, config.export_row_group_size, append=bool(before)
+    )
+    try:
+        with sink:
+            scraper.export_posts(args.url, sink, checkpoint=cp, limit=args.limit)
+    except (Exception, KeyboardInterrupt) as e:
+        logging.getLogger(__name__).error(
+            "Exportación de posts interrumpida tras %d posts: %s. Progreso guardado en %s; repita con --resume",
+            cp.written,
+            str(e) or type(e).__name__,
+            cp.path,
+        )
+        raise SystemExit(1)
+    print(f"Posts exportados: {sink.count} (total {before + sink.count})")
+    print(f"Archivo guardado en {sink.path}")
+    print(f"Tiempo total: {round(time.time() - t0, 2)}s")
+
+
+def _open_export(config: Config, args: argparse.Namespace) -> Optional[export.RecordSink]:
+    return export.open_sink(
+        getattr(args, "output", None),
+        args.command,
+        args.flush_every or config.export_flush_every,
+        config.export_row_group_size,
+    )
+
+
+def _print_record(command: str, it: Record) -> None:
+    if command == "following":
+        print(
+            f"[following] {it.username or ''} | nombre='{it.full_name or ''}' | bio_len={len(it.biography or '')}"
+            f" | seguidores={it.followers} | seguidos={it.following}"
+        )
+    else:
+        print(f"{it.username}: {it.followers}")
+
+
+def _export_stream(scraper, args: argparse.Namespace, checkpoint: CrawlCheckpoint, sink: export.RecordSink) -> None:
+    """Escribe en `sink` cada seguido/seguidor en cuanto el scraper lo entrega, sin acumular la lista.
+
+    Usa los generadores `iter_following`/`iter_followers` (con checkpoint). Si
+    fallan antes de la primera página (o con `--force-ui`) se recurre al flujo
+    completo de `get_following_details`/`get_followers_counts_for_followers`,
+    cuyos items también se escriben uno a uno. Si fallan después, se sale con
+    código 1 conservando el archivo parcial y el checkpoint.
+    """
+    log = logging.getLogger(__name__)
+    kwargs = dict(
+        page_size=args.page_size,
+        chunk=args.chunk,
+        delay_ms=args.delay_ms,
+        retry_tries=args.retry_tries,
+        retry_base_ms=args.retry_base_ms,
+    )
+    force_ui = getattr(args, "force_ui", False)
+    if not force_ui:
+        if args.command == "following":
+            records = scraper.iter_following(args.url, following_limit=args.limit, checkpoint=checkpoint, **kwargs)
+        else:
+            records = scraper.iter_followers(args.url, followers_limit=args.limit, checkpoint=checkpoint, **kwargs)
+        try:
+            for record in records:
+                sink.write(record)
+                _print_record(args.command, record)
+            return
+        except Exception as e:
+            if sink.count or checkpoint.started:
+                log.error(
+                    "Exportación interrumpida tras %d registros: %s. Progreso guardado en %s; repita con --resume",
+                    sink.count,
+                    e,
+                    checkpoint.keep_path or checkpoint.path,
+                )
+                raise SystemExit(1)
+            log.warning("Recorrido por páginas no disponible (%s); se usa el flujo completo", e)
+    if args.command == "following":
+        data = scraper.get_following_details(args.url, following_limit=args.limit, force_ui=force_ui, **kwargs) or {}
+        records = data.get("following_details") or []
+    else:
+        data = scraper.get_followers_counts_for_followers(args.url, followers_limit=args.limit, **kwargs) or {}
+        records = data.get("followers_of_followers") or []
+    for record in records:
+        sink.write(record)
+        _print_record(args.command, record)
+
+
 def main() -> None:
     config = load_config()
     logging.basicConfig(level=getattr(logging, config.log_level.upper(), logging.INFO), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
@@ -64,178 +546,183 @@ def main() -> None:
     parser = build_parser()
     args = parser.parse_args()
 
+    if getattr(args, "engine", None) == "async" and not getattr(args, "urls_file", None):
+        parser.error("--engine async solo está disponible en modo batch (--urls-file)")
+    if args.command == "scrape" and _posts_kwargs(args) and args.engine not in ("browser", "async"):
+        parser.error("--since y --posts-page-size solo están disponibles con --engine browser o async")
+    if getattr(args, "delta", False):
+        if args.resume:
+            parser.error("--delta no se puede combinar con --resume")
+        if args.urls_file and args.engine != "http":
+            parser.error("--delta en modo batch solo está disponible con --engine http")
+    if getattr(args, "resume", False) and getattr(args, "urls_file", None) and args.engine != "http":
+        parser.error("--resume en modo batch solo está disponible con --engine http")
+    if args.command not in {"scrape", "following", "followers", "graph"}:
+        with ExitStack() as stack:
+            _run_command(config, args, parser, None, stack)
+        return
+    if args.load_resources:
+        config.block_resources = False
+    METRICS.reset()
+    limiter = _open_limiter(config, args)
+    try:
+        if getattr(args, "urls_file", None):
+            run_batch(config, args, limiter)
+        else:
+            with ExitStack() as stack:
+                _run_command(config, args, parser, limiter, stack)
+    finally:
+        _write_metrics(config, args, limiter)
+
+
+def _run_graph(config: Config, args: argparse.Namespace, limiter: Optional[AdaptiveRateLimiter], stack: ExitStack) -> None:
+    t0 = time.time()
+    if args.seed:
+        seeds = [extract_username(u) if "instagram.com" in u else u.strip().lstrip("@") for u in args.seed]
+    else:
+        seeds = read_targets(args.seeds_file)
+    kinds = ("following", "followers") if args.kinds == "both" else (args.kinds,)
+    with GraphStore.from_config(config, args.db) as store:
+        if args.retry_failed:
+            store.retry_failed()
+        crawler = GraphCrawler(
+            store,
+            kinds=kinds,
+            max_depth=args.depth,
+            fan_out=args.fan_out,
+            max_nodes=args.max_nodes,
+            priority=bfs_priority_with_private if args.include_private else bfs_priority,
+        )
+        scraper = _build_scraper(config, args, stack, limiter)
+        stats = scraper.crawl_graph(
+            crawler,
+            seeds,
+            page_size=args.page_size,
+            delay_ms=args.delay_ms,
+            retry_tries=args.retry_tries,
+            retry_base_ms=args.retry_base_ms,
+        )
+        print(json.dumps(stats, ensure_ascii=False, indent=2))
+        print(f"Grafo guardado en {store.path}")
+        if args.csr:
+            store.export_csr(args.csr)
+            print(f"CSR guardado en {args.csr}")
+    print(f"Tiempo total: {round(time.time() - t0, 2)}s")
+
+
+def _run_command(
+    config: Config,
+    args: argparse.Namespace,
+    parser: argparse.ArgumentParser,
+    limiter: Optional[AdaptiveRateLimiter],
+    stack: ExitStack,
+) -> None:
     if args.command == "auth":
         if args.headless is not None:
             config.headless = args.headless.lower() == "true"
+        if args.account is not None:
+            if not re.fullmatch(r"[A-Za-z0-9._-]+", args.account):
+                parser.error("--account solo admite letras, números, '.', '_' y '-'")
+            # La sesión de la cuenta queda junto a las demás en ACCOUNTS_DIR
+            config.storage_path = str(session_path(config.accounts_dir, args.account))
+            config.storage_plain_path = str(Path(config.accounts_dir) / "plain" / f"{args.account}.json")
         auth = FacebookAuthenticator(config)
         auth.login_with_facebook()
         print("Autenticación completada y sesión guardada.")
         return
 
     elif args.command == "scrape":
-        scraper = BrowserInstagramScraper(config)
-        data = scraper.get_profile_data(args.url, posts_limit=args.posts)
-    elif args.command == "following":
-        import time as _t
-        t0 = _t.time()
-        scraper = BrowserInstagramScraper(config)
-        data = scraper.get_following_details(
-            args.url,
-            following_limit=args.limit,
-            page_size=args.page_size,
-            chunk=args.chunk,
-            delay_ms=args.delay_ms,
-            retry_tries=args.retry_tries,
-            retry_base_ms=args.retry_base_ms,
-            force_ui=getattr(args, "force_ui", False),
-        )
-        if data is None:
-            data = {"username": None, "following_details": []}
-        out_path = getattr(args, "output", None)
-        items = data.get("following_details", [])
-        if out_path and out_path.suffix.lower() in {".xlsx", ".csv"}:
-            rows = []
-            print(f"Items scrapeados: {len(items)}")
-            for it in items:
+        scraper = _build_scraper(config, args, stack, limiter)
+        data = scraper.get_profile_data(args.url, posts_limit=args.posts, **_posts_kwargs(args))
+    elif args.command in ("following", "followers"):
+        t0 = time.time()
+        scraper = _build_scraper(config, args, stack, limiter)
+        checkpoint = _open_checkpoint(config, args, extract_username(args.url))
+        delta = isinstance(checkpoint, DeltaCheckpoint)
+        # En modo delta la lista combinada se conoce al final: el sink se abre después del recorrido
+        sink = None if delta else _open_export(config, args)
+        if sink is not None:
+            with sink:
                 try:
-                    uname = it.get("username") or ""
-                    fn = it.get("full_name") or ""
-                    bio = it.get("biography") or ""
-                    followers = it.get("followers")
-                    following = it.get("following")
-                    print(f"[following] {uname} | nombre='{fn}' | bio_len={len(bio)} | seguidores={followers} | seguidos={following}")
-                except Exception:
-                    pass
-                rows.append([
-                    it.get("full_name") or "",
-                    it.get("username") or "",
-                    it.get("biography") or "",
-                    it.get("account_type") or "",
-                    it.get("category") or "",
-                    it.get("followers") if it.get("followers") is not None else "",
-                    it.get("following") if it.get("following") is not None else "",
-                    it.get("url") or "",
-                ])
-
-            if out_path.suffix.lower() == ".xlsx":
-                try:
-                    from openpyxl import Workbook
-                    wb = Workbook()
-                    ws = wb.active
-                    ws.title = "following"
-                    ws.append(["nombre", "usuario", "biografia", "tipo_de_cuenta", "categoria", "seguidores", "seguidos", "enlace"])
-                    for r in rows:
-                        ws.append(r)
-                    out_path.parent.mkdir(parents=True, exist_ok=True)
-                    wb.save(str(out_path))
-                    print(f"Archivo Excel guardado en {out_path}")
-                    print(f"Tiempo total: {round(_t.time()-t0, 2)}s")
-                    return
-                except Exception as e:
-                    # Intento adicional: si el archivo está abierto (Windows bloquea con Excel), probar con un nombre alternativo
-                    msg = str(e)
-                    try:
-                        if "Permission denied" in msg or getattr(e, "errno", None) == 13:
-                            alt_path = out_path.with_name(out_path.stem + "_v2" + out_path.suffix)
-                            from openpyxl import Workbook
-                            wb2 = Workbook()
-                            ws2 = wb2.active
-                            ws2.title = "following"
-                            ws2.append(["nombre", "usuario", "biografia", "tipo_de_cuenta", "categoria", "seguidores", "seguidos", "enlace"])
-                            for r in rows:
-                                ws2.append(r)
-                            alt_path.parent.mkdir(parents=True, exist_ok=True)
-                            wb2.save(str(alt_path))
-                            print(f"Archivo Excel bloqueado, se guardó en {alt_path}")
-                            print(f"Tiempo total: {round(_t.time()-t0, 2)}s")
-                            return
-                    except Exception as e2:
-                        print(f"No se pudo escribir Excel alternativo: {e2}.")
-                    print(f"No se pudo escribir Excel (.xlsx): {e}. Se imprimirá JSON.")
-
-            if out_path.suffix.lower() == ".csv":
-                try:
-                    import csv
-                    out_path.parent.mkdir(parents=True, exist_ok=True)
-                    with out_path.open("w", newline="", encoding="utf-8") as f:
-                        writer = csv.writer(f)
-                        writer.writerow(["nombre", "usuario", "biografia", "tipo_de_cuenta", "categoria", "seguidores", "seguidos", "enlace"])
-                        for r in rows:
-                            writer.writerow(r)
-                    print(f"Archivo CSV guardado en {out_path}")
-                    print(f"Tiempo total: {round(_t.time()-t0, 2)}s")
-                    return
-                except Exception as e:
-                    print(f"No se pudo escribir CSV (.csv): {e}. Se imprimirá JSON.")
-    elif args.command == "followers":
-        import time as _t
-        t0 = _t.time()
-        scraper = BrowserInstagramScraper(config)
-        data = scraper.get_followers_counts_for_followers(
-            args.url,
-            followers_limit=args.limit,
+                    _export_stream(scraper, args, checkpoint, sink)
+                finally:
+                    _finish_checkpoint(checkpoint)
+            print(f"Items scrapeados: {sink.count}")
+            print(f"Archivo guardado en {sink.path}")
+            print(f"Tiempo total: {round(time.time() - t0, 2)}s")
+            return
+        kwargs = dict(
             page_size=args.page_size,
             chunk=args.chunk,
             delay_ms=args.delay_ms,
             retry_tries=args.retry_tries,
             retry_base_ms=args.retry_base_ms,
+            checkpoint=checkpoint,
         )
-        out_path = getattr(args, "output", None)
-        followers_items = data.get("followers_of_followers", [])
-        if out_path and out_path.suffix.lower() in {".xlsx", ".csv"}:
-            rows = []
-            print(f"Items scrapeados: {len(followers_items)}")
-            for it in followers_items:
-                username = it.get("username")
-                followers = it.get("followers")
-                print(f"{username}: {followers}")
-                first_digit = None
-                if isinstance(followers, int):
-                    s = str(followers)
-                    first_digit = int(s[0]) if s else None
-                rows.append([username, followers if followers is not None else "", first_digit if first_digit is not None else ""])
-
-            if out_path.suffix.lower() == ".xlsx":
-                try:
-                    from openpyxl import Workbook
-                    wb = Workbook()
-                    ws = wb.active
-                    ws.title = "followers"
-                    ws.append(["username", "seguidores", "primer_digito"])
-                    for r in rows:
-                        ws.append(r)
-                    out_path.parent.mkdir(parents=True, exist_ok=True)
-                    wb.save(str(out_path))
-                    print(f"Archivo Excel guardado en {out_path}")
-                    print(f"Tiempo total: {round(_t.time()-t0, 2)}s")
-                    return
-                except Exception as e:
-                    print(f"No se pudo escribir Excel (.xlsx): {e}. Se imprimirá JSON.")
-
-            if out_path.suffix.lower() == ".csv":
-                try:
-                    import csv
-                    out_path.parent.mkdir(parents=True, exist_ok=True)
-                    with out_path.open("w", newline="", encoding="utf-8") as f:
-                        writer = csv.writer(f)
-                        writer.writerow(["username", "seguidores", "primer_digito"])
-                        for r in rows:
-                            writer.writerow(r)
-                    print(f"Archivo CSV guardado en {out_path}")
-                    print(f"Tiempo total: {round(_t.time()-t0, 2)}s")
-                    return
-                except Exception as e:
-                    print(f"No se pudo escribir CSV (.csv): {e}. Se imprimirá JSON.")
+        try:
+            if args.command == "following":
+                data = scraper.get_following_details(
+                    args.url, following_limit=args.limit, force_ui=getattr(args, "force_ui", False), **kwargs
+                )
+                if data is None:
+                    data = {"username": None, "following_details": []}
+            else:
+                data = scraper.get_followers_counts_for_followers(args.url, followers_limit=args.limit, **kwargs)
+        except BaseException:
+            if not delta:
+                # Conserva lo recorrido para --resume antes de propagar el error
+                _finish_checkpoint(checkpoint)
+            raise
+        if not delta:
+            _finish_checkpoint(checkpoint)
+        else:
+            data = checkpoint.finish(data)
+            print(f"Altas: {len(data['added'])} | Bajas: {len(data['removed'])} | Páginas: {data['delta']['pages']}")
+            sink = _open_export(config, args)
+            if sink is not None:
+                with sink:
+                    for record in data[checkpoint.result_key]:
+                        sink.write(record)
+                print(f"Items scrapeados: {sink.count}")
+                print(f"Archivo guardado en {sink.path}")
+                print(f"Tiempo total: {round(time.time() - t0, 2)}s")
+                return
+    elif args.command == "graph":
+        _run_graph(config, args, limiter, stack)
+        return
+    elif args.command == "benford":
+        try:
+            from . import benford
+        except ImportError:
+            parser.error("El análisis de Benford requiere numpy (pip install 'instagram-scraper[analysis]')")
+            return
+        t0 = time.time()
+        report = benford.analyze(
+            benford.load_counts(args.input), bootstrap=args.bootstrap, confidence=args.confidence, seed=args.seed
+        )
+        print("\n".join(benford.format_report(report)))
+        if args.output:
+            args.output.parent.mkdir(parents=True, exist_ok=True)
+            args.output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+            print(f"Informe guardado en {args.output}")
+        print(f"Tiempo total: {round(time.time() - t0, 2)}s")
+        return
     elif args.command == "legacy":
         scraper = InstagramScraper(config)
         if getattr(args, "login", False):
             scraper.login_if_available()
+        if args.urls_file:
+            _run_legacy_batch(scraper, args)
+            return
         data = scraper.get_profile_data(args.url, posts_limit=args.posts)
+    elif args.command == "posts":
+        _run_posts(config, args, parser)
+        return
     else:
         parser.error("Comando no reconocido")
         return
 
-    output = json.dumps(data, ensure_ascii=False, indent=2)
+    output = json.dumps(data, ensure_ascii=False, indent=2, default=to_jsonable)
     print(output)
 
     out_path = getattr(args, "output", None)
@@ -1,6 +1,7 @@
 import os
-from dataclasses import dataclass
-from typing import Optional
+import shlex
+from dataclasses import dataclass, field
+from typing import List, Optional
 
 from dotenv import load_dotenv
 
@@ -11,15 +12,59 @@ class Config:
     ig_password: Optional[str] = None
     ig_2fa_code: Optional[str] = None
     posts_limit: int = 5
+    # Posts por página al paginar el timeline más allá de la primera página de web_profile_info
+    posts_page_size: int = 12
+    # Sesión de Instaloader (legacy) guardada tras el login; se cifra con AUTH_SECRET_KEY si está definida
+    ig_session_path: str = "storage/ig_session.enc"
     # Facebook OAuth
     fb_email: Optional[str] = None
     fb_password: Optional[str] = None
     fb_2fa_code: Optional[str] = None
     # Headless browser and storage
     headless: bool = True
+    # Argumentos extra para chromium.launch (p. ej. --proxy-server=..., --host-resolver-rules=...)
+    browser_args: List[str] = field(default_factory=list)
     storage_path: str = "storage/auth_state.enc"
     storage_plain_path: str = "storage/storage_state.json"
     auth_secret_key: Optional[str] = None
+    # Pool de navegadores reutilizables
+    pool_size: int = 1
+    pool_max_uses: int = 50
+    # Caché persistente de perfiles (web_profile_info / og tags); TTL 0 la desactiva
+    cache_path: str = "storage/profile_cache.sqlite"
+    cache_ttl: int = 86400
+    cache_max_entries: int = 50000
+    # Bloqueo de imágenes, vídeo, fuentes y analítica en los contextos de scraping
+    block_resources: bool = True
+    # Modo UI: tomar los usuarios de las respuestas XHR del diálogo en lugar del DOM
+    ui_harvest: bool = True
+    # Enriquecimiento de seguidos: fetch HTML simultáneos y pestañas para la etapa DOM
+    enrich_concurrency: int = 8
+    enrich_tabs: int = 3
+    # Checkpoints de recorridos following/followers (--resume)
+    checkpoint_dir: str = "storage/checkpoints"
+    # Recorridos incrementales (--delta): última lista de cada perfil y racha de conocidos que corta la paginación
+    snapshot_dir: str = "storage/snapshots"
+    delta_stop_after: int = 24
+    # Grafo de seguimiento multi-salto (subcomando graph): nodos y aristas en SQLite
+    graph_path: str = "storage/graph.sqlite"
+    # Control de tasa adaptativo (token bucket AIMD) compartido por toda la ejecución
+    rate_limit: bool = True
+    rate_initial: float = 1.0
+    rate_min: float = 0.2
+    rate_max: float = 8.0
+    # Métricas por endpoint (metrics.json + metrics.prom); vacío las desactiva
+    metrics_dir: str = "storage/metrics"
+    # Exportación por filas (.csv/.jsonl/.xlsx): vaciar el búfer cada N registros
+    export_flush_every: int = 500
+    # Exportación columnar (.parquet/.arrow): registros por row group
+    export_row_group_size: int = 10000
+    # Varias cuentas: una sesión cifrada por cuenta (auth --account) con ritmo, presupuesto y pausa tras 429 propios
+    accounts_dir: str = "storage/accounts"
+    account_rate: float = 0.5
+    account_budget: int = 0
+    account_window: float = 3600.0
+    account_cooldown: float = 60.0
     log_level: str = "INFO"
 
 
@@ -31,12 +76,40 @@ def load_config() -> Config:
         ig_password=os.getenv("IG_PASSWORD"),
         ig_2fa_code=os.getenv("IG_2FA_CODE"),
         posts_limit=int(os.getenv("POSTS_LIMIT", "5")),
+        posts_page_size=int(os.getenv("POSTS_PAGE_SIZE", "12")),
+        ig_session_path=os.getenv("IG_SESSION_PATH", "storage/ig_session.enc"),
         fb_email=os.getenv("FB_EMAIL"),
         fb_password=os.getenv("FB_PASSWORD"),
         fb_2fa_code=os.getenv("FB_2FA_CODE"),
         headless=os.getenv("HEADLESS", "true").lower() == "true",
+        browser_args=shlex.split(os.getenv("BROWSER_ARGS", "")),
         storage_path=os.getenv("AUTH_STORAGE_PATH", "storage/auth_state.enc"),
         storage_plain_path=os.getenv("AUTH_STORAGE_PLAIN_PATH", "storage/storage_state.json"),
         auth_secret_key=os.getenv("AUTH_SECRET_KEY"),
+        pool_size=int(os.getenv("BROWSER_POOL_SIZE", "1")),
+        pool_max_uses=int(os.getenv("BROWSER_POOL_MAX_USES", "50")),
+        cache_path=os.getenv("PROFILE_CACHE_PATH", "storage/profile_cache.sqlite"),
+        cache_ttl=int(os.getenv("PROFILE_CACHE_TTL", "86400")),
+        cache_max_entries=int(os.getenv("PROFILE_CACHE_MAX_ENTRIES", "50000")),
+        block_resources=os.getenv("BLOCK_RESOURCES", "true").lower() == "true",
+        ui_harvest=os.getenv("UI_HARVEST", "true").lower() == "true",
+        enrich_concurrency=int(os.getenv("ENRICH_CONCURRENCY", "8")),
+        enrich_tabs=int(os.getenv("ENRICH_TABS", "3")),
+        checkpoint_dir=os.getenv("CHECKPOINT_DIR", "storage/checkpoints"),
+        snapshot_dir=os.getenv("SNAPSHOT_DIR", "storage/snapshots"),
+        delta_stop_after=int(os.getenv("DELTA_STOP_AFTER", "24")),
+        graph_path=os.getenv("GRAPH_PATH", "storage/graph.sqlite"),
+        rate_limit=os.getenv("RATE_LIMIT", "true").lower() == "true",
+        rate_initial=float(os.getenv("RATE_LIMIT_INITIAL", "1.0")),
+        rate_min=float(os.getenv("RATE_LIMIT_MIN", "0.2")),
+        rate_max=float(os.getenv("RATE_LIMIT_MAX", "8.0")),
+        metrics_dir=os.getenv("METRICS_DIR", "storage/metrics"),
+        export_flush_every=int(os.getenv("EXPORT_FLUSH_EVERY", "500")),
+        export_row_group_size=int(os.getenv("EXPORT_ROW_GROUP_SIZE", "10000")),
+        accounts_dir=os.getenv("ACCOUNTS_DIR", "storage/accounts"),
+        account_rate=float(os.getenv("ACCOUNT_RATE", "0.5")),
+        account_budget=int(os.getenv("ACCOUNT_BUDGET", "0")),
+        account_window=float(os.getenv("ACCOUNT_WINDOW", "3600")),
+        account_cooldown=float(os.getenv("ACCOUNT_COOLDOWN", "60")),
         log_level=os.getenv("LOG_LEVEL", "INFO"),
     )
\ No newline at end of file
@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Type
+
+from .checkpoint import CrawlCheckpoint
+from .config import Config
+from .records import RECORD_TYPES, Record, RecordColumns
+
+
+logger = logging.getLogger(__name__)
+
+# Clave de la lista de items en el resultado de cada comando
+RESULT_KEYS = {"following": "following_details", "followers": "followers_of_followers"}
+# Clave del conteo que reporta el perfil en el resultado de cada comando
+COUNT_KEYS = {"following": "following_count", "followers": "count"}
+
+
+class Snapshot:
+    """Última lista `following`/`followers` completa de un perfil.
+
+    Se guarda como `.jsonl` de registros en el orden de la API (más recientes
+    primero) y se carga en un `RecordColumns` con un índice username → posición.
+    """
+
+    def __init__(self, path: Optional[Path], record_type: Type[Any]) -> None:
+        self.path = path
+        self.record_type = record_type
+        self.records = RecordColumns(record_type)
+        self.positions: Dict[str, int] = {}
+
+    @classmethod
+    def open(cls, directory: str, command: str, username: str) -> "Snapshot":
+        snapshot = cls(Path(directory) / f"{command}_{username.lower()}.jsonl", RECORD_TYPES[command])
+        if snapshot.path.exists():
+            with snapshot.path.open(encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        snapshot._append(snapshot.record_type.from_dict(json.loads(line)))
+        return snapshot
+
+    def _append(self, record: Record) -> None:
+        if record.username in self.positions:
+            return
+        self.positions[record.username] = len(self.records)
+        self.records.append(record)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __contains__(self, username: str) -> bool:
+        return username in self.positions
+
+    def get(self, username: str) -> Optional[Record]:
+        pos = self.positions.get(username)
+        return None if pos is None else self.records[pos]
+
+    def save(self, records: Iterable[Record]) -> None:
+        """Reemplaza la instantánea en disco (escritura atómica)."""
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".jsonl.tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record.to_dict(), ensure_ascii=False) + "\n")
+        os.replace(tmp, self.path)
+
+
+class DeltaCheckpoint(CrawlCheckpoint):
+    """Checkpoint en memoria de un recorrido incremental (`--delta`).
+
+    Compara cada página de friendships con la instantánea anterior del perfil:
+    solo los usernames nuevos pasan a `pending` (y por tanto se enriquecen), y
+    tras `stop_after` cuentas conocidas seguidas deja de paginar. Como la API
+    devuelve primero las relaciones más recientes, esa racha marca el punto a
+    partir del cual la lista no cambió.
+
+    `finish(data)` combina los registros nuevos con la instantánea (páginas
+    recorridas en su orden y, después, el resto de la instantánea), calcula
+    altas y bajas y guarda la nueva instantánea si el recorrido terminó. Las
+    bajas solo se detectan dentro del tramo recorrido.
+    """
+
+    def __init__(self, command: str, snapshot: Snapshot, stop_after: int = 24) -> None:
+        super().__init__(None, snapshot.record_type)
+        self.command = command
+        self.snapshot = snapshot
+        self.stop_after = max(1, stop_after)
+        self.seen: Dict[str, None] = {}
+        self.known_run = 0
+        self.pages = 0
+        self.limit: Optional[int] = None
+        self.reached_end = False
+        self.stopped_early = False
+
+    @classmethod
+    def open(cls, directory: str, command: str, username: str, stop_after: int = 24) -> "DeltaCheckpoint":
+        snapshot = Snapshot.open(directory, command, username)
+        if len(snapshot):
+            logger.info("Instantánea previa de %s de %s: %d usuarios", command, username, len(snapshot))
+        else:
+            logger.info("Sin instantánea previa de %s de %s; se recorre la lista completa", command, username)
+        return cls(command, snapshot, stop_after)
+
+    @classmethod
+    def from_config(cls, config: Config, command: str, username: str, stop_after: Optional[int] = None) -> "DeltaCheckpoint":
+        return cls.open(config.snapshot_dir, command, username, config.delta_stop_after if stop_after is None else stop_after)
+
+    @property
+    def result_key(self) -> str:
+        return RESULT_KEYS[self.command]
+
+    def page_loaded(self, usernames: List[str], next_max_id: Optional[str], limit: Optional[int]) -> None:
+        self.limit = limit
+        if limit is not None:
+            usernames = usernames[: max(0, limit - len(self.seen))]
+        fresh: List[str] = []
+        for u in usernames:
+            if not u or u in self.seen:
+                continue
+            self.seen[u] = None
+            if u in self.snapshot:
+                self.known_run += 1
+            else:
+                self.known_run = 0
+                fresh.append(u)
+        self.pages += 1
+        self.reached_end = not next_max_id
+        if next_max_id and self.known_run >= self.stop_after:
+            logger.info("Racha de %d usuarios conocidos tras %d páginas; fin de la paginación", self.known_run, self.pages)
+            self.stopped_early = True
+            next_max_id = None
+        elif next_max_id and limit is not None and len(self.seen) >= limit:
+            next_max_id = None
+        super().page_loaded(fresh, next_max_id, None)
+
+    def _anchor(self) -> int:
+        """Posición en la instantánea del último usuario conocido recorrido (-1 si ninguno)."""
+        for u in reversed(self.seen):
+            pos = self.snapshot.positions.get(u)
+            if pos is not None:
+                return pos
+        return -1
+
+    def merge(self, items: Iterable[Record]) -> Dict[str, Any]:
+        """Lista combinada (`RecordColumns`) con altas y bajas respecto de la instantánea."""
+        fresh = {it.username: it for it in items}
+        if not self.started:
+            # Flujo no paginado (fallback del navegador): sus items son el tramo recorrido
+            for u in fresh:
+                self.seen.setdefault(u, None)
+        merged = RecordColumns(self.record_type)
+        added: List[str] = []
+        for u in self.seen:
+            record = fresh.get(u)
+            if record is None:
+                record = self.snapshot.get(u)
+            elif u not in self.snapshot:
+                added.append(u)
+            if record is not None:
+                merged.append(record)
+        anchor = len(self.snapshot) if self.reached_end else self._anchor()
+        removed: List[str] = []
+        for pos, u in enumerate(self.snapshot.records.column("username")):
+            if u in self.seen:
+                continue
+            if pos < anchor:
+                removed.append(u)
+            elif self.limit is None or len(merged) < self.limit:
+                merged.append(self.snapshot.records[pos])
+        return {"items": merged, "added": added, "removed": removed}
+
+    def finish(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Reemplaza los items nuevos de `data` por la lista combinada y añade `added`/`removed`."""
+        new_items = data.get(self.result_key) or []
+        diff = self.merge(new_items)
+        merged = diff["items"]
+        data[self.result_key] = merged
+        data["scraped_count"] = len(merged)
+        data["added"] = diff["added"]
+        data["removed"] = diff["removed"]
+        data["delta"] = {
+            "pages": self.pages,
+            "stopped_early": self.stopped_early,
+            "enriched": len(new_items),
+            "previous_count": len(self.snapshot),
+        }
+        logger.info(
+            "Delta %s: %d páginas, %d nuevos enriquecidos, %d altas, %d bajas, %d en total",
+            self.command,
+            self.pages,
+            len(new_items),
+            len(diff["added"]),
+            len(diff["removed"]),
+            len(merged),
+        )
+        reported = data.get(COUNT_KEYS[self.command])
+        if self.stopped_early and isinstance(reported, int) and reported != len(merged) and (self.limit is None or reported < self.limit):
+            logger.info(
+                "El perfil reporta %d; la lista combinada tiene %d (las bajas fuera del tramo recorrido no se detectan)",
+                reported,
+                len(merged),
+            )
+        if self.started and not self.complete:
+            logger.warning("Recorrido incremental incompleto (%d nuevos pendientes); no se actualiza la instantánea", len(self.pending))
+        else:
+            self.snapshot.save(merged)
+        return data
@@ -0,0 +1,355 @@
+from __future__ import annotations
+
+import abc
+import csv
+import json
+import logging
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from .records import FollowerRecord, FollowingRecord, PostRecord, Record
+
+
+logger = logging.getLogger(__name__)
+
+FOLLOWING_COLUMNS = ["nombre", "usuario", "biografia", "tipo_de_cuenta", "categoria", "seguidores", "seguidos", "enlace"]
+FOLLOWERS_COLUMNS = ["username", "seguidores", "primer_digito"]
+POSTS_COLUMNS = ["shortcode", "fecha", "tipo", "likes", "comentarios", "reproducciones", "texto", "enlace", "media"]
+
+
+def following_row(it: FollowingRecord) -> List[Any]:
+    return [
+        it.full_name or "",
+        it.username or "",
+        it.biography or "",
+        it.account_type or "",
+        it.category or "",
+        it.followers if it.followers is not None else "",
+        it.following if it.following is not None else "",
+        it.url or "",
+    ]
+
+
+def followers_row(it: FollowerRecord) -> List[Any]:
+    first_digit = it.first_digit
+    return [it.username, it.followers if it.followers is not None else "", first_digit if first_digit is not None else ""]
+
+
+def posts_row(it: PostRecord) -> List[Any]:
+    return [
+        it.shortcode,
+        it.date or "",
+        it.typename or "",
+        it.likes if it.likes is not None else "",
+        it.comments if it.comments is not None else "",
+        it.video_views if it.video_views is not None else "",
+        it.caption or "",
+        it.url,
+        " ".join(it.media_urls),
+    ]
+
+
+# Formato tabular de cada comando: (hoja, columnas, fila a partir del registro)
+LAYOUTS: Dict[str, tuple] = {
+    "following": ("following", FOLLOWING_COLUMNS, following_row),
+    "followers": ("followers", FOLLOWERS_COLUMNS, followers_row),
+    "posts": ("posts", POSTS_COLUMNS, posts_row),
+}
+
+
+def _writable_path(path: Path) -> Path:
+    """`path`, o `<nombre>_v2<ext>` si está bloqueado (p. ej. abierto en Excel en Windows)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        with path.open("ab"):
+            pass
+        return path
+    except PermissionError:
+        alt = path.with_name(path.stem + "_v2" + path.suffix)
+        logger.warning("Archivo %s bloqueado; se escribirá en %s", path, alt)
+        return alt
+
+
+def _next_part(path: Path) -> Path:
+    """`path` si no existe; si no, el primer `<nombre>_partN<ext>` libre (N ≥ 2)."""
+    if not path.exists():
+        return path
+    n = 2
+    while True:
+        part = path.with_name(f"{path.stem}_part{n}{path.suffix}")
+        if not part.exists():
+            return part
+        n += 1
+
+
+def truncate_lines(path: Path, lines: int) -> None:
+    """Deja en `path` solo sus primeras `lines` líneas completas (descarta lo escrito tras el último estado guardado)."""
+    if not path.exists():
+        return
+    seen = 0
+    offset = 0
+    with path.open("rb") as f:
+        for line in f:
+            if seen >= lines or not line.endswith(b"\n"):
+                break
+            seen += 1
+            offset += len(line)
+    if offset < path.stat().st_size:
+        logger.info("Recortando %s a %d líneas", path, seen)
+        with path.open("r+b") as f:
+            f.truncate(offset)
+
+
+class RecordSink(abc.ABC):
+    """Destino de exportación que escribe cada registro según llega.
+
+    Los registros no se acumulan: cada `write` pasa directo al archivo y cada
+    `flush_every` registros se vacía el búfer, de modo que lo escrito hasta un
+    corte queda en disco. Usar como context manager (`close` al salir).
+
+    Con `append`, los formatos `appendable` (.csv, .jsonl) continúan el archivo
+    existente; el resto escribe en una parte nueva (`<nombre>_part2<ext>`, …).
+    """
+
+    # Si se puede continuar el archivo y lo vaciado con `flush` ya es legible tras un corte
+    appendable = False
+
+    def __init__(self, path: Path, kind: str, flush_every: int = 500, append: bool = False) -> None:
+        self.path = _writable_path(path if self.appendable or not append else _next_part(path))
+        self.append = append
+        self.sheet, self.columns, self.to_row = LAYOUTS[kind]
+        self.flush_every = max(1, flush_every)
+        self.count = 0
+
+    def __enter__(self) -> "RecordSink":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def write(self, record: Record) -> None:
+        self._write(record)
+        self.count += 1
+        if self.count % self.flush_every == 0:
+            self.flush()
+
+    @abc.abstractmethod
+    def _write(self, record: Record) -> None:
+        """Escribe una fila en el destino."""
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class CsvSink(RecordSink):
+    appendable = True
+
+    def __init__(self, path: Path, kind: str, flush_every: int = 500, append: bool = False) -> None:
+        super().__init__(path, kind, flush_every, append)
+        resume = append and self.path.stat().st_size > 0
+        self._file = self.path.open("a" if resume else "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        if not resume:
+            self._writer.writerow(self.columns)
+
+    def _write(self, record: Record) -> None:
+        self._writer.writerow(self.to_row(record))
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+
+
+class JsonlSink(RecordSink):
+    """Un objeto JSON por línea con el registro completo (todos sus campos, no solo las columnas)."""
+
+    appendable = True
+
+    def __init__(self, path: Path, kind: str, flush_every: int = 500, append: bool = False) -> None:
+        super().__init__(path, kind, flush_every, append)
+        self._file = self.path.open("a" if append else "w", encoding="utf-8")
+
+    def _write(self, record: Record) -> None:
+        self._file.write(json.dumps(record.to_dict(), ensure_ascii=False) + "\n")
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+
+
+class XlsxSink(RecordSink):
+    """Libro openpyxl en modo `write_only`: las filas van a un temporal y la memoria no crece con su número.
+
+    Un .xlsx es un zip que solo queda válido al cerrarse (`save`); si el
+    proceso se corta antes, lo exportado se recupera del checkpoint
+    (`--resume`) o usando .csv/.jsonl.
+    """
+
+    def __init__(self, path: Path, kind: str, flush_every: int = 500, append: bool = False) -> None:
+        super().__init__(path, kind, flush_every, append)
+        from openpyxl import Workbook
+
+        self._wb = Workbook(write_only=True)
+        self._ws = self._wb.create_sheet(self.sheet)
+        self._ws.append(self.columns)
+        self._closed = False
+
+    def _write(self, record: Record) -> None:
+        self._ws.append(self.to_row(record))
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._wb.save(str(self.path))
+
+
+def _pyarrow() -> Any:
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise RuntimeError("La salida .parquet/.arrow requiere pyarrow (pip install 'instagram-scraper[columnar]')") from e
+    return pyarrow
+
+
+# Columnas tipadas de cada comando: (nombre, tipo, valor a partir del registro).
+# Tipos: "str", "int64", "int8", "category" (diccionario), "timestamp" (UTC) o "list_str";
+# a todas se suma `fecha_consulta`.
+COLUMNAR_LAYOUTS: Dict[str, List[tuple]] = {
+    "following": [
+        ("nombre", "str", lambda it: it.full_name or None),
+        ("usuario", "str", lambda it: it.username or None),
+        ("biografia", "str", lambda it: it.biography or None),
+        ("tipo_de_cuenta", "category", lambda it: it.account_type or None),
+        ("categoria", "category", lambda it: it.category or None),
+        ("seguidores", "int64", lambda it: it.followers),
+        ("seguidos", "int64", lambda it: it.following),
+        ("enlace", "str", lambda it: it.url or None),
+    ],
+    "followers": [
+        ("username", "str", lambda it: it.username or None),
+        ("seguidores", "int64", lambda it: it.followers),
+        ("primer_digito", "int8", lambda it: it.first_digit),
+    ],
+    "posts": [
+        ("shortcode", "str", lambda it: it.shortcode or None),
+        ("fecha", "timestamp", lambda it: datetime.fromisoformat(it.date) if it.date else None),
+        ("tipo", "category", lambda it: it.typename or None),
+        ("likes", "int64", lambda it: it.likes),
+        ("comentarios", "int64", lambda it: it.comments),
+        ("reproducciones", "int64", lambda it: it.video_views),
+        ("texto", "str", lambda it: it.caption or None),
+        ("enlace", "str", lambda it: it.url or None),
+        ("media", "list_str", lambda it: list(it.media_urls)),
+    ],
+}
+
+
+class ColumnarSink(RecordSink):
+    """Parquet o Arrow IPC (`.arrow`/`.feather`) con esquema tipado, escrito por grupos de filas.
+
+    Conteos `int64` con nulos reales, `tipo_de_cuenta`/`categoria` como
+    diccionario y `fecha_consulta` (timestamp UTC del momento en que llegó
+    cada registro). Los registros se acumulan hasta `flush_every` y se
+    escriben como un row group (Parquet) o un record batch (IPC); los
+    diccionarios solo crecen, así el archivo IPC admite deltas entre lotes.
+    Como el .xlsx, el archivo solo queda legible al cerrarse.
+    """
+
+    def __init__(self, path: Path, kind: str, flush_every: int = 10000, append: bool = False) -> None:
+        super().__init__(path, kind, flush_every, append)
+        pa = self._pa = _pyarrow()
+        self._layout = COLUMNAR_LAYOUTS[kind]
+        types = {
+            "str": pa.string(),
+            "int64": pa.int64(),
+            "int8": pa.int8(),
+            "category": pa.dictionary(pa.int32(), pa.string()),
+            "timestamp": pa.timestamp("s", tz="UTC"),
+            "list_str": pa.list_(pa.string()),
+        }
+        self.schema = pa.schema(
+            [pa.field(name, types[kind_]) for name, kind_, _ in self._layout]
+            + [pa.field("fecha_consulta", pa.timestamp("ms", tz="UTC"))]
+        )
+        self._columns: List[List[Any]] = [[] for _ in range(len(self._layout) + 1)]
+        self._dictionaries: Dict[int, Dict[str, int]] = {
+            i: {} for i, (_, kind_, _) in enumerate(self._layout) if kind_ == "category"
+        }
+        if self.path.suffix.lower() == ".parquet":
+            import pyarrow.parquet as pq
+
+            self._writer = pq.ParquetWriter(str(self.path), self.schema)
+        else:
+            import pyarrow.ipc as ipc
+
+            self._file = pa.OSFile(str(self.path), "wb")
+            self._writer = ipc.new_file(self._file, self.schema, options=ipc.IpcWriteOptions(emit_dictionary_deltas=True))
+        self._closed = False
+
+    def _write(self, record: Record) -> None:
+        for i, (_, _, value) in enumerate(self._layout):
+            self._columns[i].append(value(record))
+        self._columns[-1].append(datetime.now(timezone.utc))
+
+    def _array(self, i: int, values: List[Any]) -> Any:
+        pa = self._pa
+        codes = self._dictionaries.get(i)
+        if codes is None:
+            return pa.array(values, type=self.schema.field(i).type)
+        indices = [None if v is None else codes.setdefault(v, len(codes)) for v in values]
+        return pa.DictionaryArray.from_arrays(pa.array(indices, type=pa.int32()), pa.array(list(codes), type=pa.string()))
+
+    def flush(self) -> None:
+        if not self._columns[0]:
+            return
+        arrays = [self._array(i, values) for i, values in enumerate(self._columns)]
+        self._writer.write_batch(self._pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+        self._columns = [[] for _ in self._columns]
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self.flush()
+        self._writer.close()
+        if getattr(self, "_file", None) is not None:
+            self._file.close()
+
+
+SINKS: Dict[str, Callable[..., RecordSink]] = {
+    ".csv": CsvSink,
+    ".jsonl": JsonlSink,
+    ".xlsx": XlsxSink,
+    ".parquet": ColumnarSink,
+    ".arrow": ColumnarSink,
+    ".feather": ColumnarSink,
+}
+
+
+def open_sink(
+    path: Optional[Path], kind: str, flush_every: int = 500, row_group_size: int = 10000, append: bool = False
+) -> Optional[RecordSink]:
+    """Sink para `path` según su extensión (.csv, .jsonl, .xlsx, .parquet, .arrow/.feather).
+
+    Devuelve None si no es un formato por filas. En los columnares el intervalo
+    de escritura es `row_group_size` (tamaño de cada row group / record batch).
+    `append` continúa una exportación anterior (ver `RecordSink`).
+    """
+    if path is None or kind not in LAYOUTS:
+        return None
+    factory = SINKS.get(path.suffix.lower())
+    if factory is None:
+        return None
+    return factory(path, kind, row_group_size if factory is ColumnarSink else flush_every, append)
+
@@ -0,0 +1,318 @@
+from __future__ import annotations
+
+import logging
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .config import Config
+from .metrics import METRICS
+
+
+logger = logging.getLogger(__name__)
+
+# Estado de cada nodo del grafo
+PENDING = 0  # en la frontera, falta pedir sus listas
+EXPANDED = 1  # listas ya pedidas; no se vuelve a consultar
+FAILED = 2  # la consulta falló (se reintenta con `retry_failed`)
+LEAF = 3  # alcanzado en la profundidad máxima; se expande si otra ejecución la aumenta
+SKIPPED = 4  # descartado por el hook de prioridad (p. ej. cuenta privada)
+
+KINDS = ("following", "followers")
+
+# (usuario tal como llega de friendships/web_profile_info, profundidad) -> prioridad o None para no expandir
+PriorityHook = Callable[[Dict[str, Any], int], Optional[float]]
+# (user_id, kind) -> páginas de usuarios de friendships/<id>/<kind>
+PageSource = Callable[[str, str], Iterator[List[Dict[str, Any]]]]
+
+
+def bfs_priority(user: Dict[str, Any], depth: int) -> Optional[float]:
+    """BFS puro: todos los nodos con la misma prioridad; las cuentas privadas no se expanden."""
+    return None if user.get("is_private") else 0.0
+
+
+def bfs_priority_with_private(user: Dict[str, Any], depth: int) -> Optional[float]:
+    """BFS puro que también expande cuentas privadas (útil si la sesión las sigue)."""
+    return 0.0
+
+
+def _user_id(user: Dict[str, Any]) -> Optional[int]:
+    raw = user.get("pk") or user.get("pk_id") or user.get("id")
+    try:
+        return int(raw)
+    except (TypeError, ValueError):
+        return None
+
+
+def _numpy() -> Any:
+    try:
+        import numpy
+    except ImportError as e:
+        raise RuntimeError("La exportación CSR requiere numpy (pip install 'instagram-scraper[analysis]')") from e
+    return numpy
+
+
+class GraphStore:
+    """Grafo de seguimiento persistente en SQLite con claves enteras (user id de Instagram).
+
+    `nodes` guarda username, profundidad, estado y prioridad de cada cuenta;
+    `edges(src, dst)` significa "src sigue a dst" y es una tabla `WITHOUT ROWID`
+    ordenada por (src, dst), con índice inverso por dst. La frontera es el
+    conjunto de nodos `PENDING` (índice por estado, profundidad y prioridad),
+    así que ni la frontera ni el conjunto de visitados viven en memoria y el
+    recorrido se reanuda abriendo el mismo archivo.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS nodes ("
+            " id INTEGER PRIMARY KEY,"
+            " username TEXT, full_name TEXT, is_private INTEGER,"
+            " depth INTEGER NOT NULL, state INTEGER NOT NULL, priority REAL NOT NULL DEFAULT 0,"
+            " expanded_at REAL, error TEXT)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS edges (src INTEGER NOT NULL, dst INTEGER NOT NULL, PRIMARY KEY (src, dst)) WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS edges_dst ON edges(dst, src)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS nodes_frontier ON nodes(state, depth, priority)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS nodes_username ON nodes(username)")
+        self._conn.commit()
+
+    @classmethod
+    def from_config(cls, config: Config, path: Optional[str] = None) -> "GraphStore":
+        return cls(path or config.graph_path)
+
+    def __enter__(self) -> "GraphStore":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._conn.close()
+
+    # --- Nodos y frontera ---
+
+    def node_id(self, username: str) -> Optional[int]:
+        row = self._conn.execute("SELECT id FROM nodes WHERE username = ?", (username,)).fetchone()
+        return row[0] if row else None
+
+    def add_nodes(self, rows: Iterable[Tuple[int, Optional[str], Optional[str], Optional[bool], int, int, float]]) -> None:
+        """Inserta o actualiza `(id, username, full_name, is_private, depth, state, priority)`.
+
+        Un nodo ya conocido conserva su estado salvo que fuese `LEAF`/`SKIPPED`
+        y ahora llegue como `PENDING` (alcanzado a menor profundidad o pedido
+        como semilla); la profundidad guardada es siempre la mínima. No hace
+        commit: ver `commit` y `expanded`.
+        """
+        self._conn.executemany(
+            "INSERT INTO nodes (id, username, full_name, is_private, depth, state, priority) VALUES (?, ?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT(id) DO UPDATE SET"
+            " username = COALESCE(excluded.username, username),"
+            " full_name = COALESCE(excluded.full_name, full_name),"
+            " is_private = COALESCE(excluded.is_private, is_private),"
+            " depth = MIN(depth, excluded.depth),"
+            f" state = CASE WHEN state IN ({LEAF}, {SKIPPED}) AND excluded.state = {PENDING} THEN {PENDING} ELSE state END,"
+            f" priority = CASE WHEN state IN ({LEAF}, {SKIPPED}) AND excluded.state = {PENDING} THEN excluded.priority ELSE priority END",
+            rows,
+        )
+
+    def commit(self) -> None:
+        self._conn.commit()
+
+    def next_pending(self) -> Optional[Tuple[int, Optional[str], int]]:
+        """(id, username, depth) del siguiente nodo de la frontera: menor profundidad y luego menor prioridad."""
+        return self._conn.execute(
+            "SELECT id, username, depth FROM nodes WHERE state = ? ORDER BY depth, priority, id LIMIT 1", (PENDING,)
+        ).fetchone()
+
+    def promote_leaves(self, max_depth: int) -> int:
+        """Devuelve a la frontera las hojas que quedan por debajo de una nueva profundidad máxima."""
+        cur = self._conn.execute("UPDATE nodes SET state = ? WHERE state = ? AND depth < ?", (PENDING, LEAF, max_depth))
+        self._conn.commit()
+        return cur.rowcount
+
+    def retry_failed(self) -> int:
+        cur = self._conn.execute("UPDATE nodes SET state = ?, error = NULL WHERE state = ?", (PENDING, FAILED))
+        self._conn.commit()
+        return cur.rowcount
+
+    def expanded(self, node_id: int, neighbors: List[Tuple[int, Optional[str], Optional[str], Optional[bool], int, int, float]], edges: List[Tuple[int, int]]) -> None:
+        """Registra en una sola transacción los vecinos, las aristas y el nodo como `EXPANDED`."""
+        with self._conn:
+            self.add_nodes(neighbors)
+            self._conn.executemany("INSERT OR IGNORE INTO edges (src, dst) VALUES (?, ?)", edges)
+            self._conn.execute("UPDATE nodes SET state = ?, expanded_at = ?, error = NULL WHERE id = ?", (EXPANDED, time.time(), node_id))
+
+    def failed(self, node_id: int, error: str) -> None:
+        with self._conn:
+            self._conn.execute("UPDATE nodes SET state = ?, error = ? WHERE id = ?", (FAILED, error[:500], node_id))
+
+    def stats(self) -> Dict[str, int]:
+        names = {PENDING: "pending", EXPANDED: "expanded", FAILED: "failed", LEAF: "leaf", SKIPPED: "skipped"}
+        out = {name: 0 for name in names.values()}
+        for state, count in self._conn.execute("SELECT state, COUNT(*) FROM nodes GROUP BY state"):
+            out[names.get(state, str(state))] = count
+        out["nodes"] = sum(out[name] for name in names.values())
+        (out["edges"],) = self._conn.execute("SELECT COUNT(*) FROM edges").fetchone()
+        return out
+
+    # --- Exportación ---
+
+    def export_csr(self, path: Path) -> Dict[str, int]:
+        """Escribe la adyacencia en CSR (`.npz`): fila = seguidor, columna = seguido.
+
+        Arreglos: `indptr` (n+1), `indices` (aristas, índices densos de nodo),
+        `ids` (user id de cada índice, ordenados), `usernames` y `depth`. Las
+        aristas se leen en el orden de la clave primaria (src, dst), así que
+        `indices` queda ordenado dentro de cada fila sin ordenar en memoria.
+        Se carga con `scipy.sparse.csr_matrix((np.ones(len(indices)), indices, indptr))`.
+        """
+        np = _numpy()
+        ids = np.fromiter((r[0] for r in self._conn.execute("SELECT id FROM nodes ORDER BY id")), dtype=np.int64)
+        n = int(ids.size)
+        meta = self._conn.execute("SELECT username, depth FROM nodes ORDER BY id").fetchall()
+        usernames = np.array([m[0] or "" for m in meta], dtype="U30")
+        depth = np.array([m[1] for m in meta], dtype=np.int16)
+        (m,) = self._conn.execute("SELECT COUNT(*) FROM edges").fetchone()
+        pairs = np.fromiter(
+            self._conn.execute("SELECT src, dst FROM edges ORDER BY src, dst"), dtype=np.dtype([("src", np.int64), ("dst", np.int64)]), count=m
+        )
+        index_type = np.int32 if n < 2**31 else np.int64
+        rows = np.searchsorted(ids, pairs["src"])
+        indices = np.searchsorted(ids, pairs["dst"]).astype(index_type)
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez_compressed(path, indptr=indptr, indices=indices, ids=ids, usernames=usernames, depth=depth)
+        logger.info("CSR exportado en %s: %d nodos, %d aristas", path, n, m)
+        return {"nodes": n, "edges": int(m)}
+
+
+class GraphCrawler:
+    """Recorrido en anchura (BFS) del grafo de seguimiento a partir de un conjunto de semillas.
+
+    Cada nodo de la frontera se expande pidiendo sus listas `kinds`
+    (following y/o followers) hasta `fan_out` usuarios por lista; los vecinos
+    nuevos entran en la frontera con profundidad + 1 hasta `max_depth`, y los
+    que llegan a esa profundidad se guardan como hojas. `priority(user, depth)`
+    ordena la frontera dentro de cada nivel (menor primero) y devuelve None para
+    no expandir un nodo. Todo el estado vive en `GraphStore`: ningún nodo se
+    consulta dos veces, tampoco entre ejecuciones.
+
+    El motor solo aporta `resolve(username)` (user de `web_profile_info`, para
+    las semillas) y `pages(user_id, kind)` (páginas de friendships); ver
+    `crawl_graph` de `HttpInstagramScraper` y `BrowserInstagramScraper`.
+    """
+
+    def __init__(
+        self,
+        store: GraphStore,
+        kinds: Iterable[str] = ("following",),
+        max_depth: int = 2,
+        fan_out: int = 200,
+        max_nodes: Optional[int] = None,
+        priority: PriorityHook = bfs_priority,
+    ) -> None:
+        self.store = store
+        self.kinds = tuple(kinds)
+        for kind in self.kinds:
+            if kind not in KINDS:
+                raise ValueError(f"Tipo de listado desconocido: {kind}")
+        self.max_depth = max(0, max_depth)
+        self.fan_out = max(1, fan_out)
+        self.max_nodes = max_nodes
+        self.priority = priority
+
+    def _node_row(self, user: Dict[str, Any], uid: int, depth: int) -> Tuple[int, Optional[str], Optional[str], Optional[bool], int, int, float]:
+        score = self.priority(user, depth)
+        if score is None:
+            state = SKIPPED
+        elif depth >= self.max_depth:
+            state = LEAF
+        else:
+            state = PENDING
+        private = user.get("is_private")
+        return (uid, user.get("username"), user.get("full_name") or None, None if private is None else bool(private), depth, state, score or 0.0)
+
+    def add_seeds(self, usernames: Iterable[str], resolve: Callable[[str], Dict[str, Any]]) -> int:
+        """Añade las semillas con profundidad 0; solo se consulta `resolve` para las que el grafo no conoce."""
+        added = 0
+        for username in usernames:
+            uid = self.store.node_id(username)
+            user: Dict[str, Any] = {"username": username}
+            if uid is None:
+                user = resolve(username)
+                uid = _user_id(user)
+                if uid is None:
+                    logger.warning("Semilla sin id resoluble: %s", username)
+                    continue
+            row = self._node_row(user, uid, 0)
+            # Una semilla se expande aunque el hook la descarte: se pidió explícitamente
+            self.store.add_nodes([row[:5] + (PENDING if self.max_depth > 0 else LEAF, row[6])])
+            added += 1
+        self.store.commit()
+        return added
+
+    def _neighbors(self, pages: PageSource, user_id: int, kind: str) -> List[Dict[str, Any]]:
+        users: List[Dict[str, Any]] = []
+        source = pages(str(user_id), kind)
+        try:
+            for page in source:
+                users.extend(page)
+                if len(users) >= self.fan_out:
+                    break
+        finally:
+            close = getattr(source, "close", None)
+            if close is not None:
+                close()
+        return users[: self.fan_out]
+
+    def run(
+        self,
+        seeds: Iterable[str],
+        resolve: Callable[[str], Dict[str, Any]],
+        pages: PageSource,
+        pause: Optional[Callable[[], None]] = None,
+    ) -> Dict[str, int]:
+        """Añade las semillas y expande la frontera hasta vaciarla o llegar a `max_nodes`; devuelve `stats()`."""
+        promoted = self.store.promote_leaves(self.max_depth)
+        if promoted:
+            logger.info("Grafo: %d hojas vuelven a la frontera (profundidad %d)", promoted, self.max_depth)
+        self.add_seeds(seeds, resolve)
+        expanded = 0
+        while self.max_nodes is None or expanded < self.max_nodes:
+            node = self.store.next_pending()
+            if node is None:
+                break
+            node_id, username, depth = node
+            if expanded and pause is not None:
+                pause()
+            try:
+                neighbors: List[Tuple[Any, ...]] = []
+                edges: List[Tuple[int, int]] = []
+                for kind in self.kinds:
+                    for user in self._neighbors(pages, node_id, kind):
+                        uid = _user_id(user)
+                        if uid is None or uid == node_id:
+                            continue
+                        neighbors.append(self._node_row(user, uid, depth + 1))
+                        edges.append((node_id, uid) if kind == "following" else (uid, node_id))
+            except Exception as e:
+                logger.error("Grafo: fallo al expandir %s (%s): %s", username or node_id, node_id, e)
+                self.store.failed(node_id, str(e))
+                continue
+            self.store.expanded(node_id, neighbors, edges)
+            expanded += 1
+            METRICS.stage("graph_expand")
+            logger.info("Grafo: %s (profundidad %d) -> %d aristas", username or node_id, depth, len(edges))
+        stats = self.store.stats()
+        stats["expanded_now"] = expanded
+        return stats
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import logging
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from .metrics import METRICS
+
+
+logger = logging.getLogger(__name__)
+
+_FRIENDSHIPS_RE = re.compile(r"/api/v1/friendships/(\d+)/(following|followers)/")
+_GRAPHQL_EDGES = {"following": "edge_follow", "followers": "edge_followed_by"}
+
+
+class FriendshipHarvester:
+    """Recoge los usuarios de las respuestas XHR del diálogo de seguidores/seguidos.
+
+    Al abrir y scrollear el diálogo, Instagram pide las páginas a
+    `friendships/<id>/<kind>/` (o a GraphQL con `edge_follow`/`edge_followed_by`)
+    y ya recibe cada usuario completo. Escuchando `page.on("response")` se toman
+    de ahí username, id, nombre y verificación, sin recorrer los `<a>` del DOM
+    en cada ronda ni pedir el nombre por usuario.
+
+    `exhausted` indica que la última página del perfil del diálogo llegó sin
+    cursor siguiente. Ese perfil es `user_id`: si no se conoce, lo fija la
+    primera respuesta de `friendships/<id>/<kind>/`. Las respuestas de otro
+    perfil se ignoran, y una respuesta GraphQL sin `data.user.id` aporta sus
+    usuarios pero no puede dar el listado por terminado.
+    """
+
+    def __init__(self, kind: str, user_id: Optional[str] = None) -> None:
+        if kind not in _GRAPHQL_EDGES:
+            raise ValueError(f"Tipo de listado desconocido: {kind}")
+        self.kind = kind
+        self.user_id = user_id
+        self.users: Dict[str, Dict[str, Any]] = {}
+        self._fresh: List[str] = []
+        self.responses = 0
+        self.exhausted = False
+        self._page: Any = None
+        self._handler: Any = None
+
+    def attach(self, page: Any) -> None:
+        """Escucha las respuestas de una página de la API síncrona."""
+        self._page, self._handler = page, self._on_response
+        page.on("response", self._handler)
+
+    def attach_async(self, page: Any) -> None:
+        """Igual que `attach` para una página de `playwright.async_api`."""
+        self._page, self._handler = page, self._on_response_async
+        page.on("response", self._handler)
+
+    def detach(self) -> None:
+        if self._page is not None:
+            try:
+                self._page.remove_listener("response", self._handler)
+            except Exception:
+                pass
+        self._page = self._handler = None
+        if self.users:
+            METRICS.stage("harvest", len(self.users))
+            logger.info("Usuarios tomados de las respuestas del diálogo (%s): %d", self.kind, len(self.users))
+
+    def usernames(self) -> List[str]:
+        return list(self.users)
+
+    def take_new(self) -> List[Tuple[str, Optional[str]]]:
+        """(username, full_name) recogidos desde la llamada anterior."""
+        fresh, self._fresh = self._fresh, []
+        return [(u, self.users[u]["full_name"]) for u in fresh]
+
+    def matches(self, url: str, resource_type: Optional[str] = None) -> bool:
+        if resource_type is not None and resource_type not in ("fetch", "xhr"):
+            return False
+        m = _FRIENDSHIPS_RE.search(url)
+        if m:
+            return m.group(2) == self.kind
+        return "/graphql" in url
+
+    def add_payload(self, data: Any, url: str = "") -> int:
+        """Añade los usuarios de un JSON de friendships o GraphQL (respuesta de `url`); devuelve cuántos eran nuevos."""
+        if not isinstance(data, dict):
+            return 0
+        if isinstance(data.get("users"), list):
+            m = _FRIENDSHIPS_RE.search(url)
+            owner = m.group(1) if m else None
+            if owner is not None and self.user_id is None:
+                self.user_id = owner
+            raw = data["users"]
+            more = bool(data.get("next_max_id"))
+        else:
+            user = (data.get("data") or {}).get("user") or {}
+            edge = user.get(_GRAPHQL_EDGES[self.kind]) if isinstance(user, dict) else None
+            if not isinstance(edge, dict):
+                return 0
+            owner = str(user.get("id") or "") or None
+            raw = [e.get("node") or {} for e in edge.get("edges") or []]
+            more = bool((edge.get("page_info") or {}).get("has_next_page"))
+        if owner is not None and self.user_id is not None and owner != self.user_id:
+            # Listado de otro perfil (tarjeta al pasar el ratón, sugerencias, ...)
+            return 0
+        added = 0
+        for u in raw:
+            username = u.get("username") if isinstance(u, dict) else None
+            if not username or username in self.users:
+                continue
+            self.users[username] = {
+                "id": str(u.get("pk") or u.get("pk_id") or u.get("id") or "") or None,
+                "username": username,
+                "full_name": u.get("full_name") or None,
+                "is_verified": bool(u.get("is_verified")),
+                "is_private": bool(u.get("is_private")),
+            }
+            self._fresh.append(username)
+            added += 1
+        self.responses += 1
+        if owner is not None and owner == self.user_id:
+            self.exhausted = not more
+        return added
+
+    def _on_response(self, response: Any) -> None:
+        try:
+            if not self.matches(response.url, response.request.resource_type) or not response.ok:
+                return
+            self.add_payload(response.json(), response.url)
+        except Exception as e:
+            logger.debug("Respuesta del diálogo no aprovechable (%s): %s", response.url, e)
+
+    async def _on_response_async(self, response: Any) -> None:
+        try:
+            if not self.matches(response.url, response.request.resource_type) or not response.ok:
+                return
+            self.add_payload(await response.json(), response.url)
+        except Exception as e:
+            logger.debug("Respuesta del diálogo no aprovechable (%s): %s", response.url, e)
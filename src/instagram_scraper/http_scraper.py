@@ -0,0 +1,452 @@
+from __future__ import annotations
+
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .accounts import AccountPool
+from .auth import FacebookAuthenticator
+from .cache import ProfileCache
+from .checkpoint import (
+    CrawlCheckpoint,
+    PageFetcher,
+    collect_resumable,
+    resumable_followers_result,
+    resumable_following_result,
+)
+from .config import Config
+from .graph import GraphCrawler
+from .metrics import METRICS, endpoint_for
+from .ratelimit import AdaptiveRateLimiter
+from .records import FollowerRecord, FollowingRecord
+from .utils import INSTAGRAM_ORIGIN, extract_username
+from . import profiles
+
+
+logger = logging.getLogger(__name__)
+
+IG_APP_ID = "936619743392459"
+_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"
+)
+
+
+class HttpInstagramScraper:
+    """Backend sin navegador que reutiliza la sesión guardada por `FacebookAuthenticator`.
+
+    Carga las cookies (`sessionid`, `csrftoken`, …) del storage_state en un
+    `requests.Session` con conexiones keep-alive y consulta directamente
+    `web_profile_info` y `friendships/<id>/following|followers`. Devuelve los
+    mismos dicts que `BrowserInstagramScraper`; Chromium solo hace falta para el
+    login y para los fallbacks de DOM/UI, que este backend no implementa.
+
+    `base_url` permite apuntar a un servidor local que imite a Instagram. Con
+    `cache`, `fetch_user` y `fetch_profile_html` sirven primero desde la caché.
+    Con `limiter`, cada petición espera su token y los 429 se delegan en el
+    control de tasa compartido en lugar del backoff propio. Con `accounts`, hay
+    un `requests.Session` por cuenta y cada petición sale por la cuenta que
+    antes puede hacerla; tras un 429 esa cuenta queda en pausa y el reintento
+    va inmediatamente a otra.
+    """
+
+    def __init__(
+        self,
+        config: Config,
+        storage_state: Optional[Dict[str, Any]] = None,
+        base_url: str = INSTAGRAM_ORIGIN,
+        pool_size: int = 10,
+        timeout: float = 30.0,
+        cache: Optional[ProfileCache] = None,
+        limiter: Optional[AdaptiveRateLimiter] = None,
+        accounts: Optional[AccountPool] = None,
+    ) -> None:
+        self.config = config
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.cache = cache
+        self.limiter = limiter
+        self.accounts = accounts
+        self._sessions: Dict[str, requests.Session] = {}
+        if accounts is not None:
+            for account in accounts.accounts:
+                self._sessions[account.name] = self._build_session(account.storage_state, pool_size)
+            self.session = self._sessions[accounts.accounts[0].name]
+            return
+        if storage_state is None:
+            storage_state = FacebookAuthenticator(config).load_storage_state()
+        self.session = self._build_session(storage_state, pool_size)
+
+    def __enter__(self) -> "HttpInstagramScraper":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.session.close()
+        for session in self._sessions.values():
+            session.close()
+
+    def _build_session(self, storage_state: Dict[str, Any], pool_size: int) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        host = urlparse(self.base_url).hostname or "www.instagram.com"
+        rewrite = not host.endswith("instagram.com")
+        for c in storage_state.get("cookies", []):
+            domain = c.get("domain") or ""
+            if not domain.lstrip(".").endswith("instagram.com"):
+                continue
+            session.cookies.set(c["name"], c["value"], domain=host if rewrite else domain, path=c.get("path") or "/")
+        session.headers.update(
+            {
+                "user-agent": _USER_AGENT,
+                "x-ig-app-id": IG_APP_ID,
+                "x-requested-with": "XMLHttpRequest",
+                "referer": self.base_url + "/",
+            }
+        )
+        csrf = session.cookies.get("csrftoken")
+        if csrf:
+            session.headers["x-csrftoken"] = csrf
+        if not session.cookies.get("sessionid"):
+            logger.warning("El storage_state no contiene cookie sessionid; las consultas irán sin sesión")
+        return session
+
+    def _get(self, path: str, params: Optional[Dict[str, Any]], tries: int, base_ms: int) -> requests.Response:
+        """GET con el mismo backoff que `fetchRetry` de los scripts (429/0 → espera ×1.7, tope 15 s)."""
+        url = self.base_url + path
+        endpoint = endpoint_for(url) or "other"
+        attempt_key = f"{url}?{sorted((params or {}).items())}"
+        delay = base_ms
+        for _ in range(max(1, tries)):
+            session = self.session
+            account = None
+            if self.accounts is not None:
+                account = self.accounts.acquire()
+                session = self._sessions[account.name]
+            if self.limiter is not None:
+                self.limiter.acquire()
+            t0 = time.monotonic()
+            try:
+                res = session.get(url, params=params, timeout=self.timeout)
+            except requests.RequestException:
+                status = 0
+                METRICS.observe(endpoint, time.monotonic() - t0, 0, 0, attempt_key)
+            else:
+                status = res.status_code
+                METRICS.observe(endpoint, time.monotonic() - t0, status, len(res.content), attempt_key)
+                if self.limiter is not None:
+                    self.limiter.report(status)
+                if account is not None:
+                    self.accounts.report(account, status)
+                if res.ok:
+                    return res
+            if status == 429 and (self.limiter is not None or account is not None):
+                # La pausa la imponen el limitador compartido o la cuenta en el siguiente acquire
+                continue
+            if status in (429, 0):
+                time.sleep((delay + random.randint(0, 899)) / 1000)
+                delay = min(int(delay * 1.7), 15000)
+                continue
+            raise RuntimeError(f"HTTP {status}")
+        raise RuntimeError("Too many retries")
+
+    def fetch_user(self, username: str, retry_tries: int = 10, retry_base_ms: int = 2500) -> Dict[str, Any]:
+        """Devuelve el `data.user` de `web_profile_info`."""
+        if self.cache is not None:
+            cached = self.cache.get(username, "user")
+            if cached is not None:
+                return cached
+        res = self._get("/api/v1/users/web_profile_info/", {"username": username}, retry_tries, retry_base_ms)
+        user = (res.json().get("data") or {}).get("user")
+        if not user:
+            raise RuntimeError("Respuesta inválida de la API de Instagram para el perfil solicitado")
+        if self.cache is not None:
+            self.cache.put(username, "user", user)
+        return user
+
+    def fetch_profile_html(self, username: str, retry_tries: int = 10, retry_base_ms: int = 2500) -> Dict[str, Any]:
+        """Lee nombre y conteos de las etiquetas og del HTML del perfil."""
+        if self.cache is not None:
+            cached = self.cache.get(username, "html")
+            if cached is not None:
+                return profiles.profile_from_og(cached)
+        res = self._get(f"/{username}/", None, retry_tries, retry_base_ms)
+        meta = profiles.parse_og_meta(res.text)
+        if self.cache is not None and (meta.get("og:title") or meta.get("og:description")):
+            self.cache.put(username, "html", {k: meta.get(k) for k in ("og:title", "og:description")})
+        return profiles.profile_from_og(meta)
+
+    def iter_friendships(
+        self,
+        user_id: str,
+        kind: str,
+        page_size: int = 12,
+        delay_ms: int = 3000,
+        retry_tries: int = 10,
+        retry_base_ms: int = 2500,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """Recorre `friendships/<id>/<kind>` página a página (kind: following|followers)."""
+        max_id: Optional[str] = None
+        while True:
+            params: Dict[str, Any] = {"count": str(page_size)}
+            if max_id:
+                params["max_id"] = max_id
+            data = self._get(f"/api/v1/friendships/{user_id}/{kind}/", params, retry_tries, retry_base_ms).json()
+            yield data.get("users") or []
+            max_id = data.get("next_max_id")
+            if not max_id:
+                return
+            time.sleep(delay_ms / 1000)
+
+    def _collect_users(self, user_id: str, kind: str, limit: int, page_size: int, delay_ms: int, retry_tries: int, retry_base_ms: int) -> List[Dict[str, Any]]:
+        users: List[Dict[str, Any]] = []
+        for page in self.iter_friendships(user_id, kind, page_size, delay_ms, retry_tries, retry_base_ms):
+            users.extend(page)
+            if len(users) >= limit:
+                break
+        return users[:limit]
+
+    def get_profile_data(self, profile_url: str, posts_limit: Optional[int] = None) -> Dict[str, Any]:
+        username = extract_username(profile_url)
+        limit = posts_limit or self.config.posts_limit
+        logger.info("Consultando API web_profile_info para %s (HTTP)", username)
+        user = self.fetch_user(username)
+        return profiles.profile_from_response({"data": {"user": user}}, limit)
+
+    def get_following_details(
+        self,
+        profile_url: str,
+        following_limit: Optional[int] = None,
+        page_size: int = 12,
+        chunk: int = 2,
+        delay_ms: int = 3000,
+        retry_tries: int = 10,
+        retry_base_ms: int = 2500,
+        force_ui: bool = False,
+        checkpoint: Optional[CrawlCheckpoint] = None,
+    ) -> Dict[str, Any]:
+        """Igual que `BrowserInstagramScraper.get_following_details`, sin navegador."""
+        username = extract_username(profile_url)
+        limit = following_limit or 20
+        if force_ui:
+            logger.warning("El backend HTTP no tiene modo UI; se ignora --force-ui")
+        if checkpoint is not None:
+            logger.info("Consultando seguidos y detalles para %s (HTTP, reanudable)", username)
+            items = collect_resumable(
+                self.iter_following(profile_url, limit, page_size, chunk, delay_ms, retry_tries, retry_base_ms, checkpoint),
+                checkpoint,
+                "seguidos",
+            )
+            return resumable_following_result(username, checkpoint, items)
+        try:
+            logger.info("Consultando seguidos y detalles para %s (HTTP)", username)
+            target = self.fetch_user(username, retry_tries, retry_base_ms)
+            users = self._collect_users(str(target["id"]), "following", limit, page_size, delay_ms, retry_tries, retry_base_ms)
+
+            def detail(it: Dict[str, Any]) -> FollowingRecord:
+                return self._following_detail(it.get("username") or "", retry_tries, retry_base_ms)
+
+            out = self._map_chunks(detail, users, chunk, delay_ms)
+            logger.info("Items recogidos (HTTP): %d", len(out))
+            logger.info("Count (seguidos del perfil): %s", str((target.get("edge_follow") or {}).get("count")))
+            return {
+                "username": target.get("username"),
+                "following_count": (target.get("edge_follow") or {}).get("count"),
+                "scraped_count": len(out),
+                "following_details": out,
+            }
+        except Exception as e:
+            logger.error("Fallo inesperado en get_following_details: %s", e)
+            return {"username": username, "following_count": None, "following_details": []}
+
+    def get_followers_counts_for_followers(
+        self,
+        profile_url: str,
+        followers_limit: Optional[int] = None,
+        page_size: int = 12,
+        chunk: int = 2,
+        delay_ms: int = 3000,
+        retry_tries: int = 10,
+        retry_base_ms: int = 2500,
+        checkpoint: Optional[CrawlCheckpoint] = None,
+    ) -> Dict[str, Any]:
+        """Igual que `BrowserInstagramScraper.get_followers_counts_for_followers`, sin navegador."""
+        username = extract_username(profile_url)
+        limit = followers_limit or 20
+        if checkpoint is not None:
+            logger.info("Consultando seguidores y conteos para %s (HTTP, reanudable)", username)
+            items = collect_resumable(
+                self.iter_followers(profile_url, limit, page_size, chunk, delay_ms, retry_tries, retry_base_ms, checkpoint),
+                checkpoint,
+                "seguidores",
+            )
+            return resumable_followers_result(username, checkpoint, items)
+        logger.info("Consultando seguidores y conteos para %s (HTTP)", username)
+        target = self.fetch_user(username, retry_tries, retry_base_ms)
+        users = self._collect_users(str(target["id"]), "followers", limit, page_size, delay_ms, retry_tries, retry_base_ms)
+
+        def count(it: Dict[str, Any]) -> FollowerRecord:
+            return self._follower_count(it.get("username"), retry_tries, retry_base_ms)
+
+        out = self._map_chunks(count, users, chunk, delay_ms)
+        total = (target.get("edge_followed_by") or {}).get("count")
+        logger.info("Items recogidos (HTTP): %d", len(out))
+        logger.info("Count (followers del perfil): %s", str(total))
+        return {"username": target.get("username"), "count": total, "scraped_count": len(out), "followers_of_followers": out}
+
+    def iter_following(
+        self,
+        profile_url: str,
+        following_limit: Optional[int] = None,
+        page_size: int = 12,
+        chunk: int = 2,
+        delay_ms: int = 3000,
+        retry_tries: int = 10,
+        retry_base_ms: int = 2500,
+        checkpoint: Optional[CrawlCheckpoint] = None,
+    ) -> Iterator[FollowingRecord]:
+        """Igual que `BrowserInstagramScraper.iter_following`: genera cada seguido enriquecido según llega."""
+        cp = checkpoint or CrawlCheckpoint()
+        yield from cp.results()
+        if cp.complete:
+            return
+        fetch = self._page_fetcher(extract_username(profile_url), "following", cp, page_size, delay_ms, retry_tries, retry_base_ms)
+        yield from self._stream(
+            lambda uname: self._following_detail(uname or "", retry_tries, retry_base_ms), fetch, cp, following_limit, chunk, delay_ms
+        )
+
+    def iter_followers(
+        self,
+        profile_url: str,
+        followers_limit: Optional[int] = None,
+        page_size: int = 12,
+        chunk: int = 2,
+        delay_ms: int = 3000,
+        retry_tries: int = 10,
+        retry_base_ms: int = 2500,
+        checkpoint: Optional[CrawlCheckpoint] = None,
+    ) -> Iterator[FollowerRecord]:
+        """Igual que `BrowserInstagramScraper.iter_followers`: genera un `FollowerRecord` según llega."""
+        cp = checkpoint or CrawlCheckpoint()
+        yield from cp.results()
+        if cp.complete:
+            return
+        fetch = self._page_fetcher(extract_username(profile_url), "followers", cp, page_size, delay_ms, retry_tries, retry_base_ms)
+        yield from self._stream(
+            lambda uname: self._follower_count(uname, retry_tries, retry_base_ms), fetch, cp, followers_limit, chunk, delay_ms
+        )
+
+    def crawl_graph(
+        self,
+        crawler: GraphCrawler,
+        seeds: List[str],
+        page_size: int = 12,
+        delay_ms: int = 3000,
+        retry_tries: int = 10,
+        retry_base_ms: int = 2500,
+    ) -> Dict[str, int]:
+        """Ejecuta `crawler` (BFS multi-salto) con las consultas de este backend; devuelve sus estadísticas."""
+        return crawler.run(
+            seeds,
+            resolve=lambda uname: self.fetch_user(uname, retry_tries, retry_base_ms),
+            pages=lambda user_id, kind: self.iter_friendships(user_id, kind, page_size, delay_ms, retry_tries, retry_base_ms),
+            pause=lambda: time.sleep(delay_ms / 1000),
+        )
+
+    def _page_fetcher(
+        self,
+        username: str,
+        kind: str,
+        cp: CrawlCheckpoint,
+        page_size: int,
+        delay_ms: int,
+        retry_tries: int,
+        retry_base_ms: int,
+    ) -> PageFetcher:
+        if cp.target is None:
+            user = self.fetch_user(username, retry_tries, retry_base_ms)
+            cp.set_target(
+                {
+                    "id": str(user["id"]),
+                    "username": user.get("username"),
+                    "following_count": (user.get("edge_follow") or {}).get("count"),
+                    "followers_count": (user.get("edge_followed_by") or {}).get("count"),
+                }
+            )
+        user_id = cp.target["id"]
+
+        def fetch(cursor: Optional[str]) -> Tuple[List[str], Optional[str]]:
+            if cursor:
+                time.sleep(delay_ms / 1000)
+            params: Dict[str, Any] = {"count": str(page_size)}
+            if cursor:
+                params["max_id"] = cursor
+            data = self._get(f"/api/v1/friendships/{user_id}/{kind}/", params, retry_tries, retry_base_ms).json()
+            return [u.get("username") for u in data.get("users") or []], data.get("next_max_id")
+
+        return fetch
+
+    def _following_detail(self, uname: str, retry_tries: int, retry_base_ms: int) -> FollowingRecord:
+        METRICS.stage("api")
+        try:
+            user = self.fetch_user(uname, retry_tries, retry_base_ms)
+        except Exception:
+            user = None
+        item = FollowingRecord.from_user(uname, user, self.base_url)
+        if item.incomplete and uname:
+            METRICS.stage("html")
+            try:
+                item.merge_missing(self.fetch_profile_html(uname, retry_tries, retry_base_ms))
+            except Exception:
+                pass
+        return item
+
+    def _follower_count(self, uname: str, retry_tries: int, retry_base_ms: int) -> FollowerRecord:
+        METRICS.stage("api")
+        try:
+            user = self.fetch_user(uname, retry_tries, retry_base_ms)
+            return FollowerRecord(uname, (user.get("edge_followed_by") or {}).get("count"))
+        except Exception:
+            pass
+        METRICS.stage("html")
+        try:
+            return FollowerRecord(uname, self.fetch_profile_html(uname, retry_tries, retry_base_ms).get("followers"))
+        except Exception:
+            return FollowerRecord(uname)
+
+    def _stream(
+        self,
+        fn,
+        fetch: PageFetcher,
+        cp: CrawlCheckpoint,
+        limit: Optional[int],
+        chunk: int,
+        delay_ms: int,
+    ) -> Iterator[Any]:
+        """Aplica `fn` a los lotes de usernames del checkpoint, registrando y entregando cada resultado."""
+        with ThreadPoolExecutor(max_workers=max(1, chunk)) as executor:
+            for part in cp.batches(fetch, limit, chunk):
+                items = list(executor.map(fn, part))
+                cp.batch_done(items)
+                yield from items
+                time.sleep(delay_ms / 1000)
+
+    def _map_chunks(self, fn, users: List[Dict[str, Any]], chunk: int, delay_ms: int) -> List[Any]:
+        """Aplica `fn` en bloques de `chunk` peticiones simultáneas, con pausa entre bloques."""
+        size = max(1, chunk)
+        out: List[Any] = []
+        with ThreadPoolExecutor(max_workers=size) as executor:
+            for i in range(0, len(users), size):
+                out.extend(executor.map(fn, users[i : i + size]))
+                time.sleep(delay_ms / 1000)
+        return out
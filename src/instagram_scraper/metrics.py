@@ -0,0 +1,323 @@
+from __future__ import annotations
+
+import json
+import logging
+import math
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+
+logger = logging.getLogger(__name__)
+
+ENDPOINTS = (
+    "web_profile_info",
+    "friendships_following",
+    "friendships_followers",
+    "profile_html",
+    "dom_navigation",
+)
+STAGES = ("api", "html", "dom", "ui", "harvest")
+_QUANTILES = (0.5, 0.9, 0.99)
+_RESERVED_PATHS = {"accounts", "explore", "direct", "reels", "stories", "p", "api", "static"}
+
+
+def endpoint_for(url: str, resource_type: str = "fetch") -> Optional[str]:
+    """Clasifica una URL de Instagram en uno de `ENDPOINTS` (None si no se mide)."""
+    parsed = urlparse(url)
+    path = parsed.path
+    if path.startswith("/api/v1/users/web_profile_info"):
+        return "web_profile_info"
+    if path.startswith("/api/v1/friendships/"):
+        if path.rstrip("/").endswith("/following"):
+            return "friendships_following"
+        if path.rstrip("/").endswith("/followers"):
+            return "friendships_followers"
+        return None
+    parts = [p for p in path.split("/") if p]
+    if len(parts) == 1 and parts[0] not in _RESERVED_PATHS:
+        return "dom_navigation" if resource_type == "document" else "profile_html"
+    return None
+
+
+class _EndpointStats:
+    __slots__ = ("requests", "latencies", "retries", "statuses", "bytes")
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.latencies: List[float] = []
+        self.retries = 0
+        self.statuses: Dict[str, int] = {}
+        self.bytes = 0
+
+
+class Metrics:
+    """Métricas por endpoint de una ejecución: peticiones, latencias, reintentos, estados y bytes.
+
+    Además mide los bytes realmente transferidos por tipo de recurso (todas
+    las peticiones terminadas de los contextos instrumentados, no solo las de
+    los endpoints) y cuenta las peticiones abortadas por `ResourceBlocker`.
+
+    También cuenta cuántas veces se usó cada etapa de enriquecimiento
+    (API/HTML/DOM/UI) y cuántos usuarios se tomaron de las respuestas del
+    diálogo (`harvest`). Es segura entre hilos; los motores registran en
+    `METRICS` y el CLI vuelca el resultado al final como JSON y como textfile
+    de Prometheus (formato del textfile collector de node_exporter).
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._endpoints: Dict[str, _EndpointStats] = {}
+        self._stages: Dict[str, int] = {}
+        self._blocked: Dict[str, int] = {}
+        self._transfer: Dict[str, List[int]] = {}
+        self._failed_urls: Dict[str, int] = {}
+        self.started_at = time.time()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._endpoints.clear()
+            self._stages.clear()
+            self._blocked.clear()
+            self._transfer.clear()
+            self._failed_urls.clear()
+            self.started_at = time.time()
+
+    def observe(self, endpoint: str, latency: Optional[float], status: int, size: int = 0, url: Optional[str] = None) -> None:
+        """Registra una petición terminada; `status` 0 indica error de red.
+
+        Con `url`, una petición a una URL cuyo intento anterior acabó en 429/0
+        se cuenta como reintento.
+        """
+        with self._lock:
+            stats = self._endpoints.setdefault(endpoint, _EndpointStats())
+            stats.requests += 1
+            if latency is not None and latency >= 0:
+                stats.latencies.append(latency)
+            key = str(status)
+            stats.statuses[key] = stats.statuses.get(key, 0) + 1
+            stats.bytes += max(0, size)
+            if url is not None:
+                if self._failed_urls.pop(url, None) is not None:
+                    stats.retries += 1
+                if status in (429, 0):
+                    self._failed_urls[url] = status
+
+    def stage(self, name: str, count: int = 1) -> None:
+        with self._lock:
+            self._stages[name] = self._stages.get(name, 0) + count
+
+    def blocked(self, kind: str) -> None:
+        """Registra una petición abortada por `ResourceBlocker`."""
+        with self._lock:
+            self._blocked[kind] = self._blocked.get(kind, 0) + 1
+
+    def transferred(self, resource_type: str, size: int) -> None:
+        """Registra los bytes (cabeceras y cuerpo) de una petición terminada, por tipo de recurso."""
+        with self._lock:
+            entry = self._transfer.setdefault(resource_type or "other", [0, 0])
+            entry[0] += 1
+            entry[1] += max(0, size)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            endpoints = {}
+            for name, st in sorted(self._endpoints.items()):
+                lat = sorted(st.latencies)
+                endpoints[name] = {
+                    "requests": st.requests,
+                    "retries": st.retries,
+                    "status": dict(sorted(st.statuses.items())),
+                    "throttled_429": st.statuses.get("429", 0),
+                    "network_errors": st.statuses.get("0", 0),
+                    "bytes": st.bytes,
+                    "latency_seconds": {
+                        "count": len(lat),
+                        "sum": round(sum(lat), 6),
+                        "mean": round(sum(lat) / len(lat), 6) if lat else None,
+                        "max": round(lat[-1], 6) if lat else None,
+                        **{f"p{int(q * 100)}": _quantile(lat, q) for q in _QUANTILES},
+                    },
+                }
+            return {
+                "started_at": self.started_at,
+                "duration_seconds": round(time.time() - self.started_at, 3),
+                "endpoints": endpoints,
+                "enrichment_stages": dict(sorted(self._stages.items())),
+                "blocked_resources": {kind: {"requests": n} for kind, n in sorted(self._blocked.items())},
+                "transferred": {
+                    kind: {"requests": n, "bytes": size} for kind, (n, size) in sorted(self._transfer.items())
+                },
+            }
+
+    def to_prometheus(self, extra: Optional[Dict[str, float]] = None) -> str:
+        snap = self.snapshot()
+        lines: List[str] = []
+
+        def family(name: str, kind: str, help_text: str) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        eps = snap["endpoints"]
+        family("instagram_scraper_requests_total", "counter", "Peticiones por endpoint y estado HTTP (0 = error de red).")
+        for ep, st in eps.items():
+            for status, n in st["status"].items():
+                lines.append(f'instagram_scraper_requests_total{{endpoint="{ep}",status="{status}"}} {n}')
+        family("instagram_scraper_retries_total", "counter", "Reintentos tras 429 o error de red por endpoint.")
+        for ep, st in eps.items():
+            lines.append(f'instagram_scraper_retries_total{{endpoint="{ep}"}} {st["retries"]}')
+        family("instagram_scraper_response_bytes_total", "counter", "Bytes de respuesta recibidos por endpoint.")
+        for ep, st in eps.items():
+            lines.append(f'instagram_scraper_response_bytes_total{{endpoint="{ep}"}} {st["bytes"]}')
+        family("instagram_scraper_request_latency_seconds", "summary", "Latencia de las peticiones por endpoint.")
+        for ep, st in eps.items():
+            lat = st["latency_seconds"]
+            for q in _QUANTILES:
+                value = lat[f"p{int(q * 100)}"]
+                lines.append(
+                    f'instagram_scraper_request_latency_seconds{{endpoint="{ep}",quantile="{q}"}} {_fmt(value)}'
+                )
+            lines.append(f'instagram_scraper_request_latency_seconds_sum{{endpoint="{ep}"}} {lat["sum"]}')
+            lines.append(f'instagram_scraper_request_latency_seconds_count{{endpoint="{ep}"}} {lat["count"]}')
+        family("instagram_scraper_enrichment_stage_total", "counter", "Usos de cada etapa de enriquecimiento.")
+        for stage, n in snap["enrichment_stages"].items():
+            lines.append(f'instagram_scraper_enrichment_stage_total{{stage="{stage}"}} {n}')
+        family("instagram_scraper_blocked_requests_total", "counter", "Peticiones abortadas por la política de recursos.")
+        for kind, st in snap["blocked_resources"].items():
+            lines.append(f'instagram_scraper_blocked_requests_total{{type="{kind}"}} {st["requests"]}')
+        family("instagram_scraper_transferred_bytes_total", "counter", "Bytes transferidos (cabeceras y cuerpo) por tipo de recurso.")
+        for kind, st in snap["transferred"].items():
+            lines.append(f'instagram_scraper_transferred_bytes_total{{type="{kind}"}} {st["bytes"]}')
+        family("instagram_scraper_run_duration_seconds", "gauge", "Duración de la ejecución.")
+        lines.append(f"instagram_scraper_run_duration_seconds {snap['duration_seconds']}")
+        for name, value in (extra or {}).items():
+            family(f"instagram_scraper_{name}", "gauge", name.replace("_", " ") + ".")
+            lines.append(f"instagram_scraper_{name} {_fmt(value)}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, directory: str, extra: Optional[Dict[str, float]] = None) -> Path:
+        """Escribe `metrics.json` y `metrics.prom` en `directory` (reemplazo atómico) y devuelve la ruta JSON."""
+        out = Path(directory)
+        out.mkdir(parents=True, exist_ok=True)
+        snap = self.snapshot()
+        if extra:
+            snap["run"] = extra
+        json_path = out / "metrics.json"
+        _atomic_write(json_path, json.dumps(snap, ensure_ascii=False, indent=2))
+        _atomic_write(out / "metrics.prom", self.to_prometheus(extra))
+        return json_path
+
+    def log_summary(self) -> None:
+        snap = self.snapshot()
+        blocked = snap["blocked_resources"]
+        if blocked:
+            logger.info(
+                "Recursos bloqueados: %d peticiones (%s)",
+                sum(st["requests"] for st in blocked.values()),
+                ", ".join(f"{kind}={st['requests']}" for kind, st in blocked.items()),
+            )
+        transferred = snap["transferred"]
+        if transferred:
+            logger.info(
+                "Transferido: %.2f MB en %d peticiones (%s)",
+                sum(st["bytes"] for st in transferred.values()) / 1_000_000,
+                sum(st["requests"] for st in transferred.values()),
+                ", ".join(f"{kind}={st['bytes'] / 1_000_000:.2f} MB" for kind, st in transferred.items()),
+            )
+        for ep, st in snap["endpoints"].items():
+            lat = st["latency_seconds"]
+            logger.info(
+                "%s: %d peticiones, p50=%ss p90=%ss, %d reintentos, %d x 429, %d bytes",
+                ep,
+                st["requests"],
+                lat["p50"],
+                lat["p90"],
+                st["retries"],
+                st["throttled_429"],
+                st["bytes"],
+            )
+
+    # --- Integración con Playwright ---
+
+    def instrument_context(self, context: Any) -> None:
+        """Registra las peticiones de un contexto Playwright (API síncrona)."""
+        context.on("requestfinished", self._on_finished)
+        context.on("requestfailed", self._on_failed)
+
+    def instrument_context_async(self, context: Any) -> None:
+        context.on("requestfinished", self._on_finished_async)
+        context.on("requestfailed", self._on_failed)
+
+    def _on_finished(self, request: Any) -> None:
+        try:
+            sizes = request.sizes()
+        except Exception:
+            sizes = {}
+        self.transferred(request.resource_type, _wire_bytes(sizes))
+        endpoint = endpoint_for(request.url, request.resource_type)
+        if endpoint is None:
+            return
+        try:
+            response = request.response()
+            status = response.status if response is not None else 0
+        except Exception:
+            status = 0
+        self.observe(endpoint, _latency(request), status, sizes.get("responseBodySize", 0), request.url)
+
+    async def _on_finished_async(self, request: Any) -> None:
+        try:
+            sizes = await request.sizes()
+        except Exception:
+            sizes = {}
+        self.transferred(request.resource_type, _wire_bytes(sizes))
+        endpoint = endpoint_for(request.url, request.resource_type)
+        if endpoint is None:
+            return
+        try:
+            response = await request.response()
+            status = response.status if response is not None else 0
+        except Exception:
+            status = 0
+        self.observe(endpoint, _latency(request), status, sizes.get("responseBodySize", 0), request.url)
+
+    def _on_failed(self, request: Any) -> None:
+        endpoint = endpoint_for(request.url, request.resource_type)
+        if endpoint is not None:
+            self.observe(endpoint, _latency(request), 0, 0, request.url)
+
+
+def _wire_bytes(sizes: Dict[str, int]) -> int:
+    """Bytes de una petición según `request.sizes()`: cabeceras y cuerpo en ambos sentidos."""
+    return sum(max(0, sizes.get(k, 0) or 0) for k in ("requestHeadersSize", "requestBodySize", "responseHeadersSize", "responseBodySize"))
+
+
+def _latency(request: Any) -> Optional[float]:
+    try:
+        end = request.timing.get("responseEnd", -1)
+    except Exception:
+        return None
+    return end / 1000 if end is not None and end >= 0 else None
+
+
+def _quantile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    idx = min(len(values) - 1, max(0, math.ceil(q * len(values)) - 1))
+    return round(values[idx], 6)
+
+
+def _fmt(value: Optional[float]) -> str:
+    return "NaN" if value is None else str(value)
+
+
+def _atomic_write(path: Path, text: str) -> None:
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+# Registro global de la ejecución (al estilo del registro por defecto de prometheus_client)
+METRICS = Metrics()
@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+import html as _html
+import re
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+
+_COUNT_RE = re.compile(r"([0-9.,]+)\s*(millones|millón|millon|mil|k|m)?", re.IGNORECASE)
+_FOLLOWERS_RE = re.compile(r"([0-9.,]+\s*(?:millones|millón|millon|mil|k|m)?)\s*(?:followers|seguidores)", re.IGNORECASE)
+_FOLLOWING_RE = re.compile(r"([0-9.,]+\s*(?:millones|millón|millon|mil|k|m)?)\s*(?:following|seguidos)", re.IGNORECASE)
+_META_RE = re.compile(r"<meta\s+[^>]*>", re.IGNORECASE)
+_ATTR_RE = re.compile(r'([a-zA-Z:-]+)\s*=\s*"([^"]*)"')
+_TITLE_NAME_RE = re.compile(r"^(.+?)\s\(@")
+
+
+def profile_from_response(result: Dict[str, Any], limit: int) -> Dict[str, Any]:
+    """Convierte la respuesta de `web_profile_info` en el dict de perfil del CLI."""
+    user = (result or {}).get("data", {}).get("user")
+    if not user:
+        raise RuntimeError("Respuesta inválida de la API de Instagram para el perfil solicitado")
+
+    data: Dict[str, Any] = {
+        "username": user.get("username"),
+        "full_name": user.get("full_name"),
+        "biography": user.get("biography") or "",
+        "external_url": user.get("external_url"),
+        "is_private": bool(user.get("is_private")),
+        "followers": user.get("edge_followed_by", {}).get("count"),
+        "following": user.get("edge_follow", {}).get("count"),
+        "posts_count": user.get("edge_owner_to_timeline_media", {}).get("count"),
+    }
+
+    edges = user.get("edge_owner_to_timeline_media", {}).get("edges", [])
+    latest_posts = [post_from_node(edge.get("node", {})) for edge in edges[:limit]]
+
+    data["latest_posts"] = latest_posts
+    return data
+
+
+# `media_type` de la API v1 y `__typename` de GraphQL → tipo de post
+_MEDIA_TYPES = {1: "image", 2: "video", 8: "carousel"}
+_TYPENAMES = {"GraphImage": "image", "GraphVideo": "video", "GraphSidecar": "carousel"}
+
+# Lector de páginas del timeline: cursor → (posts de `post_from_feed`, cursor siguiente o None)
+TimelineFetcher = Callable[[str], Tuple[List[Dict[str, Any]], Optional[str]]]
+AsyncTimelineFetcher = Callable[[str], Awaitable[Tuple[List[Dict[str, Any]], Optional[str]]]]
+
+
+def _post(
+    shortcode: Optional[str],
+    taken_at: Optional[int],
+    caption: Optional[str],
+    likes: Optional[int],
+    comments: Optional[int],
+    media_type: Optional[str],
+    thumbnail: Optional[str],
+    pinned: bool,
+) -> Dict[str, Any]:
+    return {
+        "shortcode": shortcode,
+        "url": f"https://www.instagram.com/p/{shortcode}/",
+        "date": None if not taken_at else datetime.utcfromtimestamp(taken_at).isoformat(),
+        "caption": caption or "",
+        "likes": likes,
+        "comments": comments,
+        "media_type": media_type,
+        "is_video": media_type == "video",
+        "thumbnail": thumbnail,
+        "pinned": pinned,
+    }
+
+
+def post_from_node(node: Dict[str, Any]) -> Dict[str, Any]:
+    """Item de `latest_posts` a partir de un nodo de `edge_owner_to_timeline_media` (GraphQL)."""
+    caption_edges = node.get("edge_media_to_caption", {}).get("edges", [])
+    typename = str(node.get("__typename") or "").replace("XDT", "")
+    media_type = _TYPENAMES.get(typename) or ("video" if node.get("is_video") else None)
+    return _post(
+        node.get("shortcode"),
+        node.get("taken_at_timestamp"),
+        caption_edges[0].get("node", {}).get("text") if caption_edges else "",
+        (node.get("edge_liked_by") or node.get("edge_media_preview_like") or {}).get("count"),
+        (node.get("edge_media_to_comment") or {}).get("count"),
+        media_type,
+        node.get("thumbnail_src") or node.get("display_url"),
+        bool(node.get("pinned_for_users")),
+    )
+
+
+def post_from_feed(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Item de `latest_posts` a partir de un post de `__ig.timeline` (API v1 `feed/user/<id>`)."""
+    return _post(
+        item.get("shortcode"),
+        item.get("taken_at"),
+        item.get("caption"),
+        item.get("likes"),
+        item.get("comments"),
+        _MEDIA_TYPES.get(item.get("media_type")),
+        item.get("thumbnail"),
+        bool(item.get("pinned")),
+    )
+
+
+def timeline_posts(
+    user: Dict[str, Any],
+    fetch: TimelineFetcher,
+    limit: Optional[int] = None,
+    since: Optional[datetime] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Genera los posts de `user` (`data.user` de `web_profile_info`) del más reciente al más antiguo.
+
+    Empieza por la primera página que ya trae `edge_owner_to_timeline_media` y
+    solo pide las siguientes con `fetch` cuando el consumidor necesita más. Se
+    detiene al llegar a `limit` posts o al primer post anterior a `since` (UTC);
+    los fijados (`pinned`) pueden ser antiguos, así que se saltan en lugar de
+    cortar el recorrido.
+    """
+    posts, cursor = _first_timeline_page(user)
+    seen: Set[str] = set()
+    count = 0
+    while True:
+        for post in posts:
+            if post["shortcode"] in seen:
+                continue
+            seen.add(post["shortcode"])
+            if since is not None and post["date"] and datetime.fromisoformat(post["date"]) < since:
+                if post["pinned"]:
+                    continue
+                return
+            yield post
+            count += 1
+            if limit is not None and count >= limit:
+                return
+        if not cursor:
+            return
+        posts, cursor = fetch(cursor)
+
+
+async def timeline_posts_async(
+    user: Dict[str, Any],
+    fetch: AsyncTimelineFetcher,
+    limit: Optional[int] = None,
+    since: Optional[datetime] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Como `timeline_posts` con un `fetch` awaitable (motor asyncio)."""
+    posts, cursor = _first_timeline_page(user)
+    seen: Set[str] = set()
+    count = 0
+    while True:
+        for post in posts:
+            if post["shortcode"] in seen:
+                continue
+            seen.add(post["shortcode"])
+            if since is not None and post["date"] and datetime.fromisoformat(post["date"]) < since:
+                if post["pinned"]:
+                    continue
+                return
+            yield post
+            count += 1
+            if limit is not None and count >= limit:
+                return
+        if not cursor:
+            return
+        posts, cursor = await fetch(cursor)
+
+
+def _first_timeline_page(user: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Posts que ya trae `edge_owner_to_timeline_media` y cursor de la página siguiente (o None)."""
+    media = user.get("edge_owner_to_timeline_media") or {}
+    nodes = [edge.get("node") or {} for edge in media.get("edges") or []]
+    cursor: Optional[str] = None
+    if (media.get("page_info") or {}).get("has_next_page") and nodes and nodes[-1].get("id"):
+        # El cursor de la API v1 es `<id del último post>_<id del perfil>`
+        cursor = f"{nodes[-1]['id']}_{user.get('id')}"
+    return [post_from_node(node) for node in nodes], cursor
+
+
+def account_type(user: Dict[str, Any]) -> str:
+    if user.get("is_professional"):
+        return "empresa" if user.get("is_business_account") else "creador"
+    return "personal"
+
+
+def parse_count(text: Optional[str]) -> Optional[int]:
+    """Equivalente Python de `parseNum` de los scripts: '1.234', '12,5 mil', '3.4M'…"""
+    if not text:
+        return None
+    m = _COUNT_RE.search(str(text).strip())
+    if not m:
+        return None
+    n = re.sub(r"\s", "", m.group(1))
+    n = re.sub(r"\.(?=\d{3}\b)", "", n)
+    n = re.sub(r",(?=\d{3}\b)", "", n)
+    try:
+        val = float(n.replace(",", "."))
+    except ValueError:
+        return None
+    suffix = (m.group(2) or "").lower()
+    if suffix in {"k", "mil"}:
+        val *= 1000
+    elif suffix in {"m", "millones", "millon", "millón"}:
+        val *= 1000000
+    return int(round(val))
+
+
+def parse_og_meta(html: str) -> Dict[str, str]:
+    """Devuelve el contenido de las etiquetas <meta> (property o name) de un HTML."""
+    meta: Dict[str, str] = {}
+    for tag in _META_RE.findall(html or ""):
+        attrs = dict(_ATTR_RE.findall(tag))
+        key = attrs.get("property") or attrs.get("name")
+        if key and "content" in attrs:
+            meta.setdefault(key, _html.unescape(attrs["content"]))
+    return meta
+
+
+def profile_from_og(meta: Dict[str, Any]) -> Dict[str, Any]:
+    """Nombre y conteos a partir de og:title / og:description."""
+    full_name = None
+    mt = _TITLE_NAME_RE.match(meta.get("og:title") or "")
+    if mt:
+        full_name = mt.group(1).strip()
+    followers = following = None
+    desc = meta.get("og:description") or ""
+    mf = _FOLLOWERS_RE.search(desc)
+    mg = _FOLLOWING_RE.search(desc)
+    if mf:
+        followers = parse_count(mf.group(1))
+    if mg:
+        following = parse_count(mg.group(1))
+    return {"full_name": full_name, "biography": "", "followers": followers, "following": following}
+
+
+def parse_profile_html(html: str) -> Dict[str, Any]:
+    """Extrae nombre y conteos de las etiquetas og:title / og:description de un perfil."""
+    return profile_from_og(parse_og_meta(html))
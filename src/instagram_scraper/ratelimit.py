@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Optional
+from urllib.parse import urlparse
+
+from . import scripts
+from .config import Config
+
+
+logger = logging.getLogger(__name__)
+
+
+def wait_route(route: Any, seconds: float) -> None:
+    """Espera `seconds` dentro de un handler de `context.route` de la API síncrona sin congelar Playwright.
+
+    Los handlers corren en el hilo del dispatcher: `time.sleep` detendría los
+    eventos y las rutas de todas las páginas. `frame.wait_for_timeout` cede el
+    control al dispatcher mientras dura la espera. Si la petición ya no tiene
+    frame (se cerró la página), no se espera.
+    """
+    if seconds <= 0:
+        return
+    try:
+        route.request.frame.wait_for_timeout(seconds * 1000)
+    except Exception:
+        pass
+
+
+class AdaptiveRateLimiter:
+    """Token bucket compartido por toda la ejecución con control AIMD.
+
+    Cada petición reserva un token (`reserve` devuelve cuánto esperar). Con cada
+    respuesta correcta la tasa sube `increase` req/s hasta `max_rate`; el
+    primer 429 la multiplica por `decrease` y pausa a todos los que esperan
+    token durante un backoff (×1.7 por 429 consecutivo, tope 15 s, como
+    `fetchRetry`). Los 429 que llegan dentro de `holdoff` segundos tras un
+    recorte cuentan como el mismo evento, para que varias peticiones en vuelo
+    no hundan la tasa a la vez.
+
+    Es segura entre hilos. Cubre los `fetch` de las páginas vía `context.route`
+    (`route_context` / `route_context_async`) y las peticiones Python del
+    backend HTTP vía `reserve` / `report`. En las páginas el limitador no
+    reintenta: el 429 vuelve a la página y el reintento de su `fetchRetry`
+    pasa otra vez por el limitador, que aplica la pausa global.
+    """
+
+    def __init__(
+        self,
+        rate: float = 1.0,
+        min_rate: float = 0.2,
+        max_rate: float = 8.0,
+        increase: float = 0.05,
+        decrease: float = 0.5,
+        backoff_ms: int = 2500,
+        holdoff: float = 2.0,
+    ) -> None:
+        self.min_rate = max(0.01, min_rate)
+        self.max_rate = max(self.min_rate, max_rate)
+        self.rate = min(max(rate, self.min_rate), self.max_rate)
+        self.increase = increase
+        self.decrease = decrease
+        self.base_backoff = backoff_ms / 1000
+        self.holdoff = holdoff
+        self.successes = 0
+        self.throttles = 0
+        self.cuts = 0
+        self._lock = threading.Lock()
+        self._tokens = 1.0
+        self._last = time.monotonic()
+        self._last_cut = float("-inf")
+        self._backoff = self.base_backoff
+
+    @classmethod
+    def from_config(cls, config: Config, rate: Optional[float] = None) -> Optional["AdaptiveRateLimiter"]:
+        """Crea el limitador según la config; None si está desactivado."""
+        if not config.rate_limit:
+            return None
+        return cls(
+            rate=config.rate_initial if rate is None else rate,
+            min_rate=config.rate_min,
+            max_rate=config.rate_max,
+        )
+
+    def _capacity(self) -> float:
+        return max(1.0, self.rate)
+
+    def _refill(self, now: float) -> None:
+        if now > self._last:
+            self._tokens = min(self._capacity(), self._tokens + (now - self._last) * self.rate)
+            self._last = now
+
+    def reserve(self) -> float:
+        """Reserva un token y devuelve los segundos que hay que esperar antes de usarlo."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1.0
+            # Durante una pausa `_last` queda en el futuro
+            return max(0.0, self._last - now) + max(0.0, -self._tokens) / self.rate
+
+    def acquire(self) -> None:
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def acquire_route(self, route: Any) -> None:
+        """`acquire` para handlers de `context.route` de la API síncrona (ver `wait_route`)."""
+        wait_route(route, self.reserve())
+
+    async def acquire_async(self) -> None:
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def report(self, status: int) -> None:
+        """Registra el resultado de una petición: 2xx/3xx suben la tasa y 429 la recorta."""
+        if status == 429:
+            self._on_throttle()
+        elif 200 <= status < 400:
+            self._on_success()
+
+    def _on_success(self) -> None:
+        with self._lock:
+            self.successes += 1
+            self.rate = min(self.max_rate, self.rate + self.increase)
+            self._backoff = self.base_backoff
+
+    def _on_throttle(self) -> None:
+        with self._lock:
+            self.throttles += 1
+            now = time.monotonic()
+            if now - self._last_cut < self.holdoff:
+                return
+            self._last_cut = now
+            self.cuts += 1
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self._refill(now)
+            self._tokens = min(self._tokens, 0.0)
+            self._last = max(self._last, now + self._backoff)
+            pause = self._backoff
+            self._backoff = min(self._backoff * 1.7, 15.0)
+        logger.warning("429 recibido: tasa reducida a %.2f req/s y pausa global de %.1fs", self.rate, pause)
+
+    def summary(self) -> str:
+        return f"tasa final {self.rate:.2f} req/s, {self.successes} OK, {self.throttles} respuestas 429, {self.cuts} recortes"
+
+    # --- Integración con Playwright (context.route) ---
+
+    @staticmethod
+    def _applies(url: str) -> bool:
+        host = urlparse(url).hostname or ""
+        return host == "instagram.com" or host.endswith(".instagram.com")
+
+    def route_context(self, context: Any) -> None:
+        """Pasa por el limitador los fetch/XHR y las navegaciones a Instagram de un contexto (API síncrona).
+
+        Registrar antes que la caché: las rutas se evalúan en orden inverso y
+        la caché delega sus fallos en `fetch`.
+        """
+        scripts.mark_paced(context)
+        context.route(self._applies, self._handle_route)
+
+    async def route_context_async(self, context: Any) -> None:
+        await scripts.mark_paced_async(context)
+        await context.route(self._applies, self._handle_route_async)
+
+    def fetch(self, route: Any) -> Any:
+        """`route.fetch()` con token previo; el 429 se devuelve a la página (su `fetchRetry` reintenta)."""
+        self.acquire_route(route)
+        response = route.fetch()
+        self.report(response.status)
+        return response
+
+    async def fetch_async(self, route: Any) -> Any:
+        await self.acquire_async()
+        response = await route.fetch()
+        self.report(response.status)
+        return response
+
+    def _handle_route(self, route: Any) -> None:
+        kind = route.request.resource_type
+        if kind in ("fetch", "xhr"):
+            route.fulfill(response=self.fetch(route))
+        elif kind == "document":
+            self.acquire_route(route)
+            route.fallback()
+        else:
+            route.fallback()
+
+    async def _handle_route_async(self, route: Any) -> None:
+        kind = route.request.resource_type
+        if kind in ("fetch", "xhr"):
+            await route.fulfill(response=await self.fetch_async(route))
+        elif kind == "document":
+            await self.acquire_async()
+            await route.fallback()
+        else:
+            await route.fallback()
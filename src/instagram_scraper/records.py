@@ -0,0 +1,288 @@
+from __future__ import annotations
+
+import sys
+from array import array
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, ClassVar, Dict, Iterable, Iterator, List, Optional, Tuple, Type, Union
+
+from .profiles import account_type
+from .utils import INSTAGRAM_ORIGIN
+
+
+# Valor de "sin dato" en las columnas enteras de `RecordColumns` (los conteos nunca son negativos)
+INT_NULL = -(2**63)
+
+
+def _int_or_none(value: Any) -> Optional[int]:
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass(slots=True)
+class FollowingRecord:
+    """Un seguido con sus detalles (item de `following_details`)."""
+
+    username: str
+    full_name: Optional[str] = None
+    biography: str = ""
+    account_type: Optional[str] = None
+    category: Optional[str] = None
+    followers: Optional[int] = None
+    following: Optional[int] = None
+    url: Optional[str] = None
+
+    # (campo, tipo de columna en `RecordColumns`: "str", "category" o "int")
+    COLUMNS: ClassVar[Tuple[Tuple[str, str], ...]] = (
+        ("username", "str"),
+        ("full_name", "str"),
+        ("biography", "str"),
+        ("account_type", "category"),
+        ("category", "category"),
+        ("followers", "int"),
+        ("following", "int"),
+        ("url", "str"),
+    )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "FollowingRecord":
+        """Registro a partir del dict de los scripts de página o de un `.jsonl`."""
+        return cls(
+            data.get("username") or "",
+            data.get("full_name") or None,
+            data.get("biography") or "",
+            data.get("account_type") or None,
+            data.get("category") or None,
+            _int_or_none(data.get("followers")),
+            _int_or_none(data.get("following")),
+            data.get("url") or None,
+        )
+
+    @classmethod
+    def from_user(cls, username: str, user: Optional[Dict[str, Any]], origin: str = INSTAGRAM_ORIGIN) -> "FollowingRecord":
+        """Registro a partir del `user` de `web_profile_info` (None si falló: solo username y enlace)."""
+        url = f"{origin}/{username}/"
+        if user is None:
+            return cls(username, url=url)
+        return cls(
+            username,
+            user.get("full_name") or None,
+            user.get("biography") or "",
+            account_type(user),
+            user.get("category_name"),
+            _int_or_none((user.get("edge_followed_by") or {}).get("count")),
+            _int_or_none((user.get("edge_follow") or {}).get("count")),
+            url,
+        )
+
+    @property
+    def incomplete(self) -> bool:
+        return not self.full_name or self.followers is None or self.following is None or not self.biography
+
+    def missing_fields(self) -> Tuple[str, ...]:
+        """Campos vacíos (para los logs de enriquecimiento)."""
+        return tuple(
+            name
+            for name, empty in (
+                ("full_name", not self.full_name),
+                ("biography", not self.biography),
+                ("followers", self.followers is None),
+                ("following", self.following is None),
+            )
+            if empty
+        )
+
+    def merge_missing(self, values: Optional[Dict[str, Any]]) -> bool:
+        """Completa solo los campos vacíos con `values` (dict de HTML/DOM); devuelve si aportó algo."""
+        if not values:
+            return False
+        changed = False
+        if not self.full_name and values.get("full_name"):
+            self.full_name = values["full_name"]
+            changed = True
+        if not self.biography and values.get("biography"):
+            self.biography = values["biography"]
+            changed = True
+        if self.followers is None and _int_or_none(values.get("followers")) is not None:
+            self.followers = _int_or_none(values["followers"])
+            changed = True
+        if self.following is None and _int_or_none(values.get("following")) is not None:
+            self.following = _int_or_none(values["following"])
+            changed = True
+        return changed
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name, _ in self.COLUMNS}
+
+
+@dataclass(slots=True)
+class FollowerRecord:
+    """Un seguidor y su número de seguidores (item de `followers_of_followers`)."""
+
+    username: str
+    followers: Optional[int] = None
+
+    COLUMNS: ClassVar[Tuple[Tuple[str, str], ...]] = (("username", "str"), ("followers", "int"))
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "FollowerRecord":
+        return cls(data.get("username") or "", _int_or_none(data.get("followers")))
+
+    @property
+    def first_digit(self) -> Optional[int]:
+        return int(str(self.followers)[0]) if self.followers is not None else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"username": self.username, "followers": self.followers}
+
+
+def _count(node: Dict[str, Any], *keys: str) -> Optional[int]:
+    for key in keys:
+        value = node.get(key)
+        if isinstance(value, dict) and "count" in value:
+            return _int_or_none(value["count"])
+    return None
+
+
+@dataclass(slots=True)
+class PostRecord:
+    """Un post del historial de un perfil (subcomando `posts`)."""
+
+    shortcode: str
+    url: str
+    date: Optional[str] = None
+    typename: Optional[str] = None
+    likes: Optional[int] = None
+    comments: Optional[int] = None
+    video_views: Optional[int] = None
+    caption: str = ""
+    media_urls: List[str] = field(default_factory=list)
+
+    COLUMNS: ClassVar[Tuple[Tuple[str, str], ...]] = (
+        ("shortcode", "str"),
+        ("url", "str"),
+        ("date", "str"),
+        ("typename", "category"),
+        ("likes", "int"),
+        ("comments", "int"),
+        ("video_views", "int"),
+        ("caption", "str"),
+        ("media_urls", "list"),
+    )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "PostRecord":
+        return cls(
+            data.get("shortcode") or "",
+            data.get("url") or "",
+            data.get("date"),
+            data.get("typename"),
+            _int_or_none(data.get("likes")),
+            _int_or_none(data.get("comments")),
+            _int_or_none(data.get("video_views")),
+            data.get("caption") or "",
+            list(data.get("media_urls") or []),
+        )
+
+    @classmethod
+    def from_node(cls, node: Dict[str, Any], origin: str = INSTAGRAM_ORIGIN) -> "PostRecord":
+        """Registro a partir del nodo de un post tal como llega en la página del feed.
+
+        Admite el nodo GraphQL y el que Instaloader arma desde la API móvil
+        (`Post.from_iphone_struct`); solo lee lo que ya trae la página, sin
+        consultas extra por post.
+        """
+        shortcode = node.get("shortcode") or ""
+        timestamp = node.get("taken_at_timestamp") or node.get("date")
+        caption_edges = (node.get("edge_media_to_caption") or {}).get("edges") or []
+        caption = (caption_edges[0].get("node") or {}).get("text") if caption_edges else node.get("caption")
+        comments = _count(node, "edge_media_to_comment", "edge_media_to_parent_comment")
+        children = [e.get("node") or {} for e in (node.get("edge_sidecar_to_children") or {}).get("edges") or []]
+        media = [m.get("video_url") or m.get("display_url") or m.get("display_src") for m in children or [node]]
+        return cls(
+            shortcode,
+            f"{origin}/p/{shortcode}/",
+            datetime.fromtimestamp(timestamp, timezone.utc).isoformat() if timestamp else None,
+            node.get("__typename"),
+            _count(node, "edge_media_preview_like", "edge_liked_by"),
+            comments if comments is not None else _int_or_none(node.get("comments")),
+            _int_or_none(node.get("video_view_count")),
+            caption or "",
+            [url for url in media if url],
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name, _ in self.COLUMNS}
+
+
+Record = Union[FollowingRecord, FollowerRecord, PostRecord]
+
+# Tipo de registro de cada comando
+RECORD_TYPES: Dict[str, Type[Any]] = {"following": FollowingRecord, "followers": FollowerRecord, "posts": PostRecord}
+
+
+class RecordColumns:
+    """Lista de registros guardada por columnas, para listados de cientos de miles de filas.
+
+    Los conteos van en `array('q')` (8 bytes por fila, `INT_NULL` como nulo),
+    los textos (y las listas) en listas y las columnas categóricas
+    (`account_type`, `category`, `typename`) se internan, así cada valor
+    distinto existe una sola vez. Al recorrerla o indexarla se reconstruyen los registros; `column(name)` da la
+    columna cruda (p. ej. `numpy.frombuffer(cols.column("followers"), "int64")`).
+    """
+
+    def __init__(self, record_type: Type[Any], records: Iterable[Any] = ()) -> None:
+        self.record_type = record_type
+        self._kinds = [kind for _, kind in record_type.COLUMNS]
+        self._names = [name for name, _ in record_type.COLUMNS]
+        self._columns: List[Any] = [array("q") if kind == "int" else [] for kind in self._kinds]
+        self.extend(records)
+
+    def append(self, record: Any) -> None:
+        for name, kind, column in zip(self._names, self._kinds, self._columns):
+            value = getattr(record, name)
+            if kind == "int":
+                column.append(INT_NULL if value is None else value)
+            elif kind == "category" and value is not None:
+                column.append(sys.intern(value))
+            else:
+                column.append(value)
+
+    def extend(self, records: Iterable[Any]) -> None:
+        for record in records:
+            self.append(record)
+
+    def __len__(self) -> int:
+        return len(self._columns[0])
+
+    def _row(self, values: Iterable[Any]) -> Any:
+        return self.record_type(
+            *(None if kind == "int" and v == INT_NULL else v for kind, v in zip(self._kinds, values))
+        )
+
+    def __getitem__(self, index: int) -> Any:
+        return self._row(column[index] for column in self._columns)
+
+    def __iter__(self) -> Iterator[Any]:
+        for values in zip(*self._columns):
+            yield self._row(values)
+
+    def column(self, name: str) -> Any:
+        return self._columns[self._names.index(name)]
+
+    def to_dicts(self) -> Iterator[Dict[str, Any]]:
+        for record in self:
+            yield record.to_dict()
+
+
+def to_jsonable(obj: Any) -> Any:
+    """`default` de `json.dumps`: registros y `RecordColumns` se convierten a dicts solo al serializar."""
+    if isinstance(obj, RecordColumns):
+        return list(obj.to_dicts())
+    if isinstance(obj, (FollowingRecord, FollowerRecord, PostRecord)):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
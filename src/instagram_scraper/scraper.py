@@ -1,35 +1,114 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from queue import Queue
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+import json
 import logging
+import threading
 
+from cryptography.fernet import InvalidToken
 from instaloader import (
+    FrozenNodeIterator,
     Instaloader,
+    InstaloaderContext,
+    InvalidArgumentException,
     Profile,
+    RateController,
     TwoFactorAuthRequiredException,
     BadCredentialsException,
+    resumable_iteration,
 )
 
+from .auth import _get_fernet
+from .checkpoint import PostCheckpoint
 from .config import Config
+from .export import RecordSink
+from .records import PostRecord
 from .utils import extract_username
 
 
+class SharedRateController(RateController):
+    """`RateController` de Instaloader compartido por todos los loaders del scraper.
+
+    Las marcas de tiempo de las consultas son comunes, así que la ventana
+    deslizante de Instaloader cuenta las peticiones de todos los hilos juntos.
+    El cálculo y la espera se hacen bajo un lock: un 429 en un hilo pausa a los
+    demás hasta que termina su espera.
+    """
+
+    def __init__(self, context: InstaloaderContext) -> None:
+        super().__init__(context)
+        self._lock = threading.Lock()
+
+    def wait_before_query(self, query_type: str) -> None:
+        with self._lock:
+            super().wait_before_query(query_type)
+
+    def handle_429(self, query_type: str) -> None:
+        with self._lock:
+            super().handle_429(query_type)
+
+
 class InstagramScraper:
     def __init__(self, config: Config) -> None:
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+        self._rate_controller: Optional[SharedRateController] = None
+        self._fernet = _get_fernet(config.auth_secret_key)
+        self.loader = self._new_loader()
+
+    def _new_loader(self) -> Instaloader:
         # Configuramos Instaloader evitando descargas de archivos
-        self.loader = Instaloader(
+        return Instaloader(
             download_pictures=False,
             download_videos=False,
             download_video_thumbnails=False,
             download_geotags=False,
             save_metadata=False,
             post_metadata_txt_pattern="",
+            rate_controller=self._shared_rate_controller,
         )
-        self.config = config
-        self.logger = logging.getLogger(__name__)
+
+    def _shared_rate_controller(self, context: InstaloaderContext) -> SharedRateController:
+        if self._rate_controller is None:
+            self._rate_controller = SharedRateController(context)
+        return self._rate_controller
+
+    def _load_session(self) -> bool:
+        """Carga la sesión guardada por un login anterior; devuelve si quedó autenticado."""
+        path = Path(self.config.ig_session_path)
+        if not path.exists():
+            return False
+        raw = path.read_bytes()
+        try:
+            state = json.loads(self._fernet.decrypt(raw) if self._fernet else raw)
+        except InvalidToken:
+            raise RuntimeError("No se pudo descifrar la sesión de Instaloader. Clave incorrecta.")
+        username = state.get("username")
+        if self.config.ig_username and username != self.config.ig_username:
+            self.logger.info("La sesión guardada es de %s, no de %s; se ignora", username, self.config.ig_username)
+            return False
+        self.loader.load_session(username, state.get("cookies") or {})
+        if self.loader.test_login() != username:
+            self.logger.info("La sesión guardada de %s ya no es válida; se hace login de nuevo", username)
+            self.loader = self._new_loader()
+            return False
+        self.logger.info("Sesión de Instaloader reutilizada para %s", username)
+        return True
+
+    def _save_session(self) -> None:
+        path = Path(self.config.ig_session_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = json.dumps({"username": self.loader.context.username, "cookies": self.loader.save_session()}).encode("utf-8")
+        path.write_bytes(self._fernet.encrypt(data) if self._fernet else data)
+        self.logger.info("Sesión de Instaloader guardada en %s", path)
 
     def login_if_available(self) -> None:
-        """Realiza login si hay credenciales en la configuración."""
+        """Reutiliza la sesión guardada o, si no sirve, realiza login con las credenciales de la configuración."""
+        if self._load_session():
+            return
         if not (self.config.ig_username and self.config.ig_password):
             return
         try:
@@ -42,11 +121,112 @@ class InstagramScraper:
             self.loader.two_factor_login(self.config.ig_2fa_code)
         except BadCredentialsException as e:
             raise RuntimeError("Credenciales de Instagram inválidas") from e
+        self._save_session()
 
     def get_profile_data(self, profile_url: str, posts_limit: Optional[int] = None) -> Dict[str, Any]:
         """Obtiene datos de un perfil y una lista acotada de posts recientes."""
+        return self._profile_data(self.loader, extract_username(profile_url), posts_limit)
+
+    def get_profiles_data(
+        self, profile_urls: Iterable[str], posts_limit: Optional[int] = None, concurrency: int = 3
+    ) -> Iterator[Dict[str, Any]]:
+        """Consulta varios perfiles con `concurrency` loaders en paralelo que comparten sesión y control de tasa.
+
+        Genera un registro por perfil, en el orden de entrada, con la forma del
+        modo batch: `{target, command, ok, data}` o `{target, command, ok, error}`.
+        """
+        usernames = [extract_username(u) if "instagram.com" in u else u for u in profile_urls]
+        loaders: "Queue[Instaloader]" = Queue()
+        loaders.put(self.loader)
+        session = self.loader.save_session() if self.loader.context.is_logged_in else None
+        for _ in range(max(1, concurrency) - 1):
+            loader = self._new_loader()
+            if session is not None:
+                loader.load_session(self.loader.context.username, session)
+            loaders.put(loader)
+
+        def one(username: str) -> Dict[str, Any]:
+            loader = loaders.get()
+            try:
+                return {"target": username, "command": "legacy", "ok": True, "data": self._profile_data(loader, username, posts_limit)}
+            except Exception as e:
+                self.logger.error("Fallo en batch (legacy) para %s: %s", username, e)
+                return {"target": username, "command": "legacy", "ok": False, "error": str(e)}
+            finally:
+                loaders.put(loader)
+
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            yield from executor.map(one, usernames)
+
+    def export_posts(
+        self,
+        profile_url: str,
+        sink: RecordSink,
+        checkpoint: Optional[PostCheckpoint] = None,
+        limit: Optional[int] = None,
+    ) -> int:
+        """Escribe en `sink` cada post del perfil, del más reciente al más antiguo, según llega.
+
+        El `NodeIterator` de `profile.get_posts()` corre dentro de
+        `resumable_iteration`: ante un error o Ctrl+C su estado congelado se
+        guarda en `checkpoint` y al reanudar se descongela en la misma página,
+        saltando los posts de esa página que ya estaban escritos. Con sinks
+        `appendable` (.jsonl) el estado también se guarda cada vez que el sink
+        vacía su búfer, así que sobrevive a un corte abrupto. Con `limit` se
+        detiene tras ese número de posts y deja el checkpoint listo para
+        continuar. Devuelve los posts escritos en esta ejecución.
+        """
+        cp = checkpoint or PostCheckpoint()
         username = extract_username(profile_url)
         ctx = self.loader.context
+        self.logger.info("Exportando posts de %s via Instaloader", username)
+        posts = Profile.from_username(ctx, username).get_posts()
+        before = cp.written
+
+        def load(_ctx: InstaloaderContext, _path: str) -> FrozenNodeIterator:
+            if not cp.iterator:
+                raise InvalidArgumentException("checkpoint sin estado del iterador")
+            return FrozenNodeIterator(**cp.iterator)
+
+        def save(frozen: FrozenNodeIterator, _path: str = "") -> None:
+            cp.save(frozen._asdict(), before + sink.count, cp.output or str(sink.path))
+
+        complete = False
+        with resumable_iteration(
+            context=ctx,
+            iterator=posts,
+            load=load,
+            save=save,
+            format_path=lambda _magic: str(cp.path),
+            enabled=cp.path is not None,
+        ) as (is_resuming, start_index):
+            if before and not is_resuming:
+                self.logger.warning(
+                    "No se pudo continuar desde la página guardada; se recorren de nuevo los primeros %d posts sin escribirlos",
+                    before,
+                )
+            skip = max(0, before - start_index)
+            for post in posts:
+                if skip:
+                    skip -= 1
+                    continue
+                # Solo los datos que trae la página del feed: `post.comments` o `post.url` pueden pedir más por post
+                sink.write(PostRecord.from_node(post._node))
+                if sink.appendable and sink.count % sink.flush_every == 0:
+                    save(posts.freeze())
+                if limit is not None and sink.count >= limit:
+                    break
+            else:
+                complete = True
+        if complete:
+            cp.clear()
+        else:
+            save(posts.freeze())
+            self.logger.info("Exportación detenida tras %d posts; continúe con --resume", before + sink.count)
+        return sink.count
+
+    def _profile_data(self, loader: Instaloader, username: str, posts_limit: Optional[int]) -> Dict[str, Any]:
+        ctx = loader.context
         self.logger.info("Cargando perfil de %s via Instaloader", username)
         profile = Profile.from_username(ctx, username)
 
@@ -67,7 +247,7 @@ class InstagramScraper:
         latest_posts: List[Dict[str, Any]] = []
 
         # Para perfiles privados sin permisos, no habrá posts
-        if not profile.is_private or (self.config.ig_username and self.config.ig_password):
+        if not profile.is_private or ctx.is_logged_in:
             for post in profile.get_posts():
                 latest_posts.append(
                     {
@@ -81,4 +261,4 @@ class InstagramScraper:
                     break
 
         data["latest_posts"] = latest_posts
-        return data
\ No newline at end of file
+        return data
@@ -0,0 +1,486 @@
+from __future__ import annotations
+
+from typing import Any, List, Optional, Tuple
+
+# Versión de la biblioteca `window.__ig`; súbela al cambiar su interfaz.
+HELPERS_VERSION = 3
+
+# Pausa fija (ms) de `fetchRetry` ante 429/0 cuando el contexto pasa por un
+# limitador (`mark_paced`): la espera real la impone el limitador en la ruta.
+PACED_RETRY_MS = 250
+
+# Biblioteca de funciones de página que se instala una vez por contexto con
+# `context.add_init_script` (ver `install_helpers`). Reúne sleep, fetch con
+# backoff ante 429/0 (salvo con limitador), cabeceras de la API web, lectura de etiquetas og y las
+# consultas de perfil/friendships; cada llamada recibe sus argumentos como
+# datos (`page.evaluate(expression, arg)`), sin concatenarlos en el código.
+HELPERS_JS = r"""
+(() => {
+  if (window.__ig && window.__ig.version >= __VERSION__) return;
+  const API = 'https://www.instagram.com/api/v1';
+  function sleep(ms){ return new Promise(r=>setTimeout(r, ms)); }
+  async function fetchRetry(url, opts, tries, delay){
+    for (let i=0; i<tries; i++){
+      const res = await fetch(url, opts).catch(()=>null);
+      if (res && res.ok) return res;
+      const status = res ? res.status : 0;
+      if (status===429 || status===0){
+        // Con un limitador en las rutas, el reintento espera su turno ahí: solo una pausa corta fija
+        if (window.__igPaced){ await sleep(__PACED_MS__); continue; }
+        const jitter=Math.floor(Math.random()*900); await sleep(delay+jitter); delay=Math.min(Math.floor(delay*1.7),15000); continue;
+      }
+      throw new Error('HTTP ' + status);
+    }
+    throw new Error('Too many retries');
+  }
+  function apiHeaders(){
+    const h = { 'x-ig-app-id': '936619743392459', 'x-requested-with': 'XMLHttpRequest', 'referer': location.origin + '/' };
+    const m = document.cookie.match(/csrftoken=([^;]+)/);
+    if (m) h['x-csrftoken'] = m[1];
+    return h;
+  }
+  function htmlHeaders(){
+    return { 'x-requested-with': 'XMLHttpRequest', 'referer': location.origin + '/' };
+  }
+  const profileUrl = (name) => API + '/users/web_profile_info/?username=' + encodeURIComponent(name);
+  const profileLink = (u) => location.origin + '/' + u + '/';
+  function parseNum(txt){
+    if (!txt) return null;
+    const t = String(txt).trim();
+    const m = t.match(/([0-9.,]+)\s*(k|m|K|M|mil|millones|millon|millón)?/i);
+    if (!m) return null;
+    let n = m[1].replace(/\s/g,'');
+    n = n.replace(/\.(?=\d{3}\b)/g,'');
+    n = n.replace(/,(?=\d{3}\b)/g,'');
+    let val = Number(n.replace(',', '.'));
+    const suf = m[2] ? m[2].toLowerCase() : '';
+    if (suf==='k') val = Math.round(val*1000);
+    if (suf==='m') val = Math.round(val*1000000);
+    if (suf==='mil') val = Math.round(val*1000);
+    if (suf==='millones' || suf==='millon' || suf==='millón') val = Math.round(val*1000000);
+    return Number.isFinite(val) ? val : null;
+  }
+  // Nombre (og:title) y conteos (og:description) de un documento.
+  function ogFields(doc){
+    let fullName = null;
+    const metaTitle = doc.querySelector('meta[property="og:title"]');
+    if (metaTitle) { const t = metaTitle.getAttribute('content')||''; const mt = t.match(/^(.+?)\s\(@/); if (mt) fullName = mt[1].trim(); }
+    let followers = null, following = null;
+    const mdesc = doc.querySelector('meta[property="og:description"]');
+    if (mdesc) { const t = mdesc.getAttribute('content')||''; const mf = t.match(/([0-9.,]+)\s*(followers|seguidores)/i); const mg = t.match(/([0-9.,]+)\s*(following|seguidos)/i); if (mf) followers = parseNum(mf[1]); if (mg) following = parseNum(mg[1]); }
+    return { full_name: fullName, followers, following };
+  }
+  function ogProfile(html){
+    const doc = new DOMParser().parseFromString(html, 'text/html');
+    const og = ogFields(doc);
+    // Intento simple de bio
+    let biography = '';
+    const bioMeta = doc.querySelector('[data-testid="user-bio"]');
+    if (bioMeta) { const t = bioMeta.textContent||bioMeta.innerText||''; if (t && t.trim().length>=3) biography = t.trim(); }
+    return { full_name: og.full_name, biography, followers: og.followers, following: og.following };
+  }
+  function grabText(el){
+    if (!el) return '';
+    return el.textContent || el.innerText || el.getAttribute('title') || el.getAttribute('aria-label') || '';
+  }
+  const countSelectors = (kind) => [
+    `a[href$='/${kind}/'] span[title]`, `a[href$='/${kind}/'] span`, `a[href$='/${kind}/'] div`,
+    `li a[href$='/${kind}/']`, `header section ul li a[href$='/${kind}/']`,
+  ];
+  // Primer conteo legible entre los elementos de `selectors`, en el orden de los selectores.
+  function countFrom(selectors){
+    for (const sel of selectors){
+      for (const el of document.querySelectorAll(sel)){ const v = parseNum(grabText(el)); if (v!==null) return v; }
+    }
+    return null;
+  }
+  // Nombre, bio y conteos del perfil abierto: etiquetas og y, si faltan, la cabecera (`detailed` prueba más selectores).
+  function domProfile(detailed){
+    const og = ogFields(document);
+    let fullName = og.full_name;
+    if (!fullName){ const nt = grabText(document.querySelector('header h1, header h2')).trim(); if (nt) fullName = nt; }
+    const sels = (kind) => detailed ? countSelectors(kind) : [`header section ul li a[href$='/${kind}/']`];
+    const followers = og.followers ?? countFrom(sels('followers'));
+    const following = og.following ?? countFrom(sels('following'));
+    let biography = '';
+    for (const el of document.querySelectorAll('[data-testid="user-bio"], header section div, header section p')){
+      const txt = grabText(el).trim();
+      if (txt && !/[0-9.,]+\s*(followers|seguidores|following|seguidos)/i.test(txt) && txt.length >= 8){ biography = txt; break; }
+    }
+    return { full_name: fullName, biography, followers, following };
+  }
+  // Conteo de seguidores del perfil abierto: cabecera y, si no, og:description.
+  function domFollowers(){
+    return countFrom(countSelectors('followers')) ?? ogFields(document).followers;
+  }
+  function detailsItem(u, udata){
+    const accType = (udata?.is_professional ? (udata?.is_business_account ? 'empresa' : 'creador') : 'personal');
+    return { username: u, full_name: udata?.full_name ?? null, biography: udata?.biography ?? '', account_type: accType, category: udata?.category_name ?? null, followers: udata?.edge_followed_by?.count ?? null, following: udata?.edge_follow?.count ?? null, url: profileLink(u) };
+  }
+  function emptyItem(u){
+    return { username: u, full_name: null, biography: '', account_type: null, category: null, followers: null, following: null, url: profileLink(u) };
+  }
+  async function userJson(u, tries, baseDelay){
+    const r = await fetchRetry(profileUrl(u), { headers: apiHeaders() }, tries, baseDelay);
+    return r.json();
+  }
+  async function htmlOf(u, tries, baseDelay){
+    const r = await fetchRetry(profileLink(u), { headers: htmlHeaders() }, tries, baseDelay);
+    return ogProfile(await r.text());
+  }
+  async function rawFriendships(id, kind, pageSize, maxId, tries, baseDelay){
+    const url = new URL(API + '/friendships/' + id + '/' + kind + '/');
+    url.searchParams.set('count', String(pageSize));
+    if (maxId) url.searchParams.set('max_id', maxId);
+    const r = await fetchRetry(url.toString(), { headers: apiHeaders() }, tries, baseDelay);
+    return r.json();
+  }
+  // Post del feed `feed/user/<id>/` reducido a los campos de `latest_posts` (la fecha se formatea en Python).
+  function feedPost(x){
+    const first = x?.carousel_media?.[0] || x;
+    return {
+      shortcode: x.code,
+      taken_at: x.taken_at ?? null,
+      caption: x.caption?.text ?? '',
+      likes: x.like_count ?? null,
+      comments: x.comment_count ?? null,
+      media_type: x.media_type ?? null,
+      thumbnail: first?.image_versions2?.candidates?.[0]?.url ?? null,
+      pinned: (x.timeline_pinned_user_ids || []).length > 0,
+    };
+  }
+  // Pagina friendships/<id>/<kind> hasta `total` y consulta por bloques el detalle de cada usuario.
+  async function friendList(u, kind, total, pageSize, chunkSize, baseDelay, tries, baseRetryDelay, detail){
+    const j1 = await userJson(u, tries, baseRetryDelay);
+    const id = j1?.data?.user?.id;
+    if (!id) throw new Error('no id');
+    let max_id = undefined;
+    let users = [];
+    for (;;) {
+      const j2 = await rawFriendships(id, kind, pageSize, max_id, tries, baseRetryDelay);
+      users.push(...(j2?.users || []));
+      max_id = j2?.next_max_id;
+      if (!max_id || users.length >= total) break;
+      await sleep(baseDelay);
+    }
+    users = users.slice(0, total);
+    const out = [];
+    for (let i = 0; i < users.length; i += chunkSize) {
+      const part = users.slice(i, i + chunkSize);
+      out.push(...await Promise.all(part.map(it => detail(it.username))));
+      await sleep(baseDelay);
+    }
+    return { user: j1?.data?.user, out };
+  }
+  window.__ig = {
+    version: __VERSION__,
+    sleep, fetchRetry, apiHeaders, parseNum, ogProfile, domProfile, domFollowers,
+    async profile(u){
+      const res = await fetch(profileUrl(u), { headers: { 'x-ig-app-id': '936619743392459' } });
+      if (!res.ok) throw new Error('HTTP ' + res.status);
+      return res.json();
+    },
+    async userInfo(u, tries, baseDelay){
+      const j = await userJson(u, tries, baseDelay);
+      return j?.data?.user ?? null;
+    },
+    async userDetails(u, tries, baseDelay){
+      const j = await userJson(u, tries, baseDelay);
+      return detailsItem(u, j?.data?.user || {});
+    },
+    async usersDetails(names, tries, baseDelay){
+      return Promise.all(names.map(u => this.userDetails(u, tries, baseDelay).catch(() => emptyItem(u))));
+    },
+    async followersCount(u, tries, baseDelay){
+      const j = await userJson(u, tries, baseDelay);
+      return j?.data?.user?.edge_followed_by?.count ?? null;
+    },
+    async followerCount(u, tries, baseDelay){
+      return { username: u, followers: await this.followersCount(u, tries, baseDelay) };
+    },
+    async followerCounts(names, tries, baseDelay){
+      return Promise.all(names.map(u => this.followerCount(u, tries, baseDelay).catch(() => ({ username: u, followers: null }))));
+    },
+    async friendships(id, kind, cursor, pageSize, tries, baseDelay){
+      const j = await rawFriendships(id, kind, pageSize, cursor, tries, baseDelay);
+      const users = (j?.users || []).map(x => ({ pk: x.pk ?? null, username: x.username, full_name: x.full_name ?? null, is_private: !!x.is_private }));
+      return { users, next_max_id: j?.next_max_id ?? null };
+    },
+    async timeline(id, cursor, pageSize, tries, baseDelay){
+      const url = new URL(API + '/feed/user/' + id + '/');
+      url.searchParams.set('count', String(pageSize));
+      if (cursor) url.searchParams.set('max_id', cursor);
+      const r = await fetchRetry(url.toString(), { headers: apiHeaders() }, tries, baseDelay);
+      const j = await r.json();
+      return { posts: (j?.items || []).map(feedPost), next_max_id: j?.more_available ? (j?.next_max_id ?? null) : null };
+    },
+    async following(u, total, pageSize, chunkSize, baseDelay, tries, baseRetryDelay){
+      const r = await friendList(u, 'following', total, pageSize, chunkSize, baseDelay, tries, baseRetryDelay,
+        name => this.userDetails(name, tries, baseRetryDelay).catch(() => emptyItem(name)));
+      return { username: r.user?.username, following_count: r.user?.edge_follow?.count ?? null, scraped_count: r.out.length, following_details: r.out };
+    },
+    async followers(u, total, pageSize, chunkSize, baseDelay, tries, baseRetryDelay){
+      const r = await friendList(u, 'followers', total, pageSize, chunkSize, baseDelay, tries, baseRetryDelay,
+        name => this.followerCount(name, tries, baseRetryDelay).catch(() => ({ username: name, followers: null })));
+      return { username: r.user?.username, count: r.user?.edge_followed_by?.count ?? null, scraped_count: r.out.length, followers_of_followers: r.out };
+    },
+    htmlProfile(u, tries, baseDelay){
+      return htmlOf(u, tries, baseDelay);
+    },
+    // Pool de `limit` workers sobre una cola compartida; los que fallan no aparecen en el resultado.
+    async htmlProfiles(names, limit, tries, baseDelay){
+      const out = {};
+      let next = 0;
+      async function worker(){
+        while (next < names.length){
+          const u = names[next++];
+          try { out[u] = await htmlOf(u, tries, baseDelay); } catch (e) {}
+        }
+      }
+      await Promise.all(Array.from({ length: Math.max(1, Math.min(limit, names.length)) }, worker));
+      return out;
+    },
+    async htmlCounts(u, tries, baseDelay){
+      const p = await htmlOf(u, tries, baseDelay);
+      return { full_name: p.full_name, followers: p.followers, following: p.following };
+    },
+    async htmlItem(u, tries, baseDelay){
+      const p = await htmlOf(u, tries, baseDelay);
+      return { ...emptyItem(u), full_name: p.full_name, followers: p.followers, following: p.following };
+    },
+  };
+})();
+""".replace("__VERSION__", str(HELPERS_VERSION)).replace("__PACED_MS__", str(PACED_RETRY_MS))
+
+# Expresión fija con la que se invoca un método de `window.__ig`; el argumento es `[método, [args…]]`.
+CALL_JS = (
+    "([method, args]) => {\n"
+    "  const ig = window.__ig;\n"
+    "  if (!ig || ig.version !== " + str(HELPERS_VERSION) + ") throw new Error('Biblioteca __ig v" + str(HELPERS_VERSION) + " no instalada en la página');\n"
+    "  return ig[method](...args);\n"
+    "}"
+)
+
+IgCall = Tuple[str, List[Any]]
+
+
+def install_helpers(context: Any) -> None:
+    """Instala `window.__ig` en todas las páginas (presentes y futuras navegaciones) del contexto."""
+    context.add_init_script(HELPERS_JS)
+
+
+async def install_helpers_async(context: Any) -> None:
+    await context.add_init_script(HELPERS_JS)
+
+
+# Marca el contexto como regulado por un limitador de rutas (ver `fetchRetry`)
+PACED_JS = "window.__igPaced = true;"
+
+
+def mark_paced(context: Any) -> None:
+    """Desactiva el backoff exponencial de `fetchRetry`: un limitador ya regula las rutas del contexto."""
+    context.add_init_script(PACED_JS)
+
+
+async def mark_paced_async(context: Any) -> None:
+    await context.add_init_script(PACED_JS)
+
+
+def _call(method: str, *args: Any) -> IgCall:
+    return CALL_JS, [method, list(args)]
+
+
+def profile(username: str) -> IgCall:
+    """Consulta `web_profile_info` y devuelve la respuesta JSON completa."""
+    return _call("profile", username)
+
+
+def following_api(
+    username: str,
+    limit: int,
+    page_size: int,
+    chunk: int,
+    delay_ms: int,
+    retry_tries: int,
+    retry_base_ms: int,
+) -> IgCall:
+    """Pagina `friendships/<id>/following` y consulta los detalles de cada seguido."""
+    return _call("following", username, limit, page_size, chunk, delay_ms, retry_tries, retry_base_ms)
+
+
+def followers_api(
+    username: str,
+    limit: int,
+    page_size: int,
+    chunk: int,
+    delay_ms: int,
+    retry_tries: int,
+    retry_base_ms: int,
+) -> IgCall:
+    """Pagina `friendships/<id>/followers` y consulta el conteo de seguidores de cada uno."""
+    return _call("followers", username, limit, page_size, chunk, delay_ms, retry_tries, retry_base_ms)
+
+
+def html_profile(username: str, retry_tries: int, retry_base_ms: int) -> IgCall:
+    """Descarga el HTML del perfil y lee nombre, bio y conteos de las etiquetas og."""
+    return _call("htmlProfile", username, retry_tries, retry_base_ms)
+
+
+def html_profiles(usernames: List[str], concurrency: int, retry_tries: int, retry_base_ms: int) -> IgCall:
+    """Como `html_profile` para un lote: `{ username: {...} }` con a lo sumo `concurrency` fetch a la vez."""
+    return _call("htmlProfiles", list(usernames), max(1, concurrency), retry_tries, retry_base_ms)
+
+
+def user_details(username: str, retry_tries: int, retry_base_ms: int) -> IgCall:
+    """Detalles de un usuario vía `web_profile_info` con la forma de `following_details`."""
+    return _call("userDetails", username, retry_tries, retry_base_ms)
+
+
+def html_counts(username: str, retry_tries: int, retry_base_ms: int) -> IgCall:
+    """Nombre y conteos del perfil leyendo las etiquetas og del HTML."""
+    return _call("htmlCounts", username, retry_tries, retry_base_ms)
+
+
+def html_item(username: str, retry_tries: int, retry_base_ms: int) -> IgCall:
+    """Item completo de `following_details` construido solo con las etiquetas og del HTML."""
+    return _call("htmlItem", username, retry_tries, retry_base_ms)
+
+
+def followers_count(username: str, retry_tries: int, retry_base_ms: int) -> IgCall:
+    """Número de seguidores de un perfil vía `web_profile_info`."""
+    return _call("followersCount", username, retry_tries, retry_base_ms)
+
+
+def follower_count(username: str, retry_tries: int, retry_base_ms: int) -> IgCall:
+    """`{ username, followers }` de un usuario vía `web_profile_info`."""
+    return _call("followerCount", username, retry_tries, retry_base_ms)
+
+
+def user_info(username: str, retry_tries: int, retry_base_ms: int) -> IgCall:
+    """`data.user` de `web_profile_info` (con reintentos), o null si no existe."""
+    return _call("userInfo", username, retry_tries, retry_base_ms)
+
+
+def friendships_page(
+    user_id: str,
+    kind: str,
+    page_size: int,
+    max_id: Optional[str],
+    retry_tries: int,
+    retry_base_ms: int,
+) -> IgCall:
+    """Una página de `friendships/<id>/<kind>`: `{ users: [{pk, username, full_name, is_private}], next_max_id }`."""
+    return _call("friendships", str(user_id), kind, max_id, page_size, retry_tries, retry_base_ms)
+
+
+def timeline_page(
+    user_id: str,
+    page_size: int,
+    max_id: Optional[str],
+    retry_tries: int,
+    retry_base_ms: int,
+) -> IgCall:
+    """Una página de `feed/user/<id>`: `{ posts: [{shortcode, taken_at, caption, likes, …}], next_max_id }`."""
+    return _call("timeline", str(user_id), max_id, page_size, retry_tries, retry_base_ms)
+
+
+def users_details(usernames: List[str], retry_tries: int, retry_base_ms: int) -> IgCall:
+    """Items de `following_details` de un lote de usuarios, consultados en paralelo."""
+    return _call("usersDetails", list(usernames), retry_tries, retry_base_ms)
+
+
+def follower_counts(usernames: List[str], retry_tries: int, retry_base_ms: int) -> IgCall:
+    """`[{ username, followers }]` de un lote de usuarios, consultados en paralelo."""
+    return _call("followerCounts", list(usernames), retry_tries, retry_base_ms)
+
+
+def dom_profile(detailed: bool = False) -> IgCall:
+    """`{ full_name, biography, followers, following }` leídos del DOM del perfil abierto; `detailed` prueba más selectores."""
+    return _call("domProfile", detailed)
+
+
+def dom_followers() -> IgCall:
+    """Conteo de seguidores del perfil abierto (cabecera u og:description)."""
+    return _call("domFollowers")
+
+
+# Detecta el aviso de cuenta privada en el perfil abierto.
+IS_PRIVATE_JS = (
+    "(() => {\n"
+    "  const text = (document.body && document.body.innerText) ? document.body.innerText : '';\n"
+    "  return /(this account is private|esta cuenta es privada|cuenta privada)/i.test(text);\n"
+    "})()"
+)
+
+
+# Colector incremental del listado abierto (diálogo o página completa de /following/).
+# Instala una sola vez un MutationObserver que guarda en un Set los usernames ya
+# vistos y encola solo los nuevos, con el nombre visible de su fila; los pasos
+# (`LIST_COLLECTOR_STEP_JS`) solo leen esa cola.
+LIST_COLLECTOR_JS = (
+    "(() => {\n"
+    "  const prev = window.__igList;\n"
+    "  if (prev && prev.root.isConnected) return prev.seen.size;\n"
+    "  if (prev) prev.observer.disconnect();\n"
+    "  const root = document.querySelector('div[role=\"dialog\"]') || document.body;\n"
+    "  const sel = 'a[href^=\"/\"][href$=\"/\"]';\n"
+    "  const invalid = new Set(['p','reels','stories','explore','accounts']);\n"
+    "  const st = { root, seen: new Set(), fresh: [], waiters: [], scroller: null, observer: null };\n"
+    "  const nameOf = (a) => {\n"
+    "    const container = a.closest('li, div') || a.parentElement;\n"
+    "    let txt = container ? (container.textContent || '').trim() : '';\n"
+    "    txt = txt.replace(/Seguir|Siguiendo|Follow|Following|Message|Mensaje/gi, '').trim();\n"
+    "    const lines = txt.split(/\\n+/).map(s => s.trim()).filter(Boolean);\n"
+    "    const cand = lines.find(s => /[A-Za-zÁÉÍÓÚáéíóúÑñ]+\\s+[A-Za-zÁÉÍÓÚáéíóúÑñ]+/.test(s)) || lines[0] || '';\n"
+    "    return cand.length >= 3 ? cand : null;\n"
+    "  };\n"
+    "  const take = (a) => {\n"
+    "    const m = (a.getAttribute('href') || '').match(/^\\/([A-Za-z0-9._]+)\\/$/);\n"
+    "    if (!m || invalid.has(m[1]) || st.seen.has(m[1])) return;\n"
+    "    st.seen.add(m[1]);\n"
+    "    st.fresh.push([m[1], nameOf(a)]);\n"
+    "  };\n"
+    "  const scan = (node) => {\n"
+    "    if (!node || node.nodeType !== 1) return;\n"
+    "    if (node.matches(sel)) take(node);\n"
+    "    node.querySelectorAll(sel).forEach(take);\n"
+    "  };\n"
+    "  scan(root);\n"
+    "  st.observer = new MutationObserver((records) => {\n"
+    "    const before = st.fresh.length;\n"
+    "    for (const r of records) {\n"
+    "      if (r.type === 'attributes') scan(r.target);\n"
+    "      else r.addedNodes.forEach(scan);\n"
+    "    }\n"
+    "    if (st.fresh.length > before) st.waiters.splice(0).forEach(f => f());\n"
+    "  });\n"
+    "  // attributes: las listas virtualizadas reciclan filas cambiando el href\n"
+    "  st.observer.observe(root, { childList: true, subtree: true, attributes: true, attributeFilter: ['href'] });\n"
+    "  window.__igList = st;\n"
+    "  return st.seen.size;\n"
+    "})()"
+)
+
+
+# Paso del colector: entrega las filas nuevas `[[username, nombre|null], …]`.
+# Si no hay ninguna pendiente, desplaza el listado y espera a que el observer
+# vea filas nuevas (como mucho `waitMs`, argumento del evaluate). Devuelve null
+# si el colector no está instalado o su raíz ya no está en el documento.
+LIST_COLLECTOR_STEP_JS = (
+    "async (waitMs) => {\n"
+    "  const st = window.__igList;\n"
+    "  if (!st || !st.root.isConnected) return null;\n"
+    "  if (!st.fresh.length) {\n"
+    "    if (!st.scroller || !st.scroller.isConnected) {\n"
+    "      const nodes = st.root === document.body ? [] : [st.root, ...st.root.querySelectorAll('*')];\n"
+    "      st.scroller = nodes.find(n => (n.scrollHeight || 0) > (n.clientHeight || 0)) || document.scrollingElement || document.documentElement;\n"
+    "    }\n"
+    "    st.scroller.scrollTop = st.scroller.scrollHeight;\n"
+    "    await new Promise(res => {\n"
+    "      const t = setTimeout(res, waitMs);\n"
+    "      st.waiters.push(() => { clearTimeout(t); res(); });\n"
+    "    });\n"
+    "  }\n"
+    "  return st.fresh.splice(0);\n"
+    "}"
+)
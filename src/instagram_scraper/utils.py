@@ -2,6 +2,9 @@ import re
 from urllib.parse import urlparse
 
 
+INSTAGRAM_ORIGIN = "https://www.instagram.com"
+INSTAGRAM_HOME = INSTAGRAM_ORIGIN + "/"
+
 _USERNAME_RE = re.compile(r"^[A-Za-z0-9._]+$")
 _INVALID_FIRST_SEGMENTS = {"p", "reels", "stories", "explore", "accounts"}
 